@@ -1,10 +1,33 @@
+from datetime import datetime, timedelta
+
+import os
+
 import psycopg2
 
+from batch_registration import print_batch_result, read_roster
+from dal import (fetch_rooms_page, get_group_class, insert_group_class, insert_room,
+                 recount_registrations, register_members_for_classes, update_class)
+from db import run_with_connection, iter_keyset_pages, print_pages
+from maintenance import (DEFAULT_PRIORITY, PRIORITIES, fetch_maintenance_page, fetch_oldest_open_per_room,
+                         fetch_open_by_equipment, fetch_work_queue, log_ticket, normalize_status, queue_key,
+                         update_ticket)
+from refcache import REFDATA, cached_listing, get_equipment, get_room, get_trainer
+from reports import (fetch_class_fill, fetch_no_show_rates, fetch_room_occupancy,
+                     fetch_trainer_hours, refresh_reports, report_status)
+from scheduling import book_pt_session, check_pt_slot, find_free_rooms, print_db_error
+
 
 # ========= ADMIN OPERATIONS =========
 # 8) Room Booking (Add/List Rooms)
-# 9) Class Management (Create/Update Group Classes)
-# 10) Equipment Maintenance (log + view/update status)
+# 9) Class Management (Create/Update Group Classes, batch registration)
+# 10) Equipment Maintenance (log + view/update status, work queue)
+# 11) PT Session Booking
+# 12) Utilization Reports (read from materialized views, see reports.py)
+#
+# These functions only prompt and print; the queries are in dal.py,
+# scheduling.py, maintenance.py and reports.py. Room, trainer and equipment
+# lookups go through the reference data cache (refcache.py); writes to
+# those tables invalidate it via NOTIFY.
 
 
 # ---- Rooms ----
@@ -15,55 +38,74 @@ def add_room(conn):
     room_type = input("Room type (e.g., Yoga, Strength): ").strip()
     capacity = input("Capacity: ").strip()
 
-    if not capacity.isdigit():
+    if not capacity.isdigit() or int(capacity) == 0:
         print("Capacity must be a positive integer.")
         return
 
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO Room(name, room_type, capacity)
-            VALUES (%s, %s, %s);
-            """,
-            (name, room_type, int(capacity)),
-        )
+        insert_room(conn, name, room_type, capacity)
         conn.commit()
+        # the NOTIFY reaches the listener shortly; don't let this process lag behind its own write
+        REFDATA.invalidate("room")
         print("Room added successfully.")
     except psycopg2.Error as e:
         conn.rollback()
         print(f"Error adding room: {e}")
-    finally:
-        cur.close()
 
 
 def list_rooms(conn):
     print("\n=== List All Rooms ===")
+    room_type = input("Filter by room type (optional): ").strip() or None
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT room_id, name, room_type, capacity
-            FROM Room
-            ORDER BY room_id;
-            """
+        print_pages(
+            iter_keyset_pages(
+                lambda after, limit: cached_listing(
+                    "room", ("page", after, limit, room_type),
+                    lambda: fetch_rooms_page(conn, after, limit, room_type),
+                ),
+                key=lambda r: r.room_id,
+            ),
+            lambda r: print(
+                f"Room {r.room_id}: {r.name} | Type: {r.room_type} | Capacity: {r.capacity}"
+            ),
+            "No rooms found.",
         )
-        rows = cur.fetchall()
-        if not rows:
-            print("No rooms found.")
-            return
-        for r in rows:
-            print(
-                f"Room {r[0]}: {r[1]} | Type: {r[2]} | Capacity: {r[3]}"
-            )
     except psycopg2.Error as e:
+        conn.rollback()
         print(f"Error listing rooms: {e}")
-    finally:
-        cur.close()
 
 
 # ---- Group Classes ----
 
+def print_free_rooms(rooms):
+    for i, r in enumerate(rooms, start=1):
+        print(f"  {i}. Room {r.room_id}: {r.name} | Type: {r.room_type} | Capacity: {r.capacity}")
+
+
+def find_room(conn):
+    """Search for rooms that are free for a time window and big enough."""
+    print("\n=== Find Free Room ===")
+    start_time = input("Start (YYYY-MM-DD HH:MM): ").strip()
+    end_time = input("End   (YYYY-MM-DD HH:MM): ").strip()
+    min_capacity = input("Minimum capacity [1]: ").strip() or "1"
+    room_type = input("Room type (optional): ").strip() or None
+
+    if not min_capacity.isdigit():
+        print("Capacity must be integer.")
+        return
+
+    try:
+        rooms = find_free_rooms(conn, start_time, end_time, int(min_capacity), room_type)
+        if not rooms:
+            print("No free rooms match.")
+            return
+        print("\nFree rooms (best fit first):")
+        print_free_rooms(rooms)
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error searching rooms: {e}")
+
+
 def create_group_class(conn):
     print("\n=== Create Group Class ===")
     title = input("Title: ").strip()
@@ -72,43 +114,41 @@ def create_group_class(conn):
     end_time = input("End   (YYYY-MM-DD HH:MM): ").strip()
     capacity = input("Capacity: ").strip()
     trainer_id = input("Trainer ID: ").strip()
-    room_id = input("Room ID: ").strip()
+    room_id = input("Room ID (blank = suggest a free room): ").strip()
 
     if not capacity.isdigit():
         print("Capacity must be integer.")
         return
+    if (trainer_id and not trainer_id.isdigit()) or (room_id and not room_id.isdigit()):
+        print("Trainer ID and room ID must be integers.")
+        return
 
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO GroupClass(
-                title, description, start_time, end_time,
-                capacity, trainer_id, room_id
-            )
-            VALUES (
-                %s, %s,
-                %s::TIMESTAMP, %s::TIMESTAMP,
-                %s, %s, %s
-            );
-            """,
-            (
-                title,
-                description,
-                start_time,
-                end_time,
-                int(capacity),
-                trainer_id or None,
-                room_id or None,
-            ),
-        )
+        if trainer_id and get_trainer(conn, trainer_id) is None:
+            print("Trainer not found.")
+            return
+
+        if not room_id:
+            rooms = find_free_rooms(conn, start_time, end_time, int(capacity))
+            if not rooms:
+                print("No free room is big enough at that time.")
+                return
+            print("\nFree rooms (best fit first):")
+            print_free_rooms(rooms)
+            pick = input("Pick a room number (blank to create without a room): ").strip()
+            if pick.isdigit() and 1 <= int(pick) <= len(rooms):
+                room_id = rooms[int(pick) - 1].room_id
+
+        insert_group_class(conn, title, start_time, end_time, int(capacity),
+                           trainer_id or None, room_id or None, description)
         conn.commit()
         print("Group class created successfully.")
+    except ValueError as e:
+        conn.rollback()
+        print(e)
     except psycopg2.Error as e:
         conn.rollback()
-        print(f"Error creating class: {e}")
-    finally:
-        cur.close()
+        print_db_error("creating class", e)
 
 
 def update_group_class(conn):
@@ -119,29 +159,19 @@ def update_group_class(conn):
         return
 
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT class_id, title, description, start_time, end_time,
-                   capacity, trainer_id, room_id
-            FROM GroupClass
-            WHERE class_id = %s;
-            """,
-            (class_id,),
-        )
-        row = cur.fetchone()
-        if not row:
+        gc = get_group_class(conn, class_id)
+        if not gc:
             print("Class not found.")
             return
 
         print("\nCurrent values:")
-        print(f"Title: {row[1]}")
-        print(f"Description: {row[2]}")
-        print(f"Start: {row[3]}")
-        print(f"End: {row[4]}")
-        print(f"Capacity: {row[5]}")
-        print(f"Trainer ID: {row[6]}")
-        print(f"Room ID: {row[7]}")
+        print(f"Title: {gc.title}")
+        print(f"Description: {gc.description}")
+        print(f"Start: {gc.start_time}")
+        print(f"End: {gc.end_time}")
+        print(f"Capacity: {gc.capacity}")
+        print(f"Trainer ID: {gc.trainer_id}")
+        print(f"Room ID: {gc.room_id}")
 
         print("\nEnter new values (blank = keep current):")
         title = input("New title: ").strip()
@@ -152,46 +182,83 @@ def update_group_class(conn):
         trainer_id = input("New trainer ID: ").strip()
         room_id = input("New room ID: ").strip()
 
-        fields = []
-        params = []
-
-        if title:
-            fields.append("title = %s")
-            params.append(title)
-        if description:
-            fields.append("description = %s")
-            params.append(description)
-        if start_time:
-            fields.append("start_time = %s::TIMESTAMP")
-            params.append(start_time)
-        if end_time:
-            fields.append("end_time = %s::TIMESTAMP")
-            params.append(end_time)
-        if capacity:
-            fields.append("capacity = %s")
-            params.append(int(capacity))
-        if trainer_id:
-            fields.append("trainer_id = %s")
-            params.append(trainer_id)
-        if room_id:
-            fields.append("room_id = %s")
-            params.append(room_id)
-
-        if not fields:
+        if trainer_id and (not trainer_id.isdigit() or get_trainer(conn, trainer_id) is None):
+            print("Trainer not found.")
+            return
+        if room_id and (not room_id.isdigit() or get_room(conn, room_id) is None):
+            print("Room not found.")
+            return
+        if not (title or description or start_time or end_time or capacity or trainer_id or room_id):
             print("No changes provided.")
             return
 
-        params.append(class_id)
-        query = "UPDATE GroupClass SET " + ", ".join(fields) + " WHERE class_id = %s;"
-        cur.execute(query, tuple(params))
+        update_class(
+            conn, class_id,
+            title=title or None,
+            description=description or None,
+            start_time=start_time or None,
+            end_time=end_time or None,
+            capacity=capacity or None,
+            trainer_id=trainer_id or None,
+            room_id=room_id or None,
+        )
         conn.commit()
         print("Group class updated successfully.")
 
+    except ValueError as e:
+        conn.rollback()
+        print(e)
     except psycopg2.Error as e:
         conn.rollback()
-        print(f"Error updating class: {e}")
-    finally:
-        cur.close()
+        print_db_error("updating class", e)
+
+
+def repair_registration_counts(conn):
+    """
+    Recompute GroupClass.registered_count from ClassRegistration.
+    Only needed if the counters drifted, e.g. after bulk edits with triggers off.
+    """
+    print("\n=== Repair Registration Counts ===")
+    try:
+        fixed = recount_registrations(conn)
+        conn.commit()
+        print(f"Registration counts checked. Classes corrected: {fixed}")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error repairing registration counts: {e}")
+
+
+def batch_register_roster(conn):
+    """
+    Register a roster (CSV of member_id,class_id, or member_id plus a list of
+    classes) in one transaction. See batch_registration.py for the format.
+    """
+    print("\n=== Batch Registration from Roster ===")
+    path = input("Path to roster CSV: ").strip()
+    if not os.path.isfile(path):
+        print("File not found.")
+        return
+    classes = input("Class IDs for every member (comma-separated, blank = from file): ").strip()
+    class_ids = [c.strip() for c in classes.split(",") if c.strip()]
+    if not all(c.isdigit() for c in class_ids):
+        print("Invalid class ID.")
+        return
+    dry_run = input("Dry run only? (y/N): ").strip().lower() == "y"
+
+    pairs, errors = read_roster(path, [int(c) for c in class_ids])
+    if errors:
+        print("Roster rejected, nothing was registered:")
+        for error in errors[:20]:
+            print(f"    {error}")
+        return
+    if not pairs:
+        print("Roster is empty.")
+        return
+
+    try:
+        print_batch_result(register_members_for_classes(conn, pairs, dry_run), dry_run=dry_run)
+    except psycopg2.Error as e:
+        print(f"Error registering roster: {e}")
 
 
 # ---- Equipment Maintenance ----
@@ -203,63 +270,68 @@ def log_equipment_issue(conn):
         print("Invalid equipment ID.")
         return
 
+    try:
+        equipment = get_equipment(conn, equipment_id)
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error looking up equipment: {e}")
+        return
+    if equipment is None:
+        print("Equipment not found.")
+        return
+    print(f"{equipment.name} ({equipment.equipment_type}) | Status: {equipment.status}")
+
     issue_description = input("Issue description: ").strip()
+    priority = read_priority("Priority (1=Critical, 2=High, 3=Normal, 4=Low; default 3): ")
+    if priority is None:
+        return
+    priority = priority or DEFAULT_PRIORITY
 
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO EquipmentMaintenance(
-                equipment_id, issue_description, status
-            )
-            VALUES (%s, %s, 'Open');
-            """,
-            (equipment_id, issue_description),
-        )
-        conn.commit()
-        print("Equipment issue logged as 'Open'.")
+        maintenance_id, equipment_status = log_ticket(conn, equipment.equipment_id, issue_description, priority)
+        print(f"Equipment issue #{maintenance_id} logged as 'Open' ({PRIORITIES[priority]}).")
+        print(f"Equipment status: {equipment_status}")
     except psycopg2.Error as e:
-        conn.rollback()
         print(f"Error logging equipment issue: {e}")
-    finally:
-        cur.close()
+
+
+def read_priority(prompt):
+    """Read an optional priority: 1-4, 0 for blank, None if invalid."""
+    raw = input(prompt).strip()
+    if not raw:
+        return 0
+    if raw.isdigit() and int(raw) in PRIORITIES:
+        return int(raw)
+    print("Invalid priority.")
+    return None
 
 
 def view_maintenance_requests(conn):
     print("\n=== Equipment Maintenance Requests ===")
+    status = input("Filter by status (Open/In Progress/Resolved, optional): ").strip() or None
+    reported_from = input("Reported from (YYYY-MM-DD, optional): ").strip() or None
+    reported_to = input("Reported before (YYYY-MM-DD, optional): ").strip() or None
+
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT em.maintenance_id,
-                   e.equipment_id,
-                   e.name,
-                   em.issue_description,
-                   em.status,
-                   em.reported_at,
-                   em.assigned_to,
-                   em.resolved_at
-            FROM EquipmentMaintenance em
-            JOIN Equipment e ON em.equipment_id = e.equipment_id
-            ORDER BY em.reported_at DESC;
-            """
+        print_pages(
+            iter_keyset_pages(
+                lambda after, limit: fetch_maintenance_page(
+                    conn, after, limit, status, reported_from, reported_to
+                ),
+                key=lambda r: (r.reported_at, r.maintenance_id),
+            ),
+            lambda r: print(
+                f"[#{r.maintenance_id}] Equip {r.equipment_id} - {r.equipment_name} | "
+                f"Status: {r.status} | Priority: {PRIORITIES.get(r.priority, r.priority)} | "
+                f"Reported: {r.reported_at} | "
+                f"Assigned to: {r.assigned_to} | Resolved at: {r.resolved_at}\n"
+                f"    Issue: {r.issue_description}"
+            ),
+            "No maintenance records found.",
         )
-        rows = cur.fetchall()
-        if not rows:
-            print("No maintenance records found.")
-            return
-
-        for r in rows:
-            print(
-                f"[#{r[0]}] Equip {r[1]} - {r[2]} | "
-                f"Status: {r[4]} | Reported: {r[5]} | "
-                f"Assigned to: {r[6]} | Resolved at: {r[7]}\n"
-                f"    Issue: {r[3]}"
-            )
     except psycopg2.Error as e:
+        conn.rollback()
         print(f"Error viewing maintenance: {e}")
-    finally:
-        cur.close()
 
 
 def update_maintenance_status(conn):
@@ -269,101 +341,403 @@ def update_maintenance_status(conn):
         print("Invalid ID.")
         return
 
-    new_status = input("New status (Open/In Progress/Resolved): ").strip()
+    new_status = normalize_status(input("New status (Open/In Progress/Resolved): "))
+    if new_status is None:
+        print("Status must be Open, In Progress or Resolved.")
+        return
     assigned_to = input("Assigned to (optional): ").strip()
+    priority = read_priority("New priority (1-4, blank to keep): ")
+    if priority is None:
+        return
+
+    try:
+        result = update_ticket(conn, maintenance_id, new_status, assigned_to, priority or None)
+    except psycopg2.Error as e:
+        print(f"Error updating maintenance: {e}")
+        return
+    if result is None:
+        print("Maintenance request not found.")
+        return
+    equipment_id, equipment_status = result
+    print("Maintenance status updated.")
+    print(f"Equipment {equipment_id} status: {equipment_status}")
+
+
+def view_work_queue(conn):
+    print("\n=== Maintenance Work Queue ===")
+    room_id = input("Room ID (optional): ").strip()
+    if room_id and not room_id.isdigit():
+        print("Invalid Room ID.")
+        return
+    urgent = input("Critical and high priority only? (y/N): ").strip().lower() == "y"
+
+    try:
+        print_pages(
+            iter_keyset_pages(
+                lambda after, limit: fetch_work_queue(
+                    conn, after, limit, int(room_id) if room_id else None, 2 if urgent else None
+                ),
+                key=queue_key,
+            ),
+            lambda t: print(
+                f"[#{t.maintenance_id}] {PRIORITIES[t.priority]:<8} | {t.status:<11} | "
+                f"Reported: {t.reported_at:%Y-%m-%d %H:%M} | "
+                f"Equip {t.equipment_id} - {t.equipment_name} (room {t.room_id}) | "
+                f"Assigned to: {t.assigned_to or '-'}\n"
+                f"    Issue: {t.issue_description}"
+            ),
+            "No open maintenance requests.",
+        )
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error viewing work queue: {e}")
+
+
+def view_open_by_equipment(conn):
+    print("\n=== Open Tickets by Equipment ===")
+    try:
+        backlog = fetch_open_by_equipment(conn)
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error viewing open tickets: {e}")
+        return
+    if not backlog:
+        print("No open maintenance requests.")
+        return
+    for b in backlog:
+        print(f"Equip {b.equipment_id} - {b.equipment_name} (room {b.room_id}) | {b.equipment_status} | "
+              f"{b.open_tickets} open | top priority: {PRIORITIES[b.top_priority]} | "
+              f"waiting since {b.oldest_reported_at:%Y-%m-%d}")
+
+
+def view_oldest_open_per_room(conn):
+    print("\n=== Oldest Open Ticket per Room ===")
+    try:
+        rows = fetch_oldest_open_per_room(conn)
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error viewing open tickets: {e}")
+        return
+    if not rows:
+        print("No open maintenance requests.")
+        return
+    now = datetime.now()
+    for r in rows:
+        room = r.room_name or "(no room)"
+        print(f"{room:<20} [#{r.maintenance_id}] {PRIORITIES[r.priority]:<8} | "
+              f"open {(now - r.reported_at).days} days | Equip {r.equipment_id} - {r.equipment_name}\n"
+              f"    Issue: {r.issue_description}")
+
+
+# ---- PT Sessions ----
+
+def schedule_pt_session(conn):
+    """
+    Book a PT session for a member after checking the trainer's availability
+    and existing bookings. Offers the nearest free slots when the requested
+    time is taken.
+    """
+    print("\n=== PT Session Booking ===")
+    member_id = input("Member ID: ").strip()
+    trainer_id = input("Trainer ID: ").strip()
+    room_id = input("Room ID (optional): ").strip()
+    start = input("Start (YYYY-MM-DD HH:MM): ").strip()
+    minutes = input("Length in minutes [60]: ").strip() or "60"
+
+    if not (member_id.isdigit() and trainer_id.isdigit() and minutes.isdigit()):
+        print("Member ID, trainer ID and length must be integers.")
+        return
+    if room_id and not room_id.isdigit():
+        print("Invalid room ID.")
+        return
+    try:
+        start = datetime.strptime(start, "%Y-%m-%d %H:%M")
+    except ValueError:
+        print("Start must look like 2025-12-05 10:00.")
+        return
+    end = start + timedelta(minutes=int(minutes))
+    room_id = int(room_id) if room_id else None
+
+    try:
+        check = check_pt_slot(conn, member_id, trainer_id, start, end, room_id)
+        if not check.available:
+            print("\nRequested time is not available:")
+            for c in check.conflicts:
+                print(f"  - {c.reason} ({c.start} - {c.end})")
+            if not check.suggestions:
+                print("No free slots found nearby.")
+                return
+            print("\nNearest free slots:")
+            for i, (s_start, s_end) in enumerate(check.suggestions, start=1):
+                print(f"  {i}. {s_start:%a %Y-%m-%d %H:%M} - {s_end:%H:%M}")
+            pick = input("Pick a slot number (blank to cancel): ").strip()
+            if not pick.isdigit() or not 1 <= int(pick) <= len(check.suggestions):
+                print("Booking cancelled.")
+                return
+            start, end = check.suggestions[int(pick) - 1]
+
+        pt_session_id, check = book_pt_session(conn, member_id, trainer_id, start, end, room_id)
+        if pt_session_id is None:
+            print("That slot was just taken:")
+            for c in check.conflicts:
+                print(f"  - {c.reason} ({c.start} - {c.end})")
+            return
+        print(f"PT session booked with ID: {pt_session_id} ({start} - {end})")
+    except ValueError as e:
+        print(f"Error booking session: {e}")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print_db_error("booking session", e)
+
+
+# ---- Reference cache ----
+
+def show_cache_stats():
+    """Print hit/miss counters of the reference data cache."""
+    stats = REFDATA.stats()
+    print("\n=== Reference Cache ===")
+    print(f"Entries: {stats['size']} / {stats['maxsize']}")
+    print(f"Hits: {stats['hits']} | Misses: {stats['misses']} | Hit ratio: {stats['hit_ratio']:.1%}")
+    print(f"Expired: {stats['expired']} | Evicted: {stats['evictions']} | "
+          f"Invalidated: {stats['invalidations']}")
+
+
+# ---- Utilization Reports ----
+
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def print_report_freshness(conn):
+    stamps = [s.refreshed_at for s in report_status(conn) if s.refreshed_at]
+    if stamps:
+        print(f"(as of {min(stamps):%Y-%m-%d %H:%M})")
+    else:
+        print("(reports have not been refreshed yet; showing data from the migration)")
+
+
+def view_class_fill(conn):
+    print("\n=== Class Fill Rate (last 12 weeks + next 4) ===")
+    order = input("Show emptiest or fullest first? (e/f, default e): ").strip().lower()
+    try:
+        print_report_freshness(conn)
+        rows = fetch_class_fill(conn, lowest_first=order != "f")
+        if not rows:
+            print("No classes in the report period.")
+            return
+        for r in rows:
+            trainer = get_trainer(conn, r.trainer_id) if r.trainer_id else None
+            name = trainer.full_name if trainer else "-"
+            fill = f"{r.fill_pct}%" if r.fill_pct is not None else "n/a"
+            print(f"{r.title:<25} {name:<20} {r.classes:>3} classes | "
+                  f"{r.registered}/{r.seats} seats ({fill}) | full: {r.full_classes}")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error viewing class fill: {e}")
+
+
+def view_room_occupancy(conn):
+    print("\n=== Room Occupancy by Hour of Week (last 12 weeks) ===")
+    try:
+        room_id = int(input("Room ID: ").strip())
+    except ValueError:
+        print("Invalid Room ID.")
+        return
+    try:
+        room = get_room(conn, room_id)
+        if not room:
+            print("Room not found.")
+            return
+        print_report_freshness(conn)
+        cells = fetch_room_occupancy(conn, room_id)
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error viewing room occupancy: {e}")
+        return
+    grid = {(c.dow, c.hour): c.occupancy_pct for c in cells}
+    hours = sorted({c.hour for c in cells if c.booked_minutes})
+    if not hours:
+        print(f"{room.name} had no bookings in the last 12 weeks.")
+        return
+    print(f"{room.name} ({room.room_type}), % of the hour booked:")
+    print("      " + "".join(f"{d:>7}" for d in DAY_NAMES))
+    for hour in range(hours[0], hours[-1] + 1):
+        print(f"{hour:02d}:00 " + "".join(f"{grid.get((dow, hour), 0):>7}" for dow in range(1, 8)))
+
 
+def view_trainer_hours(conn):
+    print("\n=== Trainer Booked vs Available Hours ===")
+    raw = input("Trainer ID (blank for all trainers this week): ").strip()
     try:
-        cur = conn.cursor()
-        if new_status.lower() == "resolved":
-            cur.execute(
-                """
-                UPDATE EquipmentMaintenance
-                SET status = %s,
-                    assigned_to = NULLIF(%s, ''),
-                    resolved_at = NOW()
-                WHERE maintenance_id = %s;
-                """,
-                (new_status, assigned_to, maintenance_id),
-            )
+        if raw:
+            try:
+                trainer = get_trainer(conn, raw)
+            except ValueError:
+                print("Invalid Trainer ID.")
+                return
+            if not trainer:
+                print("Trainer not found.")
+                return
+            print_report_freshness(conn)
+            print(f"{trainer.full_name}:")
+            rows = fetch_trainer_hours(conn, trainer_id=trainer.trainer_id)
         else:
-            cur.execute(
-                """
-                UPDATE EquipmentMaintenance
-                SET status = %s,
-                    assigned_to = NULLIF(%s, ''),
-                    resolved_at = NULL
-                WHERE maintenance_id = %s;
-                """,
-                (new_status, assigned_to, maintenance_id),
-            )
-        conn.commit()
-        print("Maintenance status updated.")
+            print_report_freshness(conn)
+            rows = fetch_trainer_hours(conn, week=datetime.now().date())
     except psycopg2.Error as e:
         conn.rollback()
-        print(f"Error updating maintenance: {e}")
-    finally:
-        cur.close()
+        print(f"Error viewing trainer hours: {e}")
+        return
+    for r in rows:
+        label = f"{r.week:%Y-%m-%d}" if raw else f"Trainer {r.trainer_id}"
+        util = f"{r.utilization_pct}%" if r.utilization_pct is not None else "no availability set"
+        print(f"{label:<12} available {r.available_hours:>6}h | classes {r.class_hours:>6}h | "
+              f"PT {r.pt_hours:>6}h | {util}")
+
+
+def view_no_show_rates(conn):
+    print("\n=== PT No-Show Rates ===")
+    try:
+        months = int(input("Months to include (default 3): ").strip() or "3")
+    except ValueError:
+        print("Invalid number of months.")
+        return
+    try:
+        print_report_freshness(conn)
+        rows = fetch_no_show_rates(conn, max(months, 1))
+        if not rows:
+            print("No PT sessions in that period.")
+            return
+        for r in rows:
+            trainer = get_trainer(conn, r.trainer_id)
+            name = trainer.full_name if trainer else f"Trainer {r.trainer_id}"
+            rate = f"{r.no_show_pct}%" if r.no_show_pct is not None else "n/a"
+            print(f"{name:<20} sessions: {r.sessions:>4} | completed: {r.completed:>4} | "
+                  f"no-shows: {r.no_shows:>3} | cancelled: {r.cancelled:>3} | no-show rate: {rate}")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error viewing no-show rates: {e}")
+
+
+def refresh_utilization_reports(conn):
+    print("\n=== Refresh Reports ===")
+    try:
+        timings = refresh_reports(conn)
+    except psycopg2.Error as e:
+        print(f"Refresh failed: {e}")
+        return
+    if timings is None:
+        print("A refresh is already running; try again shortly.")
+        return
+    for report, ms in timings:
+        print(f"{report:<16} {ms} ms")
 
 
 # ---- Wrapper Functions for Main Menu ----
 
-def manage_rooms(conn):
-    """Wrapper function to manage rooms (add/list)."""
+def manage_rooms(pool):
+    """Wrapper function to manage rooms (add/list/find free)."""
     while True:
         print("\n=== Room Management ===")
         print("1. Add Room")
         print("2. List All Rooms")
+        print("3. Find Free Room")
         print("0. Back to Admin Menu")
         
         choice = input("Select an option: ").strip()
         
         if choice == "1":
-            add_room(conn)
+            run_with_connection(pool, add_room)
         elif choice == "2":
-            list_rooms(conn)
+            run_with_connection(pool, list_rooms)
+        elif choice == "3":
+            run_with_connection(pool, find_room)
         elif choice == "0":
             break
         else:
             print("Invalid choice, please try again.")
 
 
-def manage_group_classes(conn):
-    """Wrapper function to manage group classes (create/update)."""
+def manage_group_classes(pool):
+    """Wrapper function to manage group classes (create/update/repair counts/batch register)."""
     while True:
         print("\n=== Group Class Management ===")
         print("1. Create Group Class")
         print("2. Update Group Class")
+        print("3. Repair Registration Counts")
+        print("4. Batch Register from Roster")
         print("0. Back to Admin Menu")
         
         choice = input("Select an option: ").strip()
         
         if choice == "1":
-            create_group_class(conn)
+            run_with_connection(pool, create_group_class)
         elif choice == "2":
-            update_group_class(conn)
+            run_with_connection(pool, update_group_class)
+        elif choice == "3":
+            run_with_connection(pool, repair_registration_counts)
+        elif choice == "4":
+            run_with_connection(pool, batch_register_roster)
         elif choice == "0":
             break
         else:
             print("Invalid choice, please try again.")
 
 
-def manage_equipment_maintenance(conn):
-    """Wrapper function to manage equipment maintenance (log/view/update)."""
+def manage_equipment_maintenance(pool):
+    """Wrapper function to manage equipment maintenance (log/view/update/work queue)."""
     while True:
         print("\n=== Equipment Maintenance ===")
         print("1. Log Equipment Issue")
         print("2. View Maintenance Requests")
         print("3. Update Maintenance Status")
+        print("4. Work Queue (open tickets by priority)")
+        print("5. Open Tickets by Equipment")
+        print("6. Oldest Open Ticket per Room")
         print("0. Back to Admin Menu")
         
         choice = input("Select an option: ").strip()
         
         if choice == "1":
-            log_equipment_issue(conn)
+            run_with_connection(pool, log_equipment_issue)
+        elif choice == "2":
+            run_with_connection(pool, view_maintenance_requests)
+        elif choice == "3":
+            run_with_connection(pool, update_maintenance_status)
+        elif choice == "4":
+            run_with_connection(pool, view_work_queue)
+        elif choice == "5":
+            run_with_connection(pool, view_open_by_equipment)
+        elif choice == "6":
+            run_with_connection(pool, view_oldest_open_per_room)
+        elif choice == "0":
+            break
+        else:
+            print("Invalid choice, please try again.")
+
+
+def utilization_reports(pool):
+    """Wrapper function for the utilization reports."""
+    while True:
+        print("\n=== Utilization Reports ===")
+        print("1. Class Fill Rate")
+        print("2. Room Occupancy by Hour")
+        print("3. Trainer Booked vs Available Hours")
+        print("4. PT No-Show Rates")
+        print("5. Refresh Reports Now")
+        print("0. Back to Admin Menu")
+
+        choice = input("Select an option: ").strip()
+
+        if choice == "1":
+            run_with_connection(pool, view_class_fill)
         elif choice == "2":
-            view_maintenance_requests(conn)
+            run_with_connection(pool, view_room_occupancy)
         elif choice == "3":
-            update_maintenance_status(conn)
+            run_with_connection(pool, view_trainer_hours)
+        elif choice == "4":
+            run_with_connection(pool, view_no_show_rates)
+        elif choice == "5":
+            run_with_connection(pool, refresh_utilization_reports)
         elif choice == "0":
             break
         else:
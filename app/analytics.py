@@ -0,0 +1,312 @@
+import argparse
+import csv
+import io
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # optional: only the analytics need it
+    np = None
+
+
+# ========= MEMBER PROGRESS ANALYTICS =========
+# Trends over HealthMetric history for one member, a cohort or the whole
+# membership. Each batch of members is read with a single COPY into
+# columnar NumPy arrays (member_id, day, weight, heart_rate, target);
+# all statistics are then computed for every member at once with sorted
+# arrays, cumulative sums and np.bincount, with no per-row Python loop.
+#
+#   avg_7d / avg_30d      mean weight over the 7 / 30 days up to the last reading
+#   weight_velocity       least-squares weight slope over VELOCITY_WINDOW days, kg/week
+#   projected_target_date when avg_7d reaches target_weight at that velocity
+#   resting_hr_drift      slope of the daily lowest heart rate (a resting proxy:
+#                         workout readings are never a day's minimum) over
+#                         HR_DRIFT_WINDOW days, bpm per 30 days
+#
+# NumPy is an optional dependency; without it the functions raise
+# AnalyticsUnavailable and the rest of the application works as before.
+
+HISTORY_DAYS = 180          # metric history read per member
+VELOCITY_WINDOW = 30
+HR_DRIFT_WINDOW = 90
+MAX_PROJECTION_DAYS = 3 * 365
+BATCH_MEMBERS = 5000        # member_id range per query in batch runs
+
+_EPOCH = datetime(1970, 1, 1)
+
+MemberTrend = namedtuple("MemberTrend", [
+    "member_id", "readings", "last_recorded", "latest_weight", "avg_7d", "avg_30d",
+    "weight_velocity", "target_weight", "projected_target_date", "resting_hr_drift",
+])
+# values are None where there is not enough data
+
+SeriesPoint = namedtuple("SeriesPoint", ["recorded_at", "weight", "avg_7d", "avg_30d", "heart_rate"])
+
+
+class AnalyticsUnavailable(RuntimeError):
+    """Raised when NumPy is not installed."""
+
+
+def _require_numpy():
+    if np is None:
+        raise AnalyticsUnavailable("Progress analytics need NumPy (pip install numpy).")
+
+
+def _to_datetime(day):
+    return _EPOCH + timedelta(days=float(day))
+
+
+def _or_none(value, digits=2):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+# ---- data access ----
+
+def fetch_metric_arrays(conn, member_ids=None, member_range=None, history_days=HISTORY_DAYS):
+    """
+    Read the last `history_days` of metrics for `member_ids`, for member_ids
+    in `member_range` = (low, high), or for everyone, with one COPY.
+    Returns columnar arrays (member_id, day, weight, heart_rate, target)
+    sorted by member and time; day is days since the epoch, NULL is NaN.
+    """
+    _require_numpy()
+    low, high = member_range or (None, None)
+    with conn.cursor() as cur:
+        query = cur.mogrify(
+            """
+            SELECT hm.member_id,
+                   EXTRACT(EPOCH FROM hm.recorded_at) / 86400.0,
+                   hm.weight,
+                   hm.heart_rate,
+                   m.target_weight
+            FROM HealthMetric hm
+            JOIN Member m ON m.member_id = hm.member_id
+            WHERE hm.recorded_at >= NOW() - make_interval(days => %(days)s)
+            AND (%(ids)s::INT[] IS NULL OR hm.member_id = ANY(%(ids)s))
+            AND (%(low)s::INT IS NULL OR hm.member_id >= %(low)s)
+            AND (%(high)s::INT IS NULL OR hm.member_id < %(high)s)
+            """,
+            {
+                "days": int(history_days),
+                "ids": [int(m) for m in member_ids] if member_ids is not None else None,
+                "low": low,
+                "high": high,
+            },
+        ).decode()
+        buffer = io.StringIO()
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, NULL 'nan')", buffer)
+    conn.rollback()
+
+    if not buffer.tell():
+        return tuple(np.empty(0) for _ in range(5))
+    buffer.seek(0)
+    data = np.loadtxt(buffer, delimiter=",", ndmin=2)
+    order = np.lexsort((data[:, 1], data[:, 0]))
+    data = data[order]
+    return data[:, 0].astype(np.int64), data[:, 1], data[:, 2], data[:, 3], data[:, 4]
+
+
+# ---- vectorized statistics ----
+
+def _groups(member):
+    """Group index per row and the first/last row of each group (rows sorted by member)."""
+    new_group = np.empty(len(member), dtype=bool)
+    new_group[:1] = True
+    new_group[1:] = member[1:] != member[:-1]
+    group = np.cumsum(new_group) - 1
+    starts = np.flatnonzero(new_group)
+    ends = np.append(starts[1:], len(member)) - 1
+    return group, starts, ends
+
+
+def rolling_mean(group, day, values, window):
+    """
+    For every row, the mean of its member's non-NaN values in the `window`
+    days up to and including that row (NaN if there are none).
+    """
+    valid = ~np.isnan(values)
+    total = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    count = np.concatenate(([0], np.cumsum(valid)))
+    # one sorted key across all members: members are spaced further apart
+    # than any window, so a search never crosses into the previous member
+    span = day.max() - day.min() + window + 1
+    key = group * span + (day - day.min())
+    first = np.searchsorted(key, key - window, side="right")
+    sums = total[1:] - total[first]
+    counts = count[1:] - count[first]
+    return np.divide(sums, counts, out=np.full(len(values), np.nan), where=counts > 0)
+
+
+def windowed_slope(group, rel_day, values, window, groups):
+    """
+    Least-squares slope (units per day) of each member's values over the
+    last `window` days; NaN with fewer than two readings.
+    """
+    valid = ~np.isnan(values) & (rel_day > -window)
+    w = valid.astype(float)
+    x = np.where(valid, rel_day, 0.0)
+    y = np.where(valid, values, 0.0)
+    n = np.bincount(group, weights=w, minlength=groups)
+    sx = np.bincount(group, weights=x, minlength=groups)
+    sy = np.bincount(group, weights=y, minlength=groups)
+    sxx = np.bincount(group, weights=x * x, minlength=groups)
+    sxy = np.bincount(group, weights=x * y, minlength=groups)
+    denom = n * sxx - sx * sx
+    ok = (n >= 2) & (denom > 1e-9)
+    return np.divide(n * sxy - sx * sy, denom, out=np.full(groups, np.nan), where=ok)
+
+
+def daily_minimum(group, day, values):
+    """
+    Per member and calendar day, the lowest non-NaN value (NaN if none).
+    Returns (group, day, minimum) arrays with one entry per member-day;
+    rows must be sorted by member and time.
+    """
+    calendar_day = np.floor(day)
+    new_day = np.empty(len(day), dtype=bool)
+    new_day[:1] = True
+    new_day[1:] = (group[1:] != group[:-1]) | (calendar_day[1:] != calendar_day[:-1])
+    starts = np.flatnonzero(new_day)
+    return group[starts], calendar_day[starts], np.fmin.reduceat(values, starts)
+
+
+def compute_trends(member, day, weight, heart_rate, target):
+    """MemberTrend for every member in the (sorted) arrays."""
+    _require_numpy()
+    if not len(member):
+        return []
+    group, starts, ends = _groups(member)
+    groups = len(starts)
+    last_day = day[ends]
+    rel_day = day - last_day[group]     # <= 0: days before the member's last reading
+
+    avg_7d = rolling_mean(group, day, weight, 7)[ends]
+    avg_30d = rolling_mean(group, day, weight, 30)[ends]
+    velocity = windowed_slope(group, rel_day, weight, VELOCITY_WINDOW, groups)
+    hr_group, hr_day, resting_hr = daily_minimum(group, day, heart_rate)
+    hr_drift = windowed_slope(hr_group, hr_day - np.floor(last_day)[hr_group], resting_hr,
+                              HR_DRIFT_WINDOW, groups) * 30
+
+    positions = np.where(~np.isnan(weight), np.arange(len(weight)), -1)
+    last_weight_row = np.maximum.reduceat(positions, starts)
+    latest_weight = np.where(last_weight_row >= 0, weight[np.maximum(last_weight_row, 0)], np.nan)
+
+    goal = target[starts]
+    current = np.where(np.isnan(avg_7d), latest_weight, avg_7d)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_to_target = (goal - current) / velocity
+    reached = np.abs(goal - current) < 0.25
+    days_to_target = np.where(reached, 0.0, days_to_target)
+    projectable = ~np.isnan(days_to_target) & (days_to_target >= 0) & (days_to_target <= MAX_PROJECTION_DAYS)
+    readings = np.diff(np.append(starts, len(member)))
+
+    trends = []
+    for g in range(groups):
+        trends.append(MemberTrend(
+            member_id=int(member[starts[g]]),
+            readings=int(readings[g]),
+            last_recorded=_to_datetime(last_day[g]),
+            latest_weight=_or_none(latest_weight[g]),
+            avg_7d=_or_none(avg_7d[g]),
+            avg_30d=_or_none(avg_30d[g]),
+            weight_velocity=_or_none(velocity[g] * 7, 3),
+            target_weight=_or_none(goal[g]),
+            projected_target_date=(_to_datetime(last_day[g] + days_to_target[g]).date()
+                                   if projectable[g] else None),
+            resting_hr_drift=_or_none(hr_drift[g]),
+        ))
+    return trends
+
+
+# ---- entry points ----
+
+def member_trends(conn, member_ids, history_days=HISTORY_DAYS):
+    """Trends for a member or a cohort, from one query."""
+    return compute_trends(*fetch_metric_arrays(conn, member_ids, history_days=history_days))
+
+
+def member_progress(conn, member_id, history_days=HISTORY_DAYS):
+    """
+    (MemberTrend or None, [SeriesPoint, ...]) for one member; the series
+    has the rolling 7/30-day weight averages at every reading.
+    """
+    member, day, weight, heart_rate, target = fetch_metric_arrays(conn, [member_id], history_days=history_days)
+    if not len(member):
+        return None, []
+    group = np.zeros(len(member), dtype=np.int64)
+    avg_7d = rolling_mean(group, day, weight, 7)
+    avg_30d = rolling_mean(group, day, weight, 30)
+    series = [
+        SeriesPoint(_to_datetime(d), _or_none(w), _or_none(a7), _or_none(a30), _or_none(hr, 0))
+        for d, w, a7, a30, hr in zip(day, weight, avg_7d, avg_30d, heart_rate)
+    ]
+    return compute_trends(member, day, weight, heart_rate, target)[0], series
+
+
+def analyze_membership(conn, out, batch_members=BATCH_MEMBERS, history_days=HISTORY_DAYS):
+    """
+    Compute trends for every member with metrics, `batch_members` member_ids
+    per query, writing CSV rows to the file object `out`. Returns the number
+    of members written.
+    """
+    _require_numpy()
+    with conn.cursor() as cur:
+        cur.execute("SELECT MIN(member_id), MAX(member_id) FROM Member;")
+        low, high = cur.fetchone()
+    conn.rollback()
+    writer = csv.writer(out)
+    writer.writerow(MemberTrend._fields)
+    written = 0
+    if low is None:
+        return written
+    for start in range(low, high + 1, batch_members):
+        trends = compute_trends(*fetch_metric_arrays(
+            conn, member_range=(start, start + batch_members), history_days=history_days
+        ))
+        writer.writerows(trends)
+        written += len(trends)
+    return written
+
+
+def main(argv=None):
+    from db import get_connection
+
+    parser = argparse.ArgumentParser(description="Member progress trends from HealthMetric history.")
+    parser.add_argument("members", nargs="*", type=int, help="member IDs (default: whole membership)")
+    parser.add_argument("--out", help="CSV output file (default: stdout)")
+    parser.add_argument("--days", type=int, default=HISTORY_DAYS, help="history to read per member")
+    parser.add_argument("--batch", type=int, default=BATCH_MEMBERS, help="member IDs per query")
+    args = parser.parse_args(argv)
+
+    try:
+        _require_numpy()
+    except AnalyticsUnavailable as e:
+        print(e)
+        return 1
+    conn = get_connection()
+    if not conn:
+        return 1
+    out = open(args.out, "w", newline="") if args.out else sys.stdout
+    started = time.perf_counter()
+    try:
+        if args.members:
+            trends = member_trends(conn, args.members, args.days)
+            writer = csv.writer(out)
+            writer.writerow(MemberTrend._fields)
+            writer.writerows(trends)
+            written = len(trends)
+        else:
+            written = analyze_membership(conn, out, args.batch, args.days)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        conn.close()
+    print(f"{written} members analysed in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
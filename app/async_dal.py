@@ -0,0 +1,117 @@
+from datetime import date, timedelta
+
+try:
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # optional: only the asyncio read path needs psycopg 3
+    AsyncConnectionPool = None
+
+from dal import (DASHBOARD_QUERY, MEMBER_CLASSES_QUERY, OVERVIEW_WEEKS, UPCOMING_CLASSES_QUERY,
+                 Dashboard, MemberClass, MemberOverview, UpcomingClass)
+from db import DB_CONFIG
+from rollups import PERIODS, ROLLUP_QUERY, MetricBucket
+from scheduling import AGENDA_PAGE_QUERY, AgendaItem
+
+
+# ========= ASYNC READ PATH =========
+# asyncio versions of the read-heavy member and trainer queries, for
+# services that serve many concurrent clients from one event loop instead
+# of one thread per client. They run the same SQL as the synchronous
+# functions in dal.py, scheduling.py and rollups.py and return the same
+# row types, through psycopg 3 and its async pool:
+#
+#     pool = await open_async_pool(max_size=20)
+#     async with pool.connection() as conn:
+#         overview = await fetch_member_overview(conn, member_id)
+#
+# Connections are in autocommit mode: every query here is a single
+# read-only statement, so no BEGIN/ROLLBACK round trips are needed.
+# fetch_member_overview sends its three queries in one pipeline (one
+# network round trip) instead of one after the other.
+#
+# psycopg 3 (pip install "psycopg[binary,pool]") is an optional dependency;
+# without it open_async_pool raises AsyncUnavailable and everything else
+# keeps using psycopg2.
+
+ASYNC_POOL_SIZE = 20
+
+
+class AsyncUnavailable(RuntimeError):
+    """Raised when psycopg 3 is not installed."""
+
+
+def _conninfo():
+    # psycopg2 accepts "database"; libpq (and psycopg 3) call it "dbname"
+    return {("dbname" if key == "database" else key): value for key, value in DB_CONFIG.items()}
+
+
+async def open_async_pool(min_size=1, max_size=ASYNC_POOL_SIZE, timeout=30.0):
+    """Open an AsyncConnectionPool on the application database."""
+    if AsyncConnectionPool is None:
+        raise AsyncUnavailable('The async read path needs psycopg 3 (pip install "psycopg[binary,pool]").')
+    pool = AsyncConnectionPool(
+        min_size=min_size,
+        max_size=max_size,
+        timeout=timeout,
+        kwargs=dict(_conninfo(), autocommit=True),
+        open=False,
+    )
+    await pool.open(wait=True)
+    return pool
+
+
+async def _fetch_one(conn, row_type, query, params):
+    cur = await conn.execute(query, params)
+    row = await cur.fetchone()
+    return row_type(*row) if row else None
+
+
+async def _fetch_all(conn, row_type, query, params=None):
+    cur = await conn.execute(query, params)
+    return [row_type(*r) for r in await cur.fetchall()]
+
+
+async def fetch_member_dashboard(conn, member_id):
+    """dal.fetch_member_dashboard: Dashboard, or None."""
+    return await _fetch_one(conn, Dashboard, DASHBOARD_QUERY, (member_id,))
+
+
+async def fetch_upcoming_classes(conn):
+    """dal.fetch_upcoming_classes: every class that has not started yet, soonest first."""
+    return await _fetch_all(conn, UpcomingClass, UPCOMING_CLASSES_QUERY)
+
+
+async def fetch_trainer_agenda_page(conn, trainer_id, after=None, limit=20,
+                                    starts_from=None, starts_before=None):
+    """scheduling.fetch_trainer_agenda_page: one page of AgendaItems."""
+    after_start, after_kind, after_id = after or (None, None, None)
+    return await _fetch_all(conn, AgendaItem, AGENDA_PAGE_QUERY, {
+        "trainer_id": trainer_id,
+        "starts_from": starts_from,
+        "starts_before": starts_before,
+        "after_start": after_start,
+        "after_kind": after_kind,
+        "after_id": after_id,
+        "limit": limit,
+    })
+
+
+async def fetch_member_overview(conn, member_id, classes=5, weeks=OVERVIEW_WEEKS):
+    """
+    dal.fetch_member_overview with the dashboard, registration and rollup
+    queries pipelined: all three are sent before any result is read.
+    """
+    async with conn.pipeline():
+        dashboard = await conn.execute(DASHBOARD_QUERY, (member_id,))
+        next_classes = await conn.execute(MEMBER_CLASSES_QUERY, (member_id, classes))
+        weekly = await conn.execute(
+            ROLLUP_QUERY.format(table=PERIODS["week"]),
+            {"member_id": member_id, "since": date.today() - timedelta(weeks=weeks), "until": None},
+        )
+    row = await dashboard.fetchone()
+    if row is None:
+        return MemberOverview(None, [], [])
+    return MemberOverview(
+        Dashboard(*row),
+        [MemberClass(*r) for r in await next_classes.fetchall()],
+        [MetricBucket(*r) for r in await weekly.fetchall()],
+    )
@@ -0,0 +1,296 @@
+import argparse
+import contextlib
+import inspect
+import json
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import psycopg2
+
+from dal import (insert_availability, insert_group_class, insert_health_metric, insert_member,
+                 insert_registration, insert_room, update_class, update_member)
+from db import close_pool, get_pool, run_with_connection
+from maintenance import change_ticket, insert_ticket
+from partition_maintenance import ensure_partitions
+from scheduling import reserve_pt_session
+
+
+# ========= SCRIPTED OPERATIONS =========
+# `python main.py run ops.jsonl` (or `-` for stdin) runs menu operations
+# from a file instead of the keyboard. One JSON object per line:
+#
+#     {"op": "register_member", "full_name": "Ann Lee", "email": "ann@example.com"}
+#     {"op": "register_for_class", "member_id": 12, "class_id": 40, "ref": "row-7"}
+#
+# Every other key is an argument of the operation (see OPERATIONS); "ref" is
+# optional and echoed back. Blank lines and lines starting with # are skipped.
+#
+# All operations share one pooled connection and are committed BATCH_SIZE at
+# a time. Each runs under a savepoint, so a failing line is reported and
+# skipped without losing the rest of its batch; with --stop-on-error the
+# batch containing the failure is rolled back and the run stops.
+# --dry-run keeps the whole run in one transaction and rolls it back.
+#
+# One JSON result per line is written once its batch is committed:
+#     {"line": 3, "op": "register_member", "ok": true, "result": {"member_id": 118}}
+#     {"line": 4, "op": "add_room", "ok": false, "error": "..."}
+
+BATCH_SIZE = 500
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def op_register_member(conn, full_name, email, date_of_birth=None, gender=None, phone=None,
+                       goal_description=None, target_weight=None):
+    return {"member_id": insert_member(conn, full_name, email, date_of_birth, gender, phone,
+                                       goal_description, target_weight)}
+
+
+def op_update_member(conn, member_id, email=None, phone=None, goal_description=None, target_weight=None):
+    if not update_member(conn, member_id, email, phone, goal_description, target_weight):
+        raise ValueError("Member not found.")
+    return {"member_id": member_id}
+
+
+def op_add_health_metric(conn, member_id, weight=None, heart_rate=None, body_fat_percentage=None,
+                         notes=None, recorded_at=None):
+    return {"metric_id": insert_health_metric(conn, member_id, weight, heart_rate,
+                                              body_fat_percentage, notes, recorded_at)}
+
+
+def op_register_for_class(conn, member_id, class_id):
+    return {"outcome": insert_registration(conn, member_id, class_id)}
+
+
+def op_set_availability(conn, trainer_id, day_of_week, start_time, end_time):
+    return {"availability_id": insert_availability(conn, trainer_id, day_of_week, start_time, end_time)}
+
+
+def op_add_room(conn, name, room_type, capacity):
+    return {"room_id": insert_room(conn, name, room_type, capacity)}
+
+
+def op_create_class(conn, title, start_time, end_time, capacity, trainer_id=None, room_id=None,
+                    description=None):
+    return {"class_id": insert_group_class(conn, title, start_time, end_time, capacity,
+                                           trainer_id, room_id, description)}
+
+
+def op_update_class(conn, class_id, title=None, description=None, start_time=None, end_time=None,
+                    capacity=None, trainer_id=None, room_id=None):
+    if not update_class(conn, class_id, title, description, start_time, end_time,
+                        capacity, trainer_id, room_id):
+        raise ValueError("Class not found.")
+    return {"class_id": class_id}
+
+
+def op_book_pt_session(conn, member_id, trainer_id, start_time, end_time, room_id=None):
+    pt_session_id, conflicts = reserve_pt_session(conn, member_id, trainer_id, _timestamp(start_time),
+                                                  _timestamp(end_time), room_id)
+    if pt_session_id is None:
+        raise ValueError("Slot not available: " + "; ".join(c.reason for c in conflicts))
+    return {"pt_session_id": pt_session_id}
+
+
+def op_log_equipment_issue(conn, equipment_id, issue_description, priority=3):
+    maintenance_id, equipment_status = insert_ticket(conn, equipment_id, issue_description, priority)
+    return {"maintenance_id": maintenance_id, "equipment_status": equipment_status}
+
+
+def op_update_maintenance(conn, maintenance_id, status, assigned_to=None, priority=None):
+    result = change_ticket(conn, maintenance_id, status, assigned_to, priority)
+    if result is None:
+        raise ValueError("Maintenance request not found.")
+    return {"equipment_id": result[0], "equipment_status": result[1]}
+
+
+OPERATIONS = {
+    "register_member": op_register_member,
+    "update_member": op_update_member,
+    "add_health_metric": op_add_health_metric,
+    "register_for_class": op_register_for_class,
+    "set_availability": op_set_availability,
+    "add_room": op_add_room,
+    "create_class": op_create_class,
+    "update_class": op_update_class,
+    "book_pt_session": op_book_pt_session,
+    "log_equipment_issue": op_log_equipment_issue,
+    "update_maintenance": op_update_maintenance,
+}
+
+
+def parse_operations(lines):
+    """
+    Yield (line_no, op, error) for each non-blank line: op is the decoded
+    object, or None with an error message for a malformed line.
+    """
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            op = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(op, dict) or not isinstance(op.get("op"), str):
+            yield line_no, None, 'expected an object with an "op" field'
+            continue
+        yield line_no, op, None
+
+
+def _call(conn, op):
+    name = op["op"]
+    fn = OPERATIONS.get(name)
+    if fn is None:
+        raise ValueError(f"unknown operation {name!r}")
+    args = {k: v for k, v in op.items() if k not in ("op", "ref")}
+    try:
+        inspect.signature(fn).bind(conn, **args)
+    except TypeError as e:
+        raise ValueError(f"bad arguments: {e}") from None
+    return fn(conn, **args)
+
+
+def _result(line_no, op, result=None, error=None):
+    out = {"line": line_no}
+    if op is not None:
+        if "ref" in op:
+            out["ref"] = op["ref"]
+        out["op"] = op["op"]
+    out["ok"] = error is None
+    if error is None:
+        out["result"] = result
+    else:
+        out["error"] = error
+    return out
+
+
+def _error_message(e):
+    if isinstance(e, psycopg2.Error):
+        return (e.pgerror or str(e)).strip().splitlines()[0]
+    return str(e)
+
+
+def run_operations(conn, parsed, emit, batch_size=BATCH_SIZE, stop_on_error=False, dry_run=False):
+    """
+    Run parsed operations (from parse_operations) on `conn`, committing
+    every `batch_size`; emit(result_dict) is called for each line once its
+    batch is committed. With dry_run the whole run is one transaction, so
+    later lines can use rows created by earlier batches as in a real run;
+    batches are emitted as they finish and everything is rolled back at
+    the end. Returns a Counter of ok / failed / rolled_back.
+    """
+    counts = Counter()
+    batch = []
+
+    def finish(results, failed_at=None):
+        if failed_at is not None:
+            conn.rollback()
+        elif not dry_run:
+            conn.commit()
+        for r in results:
+            if failed_at is not None and r["ok"]:
+                r = dict(r, ok=False, error=f"rolled back: line {failed_at} failed")
+                r.pop("result")
+                counts["rolled_back"] += 1
+            else:
+                counts["ok" if r["ok"] else "failed"] += 1
+            emit(r)
+
+    for line_no, op, parse_error in parsed:
+        if parse_error is not None:
+            batch.append(_result(line_no, None, error=parse_error))
+            if stop_on_error:
+                finish(batch, failed_at=line_no)
+                return counts
+        else:
+            try:
+                if stop_on_error:
+                    batch.append(_result(line_no, op, _call(conn, op)))
+                else:
+                    with conn.cursor() as cur:
+                        cur.execute("SAVEPOINT batch_op;")
+                    try:
+                        result = _call(conn, op)
+                    except (psycopg2.Error, ValueError, TypeError):
+                        with conn.cursor() as cur:
+                            cur.execute("ROLLBACK TO SAVEPOINT batch_op;")
+                        raise
+                    with conn.cursor() as cur:
+                        cur.execute("RELEASE SAVEPOINT batch_op;")
+                    batch.append(_result(line_no, op, result))
+            except (psycopg2.Error, ValueError, TypeError) as e:
+                batch.append(_result(line_no, op, error=_error_message(e)))
+                if stop_on_error:
+                    finish(batch, failed_at=line_no)
+                    return counts
+
+        if len(batch) >= batch_size:
+            finish(batch)
+            batch = []
+    if batch:
+        finish(batch)
+    if dry_run:
+        conn.rollback()
+    return counts
+
+
+def main(argv=None):
+    """Command-line entry point: python main.py run OPS.jsonl|- [--batch-size N] [--stop-on-error] [--dry-run]"""
+    parser = argparse.ArgumentParser(prog="main.py run",
+                                     description="Run health club operations from a JSON-lines file.")
+    parser.add_argument("path", help="operations file, or - for stdin")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="operations per transaction")
+    parser.add_argument("--stop-on-error", action="store_true",
+                        help="roll back the failing batch and stop at the first error")
+    parser.add_argument("--dry-run", action="store_true", help="run everything, then roll back")
+    parser.add_argument("--out", help="results file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    # stdout carries the results; keep the pool's status messages out of it
+    with contextlib.redirect_stdout(sys.stderr):
+        pool = get_pool(minconn=1, maxconn=1)
+    if not pool:
+        return 1
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+
+    def emit(result):
+        out.write(json.dumps(result, default=str) + "\n")
+
+    def run(conn):
+        # readings dated this month need their HealthMetric partition
+        try:
+            ensure_partitions(conn)
+        except psycopg2.Error as e:
+            conn.rollback()
+            print(f"Warning: could not create upcoming HealthMetric partitions: {e}", file=sys.stderr)
+        return run_operations(conn, parse_operations(source), emit,
+                              max(args.batch_size, 1), args.stop_on_error, args.dry_run)
+
+    started = time.perf_counter()
+    try:
+        # run_with_connection reports pool and connection errors with print()
+        with contextlib.redirect_stdout(sys.stderr):
+            counts = run_with_connection(pool, run)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        close_pool()
+    if counts is None:
+        return 1
+    total = sum(counts.values())
+    summary = f"{total} operations in {time.perf_counter() - started:.2f}s: {counts['ok']} ok, {counts['failed']} failed"
+    if counts["rolled_back"]:
+        summary += f", {counts['rolled_back']} rolled back"
+    if args.dry_run:
+        summary += " (dry run, nothing committed)"
+    print(summary, file=sys.stderr)
+    return 0 if total == counts["ok"] else 1
@@ -0,0 +1,99 @@
+import csv
+import sys
+from collections import Counter
+
+import psycopg2
+
+from dal import REGISTERED, register_members_for_classes
+from member_functions import REGISTRATION_MESSAGES
+
+
+# ========= BATCH CLASS REGISTRATION =========
+# Rosters from corporate partners and school programs are registered in one
+# transaction through register_batch() (migration 0012), which checks every
+# pair set-wise and inserts the accepted ones with a single statement.
+#
+# Roster CSV (header row required), either
+#     member_id,class_id            one row per registration
+# or
+#     member_id                     with --classes 12,13,14: every member
+#                                   into every listed class (a class series)
+
+
+def read_roster(path, class_ids=None):
+    """
+    Read a roster CSV. Returns (pairs, errors); pairs are (member_id, class_id)
+    in file order. With class_ids, each member row expands to all those classes.
+    """
+    pairs, errors = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                member_id = int(row["member_id"])
+                if class_ids:
+                    pairs.extend((member_id, c) for c in class_ids)
+                else:
+                    pairs.append((member_id, int(row["class_id"])))
+            except KeyError as e:
+                errors.append(f"line {line_no}: missing column {e}")
+            except (TypeError, ValueError) as e:
+                errors.append(f"line {line_no}: {e}")
+    return pairs, errors
+
+
+def print_batch_result(results, max_rejects=20, dry_run=False):
+    counts = Counter(r.outcome for r in results)
+    prefix = "[dry run] " if dry_run else ""
+    print(f"{prefix}{len(results)} pairs: " +
+          ", ".join(f"{n} {outcome}" for outcome, n in sorted(counts.items())))
+    rejected = [r for r in results if r.outcome != REGISTERED]
+    for r in rejected[:max_rejects]:
+        print(f"    member {r.member_id}, class {r.class_id}: "
+              + REGISTRATION_MESSAGES.get(r.outcome, r.outcome))
+    if len(rejected) > max_rejects:
+        print(f"    ... {len(rejected) - max_rejects} more not registered")
+
+
+def main(argv):
+    """Command-line entry point: python batch_registration.py ROSTER.csv [--classes 1,2,3] [--dry-run]"""
+    from db import get_connection
+
+    args = list(argv)
+    dry_run = "--dry-run" in args
+    if dry_run:
+        args.remove("--dry-run")
+    class_ids = None
+    if "--classes" in args:
+        i = args.index("--classes")
+        try:
+            class_ids = [int(c) for c in args[i + 1].split(",") if c.strip()]
+        except (IndexError, ValueError):
+            print("--classes needs a comma-separated list of class IDs")
+            return 1
+        del args[i:i + 2]
+    if len(args) != 1:
+        print("Usage: python batch_registration.py ROSTER.csv [--classes 1,2,3] [--dry-run]")
+        return 1
+
+    pairs, errors = read_roster(args[0], class_ids)
+    if errors:
+        print("Roster rejected, nothing was registered:")
+        for error in errors:
+            print(f"    {error}")
+        return 1
+
+    conn = get_connection()
+    if not conn:
+        return 1
+    try:
+        print_batch_result(register_members_for_classes(conn, pairs, dry_run), dry_run=dry_run)
+        return 0
+    except psycopg2.Error as e:
+        print(f"Batch registration failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
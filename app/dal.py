@@ -0,0 +1,478 @@
+from collections import namedtuple
+from datetime import date, timedelta
+
+import psycopg2
+from psycopg2 import extensions
+
+from rollups import fetch_metric_rollups
+
+
+# ========= DATA ACCESS =========
+# Members, group classes, rooms, trainers and equipment, without any console
+# I/O: functions take plain arguments and return named-tuple rows, so the
+# menus, batch mode (batch_ops.py), benchmarks and services share one code
+# path. The other areas have their own data modules in the same style:
+# scheduling.py (PT booking, trainer agenda), maintenance.py, rollups.py,
+# reports.py.
+#
+# Transactions:
+#   insert_* / update_*   run in the caller's transaction and never commit,
+#                         so several can be grouped; the caller commits
+#   fetch_* / get_*       read-only; called outside a transaction they end
+#                         the one they start, so a pooled connection is not
+#                         left idle in transaction. Inside the caller's
+#                         transaction they leave it open (and uncommitted
+#                         work intact), so they are safe between inserts
+#   register_*            commit (or roll back) themselves, as before
+# Invalid arguments raise ValueError; database errors propagate.
+
+
+# ---- row types ----
+
+MemberProfile = namedtuple("MemberProfile", [
+    "member_id", "full_name", "email", "phone", "goal_description", "target_weight",
+])
+Dashboard = namedtuple("Dashboard", [
+    "member_id", "full_name", "goal_description", "target_weight",
+    "latest_weight", "latest_heart_rate", "latest_body_fat", "upcoming_classes",
+    "avg_weight_30d", "avg_heart_rate_30d",
+])
+UpcomingClass = namedtuple("UpcomingClass", [
+    "class_id", "title", "start_time", "end_time", "capacity", "registered_count", "remaining",
+])
+MemberClass = namedtuple("MemberClass", ["class_id", "title", "start_time", "end_time", "room_id"])
+MemberOverview = namedtuple("MemberOverview", ["dashboard", "next_classes", "weekly"])
+GroupClassInfo = namedtuple("GroupClassInfo", [
+    "class_id", "title", "description", "start_time", "end_time", "capacity", "trainer_id", "room_id",
+])
+RegistrationResult = namedtuple("RegistrationResult", ["member_id", "class_id", "outcome"])
+RoomInfo = namedtuple("RoomInfo", ["room_id", "name", "room_type", "capacity"])
+TrainerInfo = namedtuple("TrainerInfo", ["trainer_id", "full_name", "email", "phone", "specialization"])
+EquipmentInfo = namedtuple("EquipmentInfo", ["equipment_id", "room_id", "name", "equipment_type", "status"])
+
+# Outcome codes returned by the register_for_class() stored function
+REGISTERED = "registered"
+CLASS_FULL = "full"
+ALREADY_REGISTERED = "duplicate"
+NOT_FOUND = "not_found"
+
+OVERVIEW_WEEKS = 12
+
+
+def _in_transaction(conn):
+    return conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE
+
+
+def _fetch_one(conn, row_type, query, params):
+    caller_transaction = _in_transaction(conn)
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        row = cur.fetchone()
+    if not caller_transaction:
+        conn.rollback()
+    return row_type(*row) if row else None
+
+
+def _fetch_all(conn, row_type, query, params=None):
+    caller_transaction = _in_transaction(conn)
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        rows = [row_type(*r) for r in cur.fetchall()]
+    if not caller_transaction:
+        conn.rollback()
+    return rows
+
+
+def _update(conn, table, key_column, key, changes, casts=None):
+    """UPDATE the non-None `changes` of one row. Returns False if there is no such row."""
+    changes = {column: value for column, value in changes.items() if value is not None}
+    if not changes:
+        raise ValueError("No changes provided.")
+    casts = casts or {}
+    with conn.cursor() as cur:
+        cur.execute(
+            f"UPDATE {table} SET "
+            + ", ".join(f"{column} = %s{casts.get(column, '')}" for column in changes)
+            + f" WHERE {key_column} = %s;",
+            tuple(changes.values()) + (key,),
+        )
+        return cur.rowcount == 1
+
+
+# ---- members ----
+
+def insert_member(conn, full_name, email, date_of_birth=None, gender=None, phone=None,
+                  goal_description=None, target_weight=None):
+    """Insert a Member. Returns the new member_id."""
+    if not full_name or not email:
+        raise ValueError("Full name and email are required.")
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO Member(
+                full_name, email, date_of_birth, gender,
+                phone, goal_description, target_weight
+            )
+            VALUES (%s, %s, %s::DATE, %s, %s, %s, %s::DECIMAL)
+            RETURNING member_id;
+            """,
+            (full_name, email, date_of_birth, gender, phone, goal_description, target_weight),
+        )
+        return cur.fetchone()[0]
+
+
+def get_member_profile(conn, member_id):
+    """MemberProfile, or None if there is no such member."""
+    return _fetch_one(
+        conn, MemberProfile,
+        "SELECT member_id, full_name, email, phone, goal_description, target_weight "
+        "FROM Member WHERE member_id = %s;",
+        (member_id,),
+    )
+
+
+def update_member(conn, member_id, email=None, phone=None, goal_description=None, target_weight=None):
+    """Change the given profile fields (None = keep). Returns False if there is no such member."""
+    return _update(conn, "Member", "member_id", member_id, {
+        "email": email,
+        "phone": phone,
+        "goal_description": goal_description,
+        "target_weight": target_weight,
+    })
+
+
+def insert_health_metric(conn, member_id, weight=None, heart_rate=None, body_fat_percentage=None,
+                         notes=None, recorded_at=None):
+    """Insert a HealthMetric reading (recorded now unless recorded_at is given). Returns the metric_id."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO HealthMetric(
+                member_id, recorded_at, weight, heart_rate,
+                body_fat_percentage, notes
+            )
+            VALUES (
+                %s,
+                COALESCE(%s::TIMESTAMP, NOW()),
+                %s::DECIMAL,
+                %s::INT,
+                %s::DECIMAL,
+                %s
+            )
+            RETURNING metric_id;
+            """,
+            (member_id, recorded_at, weight, heart_rate, body_fat_percentage, notes),
+        )
+        return cur.fetchone()[0]
+
+
+# the read queries are shared with the asyncio path (async_dal.py)
+DASHBOARD_QUERY = """
+    SELECT member_id, full_name, goal_description, target_weight,
+           latest_weight, latest_heart_rate, latest_body_fat, upcoming_classes,
+           avg_weight_30d, avg_heart_rate_30d
+    FROM member_dashboard_view
+    WHERE member_id = %s;
+"""
+
+MEMBER_CLASSES_QUERY = """
+    SELECT gc.class_id, gc.title, gc.start_time, gc.end_time, gc.room_id
+    FROM ClassRegistration cr
+    JOIN GroupClass gc ON gc.class_id = cr.class_id
+    WHERE cr.member_id = %s
+    AND gc.start_time > NOW()
+    ORDER BY gc.start_time
+    LIMIT %s;
+"""
+
+
+def fetch_member_dashboard(conn, member_id):
+    """The member_dashboard_view row of a member as a Dashboard, or None."""
+    return _fetch_one(conn, Dashboard, DASHBOARD_QUERY, (member_id,))
+
+
+def fetch_member_classes(conn, member_id, limit=5):
+    """The next `limit` classes a member is registered for (MemberClass rows), soonest first."""
+    return _fetch_all(conn, MemberClass, MEMBER_CLASSES_QUERY, (member_id, limit))
+
+
+def fetch_member_overview(conn, member_id, classes=5, weeks=OVERVIEW_WEEKS):
+    """
+    The member app's home screen as a MemberOverview: the Dashboard (None if
+    there is no such member), the next `classes` registrations and the last
+    `weeks` weekly rollups. Three queries, one after the other; see
+    async_dal.fetch_member_overview for the pipelined version.
+    """
+    dashboard = fetch_member_dashboard(conn, member_id)
+    if dashboard is None:
+        return MemberOverview(None, [], [])
+    return MemberOverview(
+        dashboard,
+        fetch_member_classes(conn, member_id, classes),
+        fetch_metric_rollups(conn, member_id, "week", date.today() - timedelta(weeks=weeks)),
+    )
+
+
+# ---- class registration ----
+
+UPCOMING_CLASSES_QUERY = """
+    SELECT class_id, title, start_time, end_time, capacity, registered_count, remaining
+    FROM GroupClass
+    WHERE start_time > NOW()
+    ORDER BY start_time;
+"""
+
+
+def fetch_upcoming_classes(conn):
+    """Every class that has not started yet, soonest first."""
+    return _fetch_all(conn, UpcomingClass, UPCOMING_CLASSES_QUERY)
+
+
+def fetch_upcoming_classes_page(conn, after=None, limit=20):
+    """
+    One page of upcoming classes (UpcomingClass), soonest first.
+    `after` is the (start_time, class_id) of the last row already shown.
+    """
+    after_start, after_id = after or (None, None)
+    return _fetch_all(
+        conn, UpcomingClass,
+        """
+        SELECT class_id, title, start_time, end_time, capacity, registered_count, remaining
+        FROM GroupClass
+        WHERE start_time > NOW()
+        AND (%(after_start)s::TIMESTAMP IS NULL
+             OR (start_time, class_id) > (%(after_start)s, %(after_id)s))
+        ORDER BY start_time, class_id
+        LIMIT %(limit)s;
+        """,
+        {"after_start": after_start, "after_id": after_id, "limit": limit},
+    )
+
+
+def upcoming_class_key(row):
+    """Keyset value of an upcoming class: (start_time, class_id)."""
+    return row.start_time, row.class_id
+
+
+def insert_registration(conn, member_id, class_id):
+    """
+    register_for_class() without committing.
+    Returns one of REGISTERED, CLASS_FULL, ALREADY_REGISTERED, NOT_FOUND.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT register_for_class(%s, %s);",
+            (member_id, class_id),
+        )
+        return cur.fetchone()[0]
+
+
+def register_member_for_class(conn, member_id, class_id):
+    """
+    Register a member for a class in a single round trip.
+    Capacity check and insert happen atomically inside register_for_class(),
+    so this is safe to call from many terminals at once.
+    Returns one of REGISTERED, CLASS_FULL, ALREADY_REGISTERED, NOT_FOUND.
+    """
+    outcome = insert_registration(conn, member_id, class_id)
+    conn.commit()
+    return outcome
+
+
+def register_members_for_classes(conn, pairs, dry_run=False):
+    """
+    Register many (member_id, class_id) pairs in one transaction.
+    register_batch() checks capacity and duplicates set-wise and inserts all
+    accepted pairs with one statement; classes that run out of seats go to
+    the earliest pairs. Returns a RegistrationResult per pair in input
+    order, outcomes as for register_member_for_class.
+    With dry_run the outcomes are computed and the transaction rolled back.
+    """
+    if not pairs:
+        return []
+    member_ids = [int(m) for m, _ in pairs]
+    class_ids = [int(c) for _, c in pairs]
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT member_id, class_id, outcome FROM register_batch(%s, %s);",
+                (member_ids, class_ids),
+            )
+            results = [RegistrationResult(*r) for r in cur.fetchall()]
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    return results
+
+
+# ---- trainers ----
+
+def fetch_trainer(conn, trainer_id):
+    """TrainerInfo, or None if there is no such trainer (see refcache.get_trainer for the cached lookup)."""
+    return _fetch_one(
+        conn, TrainerInfo,
+        "SELECT trainer_id, full_name, email, phone, specialization FROM Trainer WHERE trainer_id = %s;",
+        (trainer_id,),
+    )
+
+
+def insert_availability(conn, trainer_id, day_of_week, start_time, end_time):
+    """Insert a weekly availability slot. Returns the new availability_id."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO TrainerAvailability(trainer_id, day_of_week, start_time, end_time)
+            VALUES (%s, %s, %s::TIME, %s::TIME)
+            RETURNING availability_id;
+            """,
+            (trainer_id, day_of_week, start_time, end_time),
+        )
+        return cur.fetchone()[0]
+
+
+# ---- rooms and equipment ----
+
+def fetch_room(conn, room_id):
+    """RoomInfo, or None if there is no such room (see refcache.get_room for the cached lookup)."""
+    return _fetch_one(
+        conn, RoomInfo,
+        "SELECT room_id, name, room_type, capacity FROM Room WHERE room_id = %s;",
+        (room_id,),
+    )
+
+
+def fetch_rooms_page(conn, after=None, limit=20, room_type=None):
+    """One page of rooms (RoomInfo) ordered by room_id, starting after room_id `after`."""
+    return _fetch_all(
+        conn, RoomInfo,
+        """
+        SELECT room_id, name, room_type, capacity
+        FROM Room
+        WHERE (%(after)s::INT IS NULL OR room_id > %(after)s)
+        AND (%(room_type)s::TEXT IS NULL OR room_type ILIKE %(room_type)s)
+        ORDER BY room_id
+        LIMIT %(limit)s;
+        """,
+        {"after": after, "room_type": room_type, "limit": limit},
+    )
+
+
+def insert_room(conn, name, room_type, capacity):
+    """Insert a Room. Returns the new room_id."""
+    if int(capacity) <= 0:
+        raise ValueError("Capacity must be a positive integer.")
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO Room(name, room_type, capacity)
+            VALUES (%s, %s, %s)
+            RETURNING room_id;
+            """,
+            (name, room_type, int(capacity)),
+        )
+        return cur.fetchone()[0]
+
+
+def fetch_equipment(conn, equipment_id):
+    """EquipmentInfo, or None (see refcache.get_equipment for the cached lookup)."""
+    return _fetch_one(
+        conn, EquipmentInfo,
+        "SELECT equipment_id, room_id, name, equipment_type, status FROM Equipment WHERE equipment_id = %s;",
+        (equipment_id,),
+    )
+
+
+# ---- group classes ----
+
+def _check_room_capacity(cur, room_id, capacity):
+    cur.execute("SELECT capacity FROM Room WHERE room_id = %s;", (room_id,))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError("Room not found.")
+    if row[0] is not None and row[0] < int(capacity):
+        raise ValueError(f"Room {room_id} only holds {row[0]}; class capacity is {capacity}.")
+
+
+def get_group_class(conn, class_id):
+    """GroupClassInfo, or None if there is no such class."""
+    return _fetch_one(
+        conn, GroupClassInfo,
+        """
+        SELECT class_id, title, description, start_time, end_time,
+               capacity, trainer_id, room_id
+        FROM GroupClass
+        WHERE class_id = %s;
+        """,
+        (class_id,),
+    )
+
+
+def insert_group_class(conn, title, start_time, end_time, capacity, trainer_id=None, room_id=None,
+                       description=None):
+    """Insert a GroupClass, checking that the room (if any) holds `capacity`. Returns the new class_id."""
+    if int(capacity) <= 0:
+        raise ValueError("Capacity must be a positive integer.")
+    with conn.cursor() as cur:
+        if room_id is not None:
+            _check_room_capacity(cur, room_id, capacity)
+        cur.execute(
+            """
+            INSERT INTO GroupClass(
+                title, description, start_time, end_time,
+                capacity, trainer_id, room_id
+            )
+            VALUES (
+                %s, %s,
+                %s::TIMESTAMP, %s::TIMESTAMP,
+                %s, %s, %s
+            )
+            RETURNING class_id;
+            """,
+            (title, description, start_time, end_time, int(capacity), trainer_id, room_id),
+        )
+        return cur.fetchone()[0]
+
+
+def update_class(conn, class_id, title=None, description=None, start_time=None, end_time=None,
+                 capacity=None, trainer_id=None, room_id=None):
+    """Change the given GroupClass fields (None = keep). Returns False if there is no such class."""
+    if capacity is not None:
+        capacity = int(capacity)
+    if room_id is not None or capacity is not None:
+        # the class must still fit its room, whichever of the two changes
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT COALESCE(%s::INT, room_id), COALESCE(%s::INT, capacity) "
+                "FROM GroupClass WHERE class_id = %s;",
+                (room_id, capacity, class_id),
+            )
+            row = cur.fetchone()
+            if row is None:
+                return False
+            new_room, new_capacity = row
+            if new_room is not None and new_capacity is not None:
+                _check_room_capacity(cur, new_room, new_capacity)
+    return _update(
+        conn, "GroupClass", "class_id", class_id,
+        {
+            "title": title,
+            "description": description,
+            "start_time": start_time,
+            "end_time": end_time,
+            "capacity": capacity,
+            "trainer_id": trainer_id,
+            "room_id": room_id,
+        },
+        casts={"start_time": "::TIMESTAMP", "end_time": "::TIMESTAMP"},
+    )
+
+
+def recount_registrations(conn):
+    """repair_registration_counts(): fix drifted registered_count values. Returns the number corrected."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT repair_registration_counts();")
+        return cur.fetchone()[0]
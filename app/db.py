@@ -1,14 +1,26 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import extensions
+
+from instrument import TimedCursor, timed_operation, set_application_name
+
+
+DB_CONFIG = {
+    "host": "localhost",
+    "database": "comp3005FinalProject",
+    "user": "postgres",
+    "password": "password",
+    "port": "5432",
+}
+
 
 def get_connection():
     try:
-        conn = psycopg2.connect(
-            host="localhost",
-            database="comp3005FinalProject",    
-            user="postgres",          
-            password="password", 
-            port="5432"               
-        )
+        conn = psycopg2.connect(**DB_CONFIG)
         print("Database connection successful!")
         return conn
 
@@ -16,3 +28,292 @@ def get_connection():
         print("Database connection failed!")
         print("Error:", e)
         return None
+
+
+# ========= CONNECTION POOL =========
+# Connections are borrowed per operation and handed back afterwards, so
+# several terminals (and the reporting job) share a small set of backends
+# instead of each holding one open for the whole session.
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool.
+
+    - minconn / maxconn: number of connections kept open / allowed in total
+    - timeout: seconds to wait for a free connection before PoolTimeout
+    - max_lifetime: seconds after which a connection is closed and replaced
+    - validate: run a cheap query on checkout and discard dead connections
+    - autocommit: open connections in autocommit mode (for read-only callers)
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=30.0,
+                 max_lifetime=3600.0, validate=True, autocommit=False, **conn_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: need 0 <= minconn <= maxconn, maxconn >= 1.")
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.validate = validate
+        self.autocommit = autocommit
+        self.conn_kwargs = dict(DB_CONFIG, **conn_kwargs)
+
+        self._lock = threading.Condition()
+        self._idle = []          # connections ready to hand out (LIFO)
+        self._created = {}       # id(conn) -> creation timestamp
+        self._in_use = set()     # id(conn) of checked-out connections
+        self._closed = False
+
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+
+    # ---- internals ----
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.conn_kwargs)
+        conn.autocommit = self.autocommit
+        self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _expired(self, conn):
+        if not self.max_lifetime:
+            return False
+        born = self._created.get(id(conn), 0)
+        return time.monotonic() - born > self.max_lifetime
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        if not self.validate:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+                cur.fetchone()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    # ---- public API ----
+
+    def getconn(self):
+        """
+        Check out a connection, waiting up to `timeout` seconds.
+        Idle connections that are expired or fail validation are evicted.
+        """
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise psycopg2.InterfaceError("Connection pool is closed.")
+
+                conn = None
+                while self._idle:
+                    candidate = self._idle.pop()
+                    if self._expired(candidate) or candidate.closed:
+                        self._discard(candidate)
+                        continue
+                    conn = candidate
+                    break
+
+                if conn is None:
+                    if len(self._created) < self.maxconn:
+                        # reserve the slot before connecting outside the lock
+                        placeholder = object()
+                        self._created[id(placeholder)] = time.monotonic()
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeout(
+                                f"No connection available after {self.timeout} seconds."
+                            )
+                        self._lock.wait(remaining)
+                        continue
+
+            if conn is None:
+                try:
+                    conn = psycopg2.connect(**self.conn_kwargs)
+                    conn.autocommit = self.autocommit
+                except BaseException:
+                    # the reserved slot is free again; wake a waiter to use it
+                    with self._lock:
+                        self._created.pop(id(placeholder), None)
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._created.pop(id(placeholder), None)
+                    self._created[id(conn)] = time.monotonic()
+            elif not self._healthy(conn):
+                with self._lock:
+                    self._discard(conn)
+                    self._lock.notify()
+                continue
+
+            with self._lock:
+                self._in_use.add(id(conn))
+            return conn
+
+    def putconn(self, conn, broken=False):
+        """
+        Return a connection to the pool. Any open transaction is rolled back.
+        Broken, closed or expired connections are closed instead of reused.
+        """
+        with self._lock:
+            self._in_use.discard(id(conn))
+
+            if not broken and not conn.closed:
+                try:
+                    status = conn.get_transaction_status()
+                    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                        broken = True
+                    elif status != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+
+            if (broken or conn.closed or self._closed or self._expired(conn)
+                    or len(self._idle) >= self.maxconn):
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a `with` block.
+        The connection is evicted if it was lost while in use.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn, broken=bool(conn.closed))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._created),
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+            }
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            for conn in self._idle:
+                self._discard(conn)
+            self._idle.clear()
+            self._lock.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(**pool_kwargs):
+    """
+    Return the process-wide connection pool, creating it on first use.
+    Returns None (after printing the error) if the database is unreachable.
+    """
+    global _pool
+    pool_kwargs.setdefault("cursor_factory", TimedCursor)
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = ConnectionPool(**pool_kwargs)
+                print("Database connection pool ready!")
+            except Exception as e:
+                print("Database connection failed!")
+                print("Error:", e)
+                return None
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def run_with_connection(pool, operation, *args):
+    """
+    Borrow a pooled connection, run one menu operation with it, hand it back.
+    Queries are timed under "<role>.<function name>", e.g. "member.view_member_dashboard",
+    and the session's application_name is set to the role.
+    """
+    role = operation.__module__.split("_")[0]
+    try:
+        with pool.connection() as conn, timed_operation(f"{role}.{operation.__name__}"):
+            set_application_name(conn, f"healthclub-{role}")
+            return operation(conn, *args)
+    except PoolTimeout as e:
+        print(f"Database busy, please try again: {e}")
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        print(f"Lost database connection: {e}")
+
+
+# ========= KEYSET PAGINATION =========
+# Listings fetch one page per short query, keyed on the last row shown,
+# instead of fetchall() on an unbounded result. No server-side cursor is
+# held open between pages, but menu listings run inside
+# run_with_connection, so the pooled connection stays checked out (idle,
+# in the transaction of the earlier pages) until the user stops paging.
+
+PAGE_SIZE = int(os.environ.get("HEALTHCLUB_PAGE_SIZE", "20"))
+
+
+def iter_keyset_pages(fetch_page, key, page_size=None):
+    """
+    Yield (rows, has_more) pages. fetch_page(after, limit) must return rows
+    ordered by the keyset, starting after `after` (None for the first page);
+    key(row) extracts the keyset value of a row.
+    """
+    page_size = page_size or PAGE_SIZE
+    after = None
+    while True:
+        rows = fetch_page(after, page_size + 1)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if rows:
+            yield rows, has_more
+        if not has_more:
+            return
+        after = key(rows[-1])
+
+
+def print_pages(pages, print_row, empty_message):
+    """
+    Print rows page by page, asking before fetching the next page.
+    Returns the number of rows shown.
+    """
+    shown = 0
+    for rows, has_more in pages:
+        for r in rows:
+            print_row(r)
+        shown += len(rows)
+        if has_more and input(f"-- {shown} shown. Enter for more, q to stop: ").strip().lower() == "q":
+            break
+    if not shown:
+        print(empty_message)
+    return shown
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from db import iter_keyset_pages
+from scheduling import agenda_key, fetch_trainer_agenda_page
+
+
+# ========= TRAINER CALENDAR FEED (.ics) =========
+# A trainer's classes and PT sessions as an RFC 5545 calendar, for export
+# or for a calendar app to subscribe to.
+#
+# Feeds are cached per trainer. Trainer.schedule_version is bumped by
+# triggers whenever one of the trainer's classes or sessions changes
+# (migration 0010), so a poll costs one primary-key lookup while nothing
+# has changed, and no query at all within FEED_TTL seconds. When the
+# version moves, the agenda is re-read and only events whose row changed
+# are rendered again.
+
+# how far back / ahead the feed reaches
+FEED_PAST = timedelta(days=30)
+FEED_FUTURE = timedelta(days=180)
+
+# seconds a cached feed is served without checking schedule_version
+FEED_TTL = float(os.environ.get("HEALTHCLUB_FEED_TTL", "30"))
+
+PRODID = "-//Health Club//Trainer Schedule//EN"
+UID_DOMAIN = "healthclub"
+
+Feed = namedtuple("Feed", ["trainer_id", "etag", "body", "not_modified"])
+
+# trainer_id -> {"etag", "body", "checked", "events": {(kind, id): (row, text)}}
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _escape(value):
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _fold(line):
+    """Fold a content line at 75 octets, without splitting a UTF-8 character."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode("utf-8"))
+        start, limit = end, 74  # continuation lines start with a space
+    return "\r\n ".join(parts)
+
+
+def _stamp(value):
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def render_event(row, dtstamp):
+    """One VEVENT for an agenda row (a scheduling.AgendaItem)."""
+    kind, item_id, title, start_time, end_time, room_id, member_id, status = row
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{kind}-{item_id}@{UID_DOMAIN}",
+        f"DTSTAMP:{dtstamp}",
+        # floating local times, as stored in the database
+        f"DTSTART:{_stamp(start_time)}",
+        f"DTEND:{_stamp(end_time)}",
+        f"SUMMARY:{_escape(title)}",
+    ]
+    if room_id is not None:
+        lines.append(f"LOCATION:{_escape(f'Room {room_id}')}")
+    if kind == "pt":
+        lines.append(f"DESCRIPTION:{_escape(f'Status: {status}')}")
+        if status and status.strip().lower() in ("cancelled", "canceled"):
+            lines.append("STATUS:CANCELLED")
+    lines.append("END:VEVENT")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+
+def _schedule_version(conn, trainer_id):
+    with conn.cursor() as cur:
+        cur.execute("SELECT schedule_version FROM Trainer WHERE trainer_id = %s;", (trainer_id,))
+        row = cur.fetchone()
+    conn.rollback()
+    return None if row is None else row[0]
+
+
+def _agenda_rows(conn, trainer_id, window_start, window_end):
+    for rows, _ in iter_keyset_pages(
+        lambda after, limit: fetch_trainer_agenda_page(
+            conn, trainer_id, after, limit, window_start, window_end
+        ),
+        key=agenda_key,
+        page_size=500,
+    ):
+        yield from rows
+
+
+def trainer_feed(conn, trainer_id, if_none_match=None):
+    """
+    Return the trainer's calendar as a Feed, or None if the trainer does
+    not exist. If `if_none_match` equals the current ETag, the Feed has
+    not_modified set and the caller may skip sending the body.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(trainer_id)
+        if entry and now - entry["checked"] < FEED_TTL:
+            return Feed(trainer_id, entry["etag"], entry["body"], entry["etag"] == if_none_match)
+
+    version = _schedule_version(conn, trainer_id)
+    if version is None:
+        with _cache_lock:
+            _cache.pop(trainer_id, None)
+        return None
+
+    # the window moves once a day, so the day is part of the ETag
+    today = date.today()
+    etag = f'"{trainer_id}-{version}-{today:%Y%m%d}"'
+    with _cache_lock:
+        entry = _cache.get(trainer_id)
+        if entry and entry["etag"] == etag:
+            entry["checked"] = now
+            return Feed(trainer_id, etag, entry["body"], etag == if_none_match)
+        old_events = entry["events"] if entry else {}
+
+    window_start = datetime.combine(today, datetime.min.time()) - FEED_PAST
+    dtstamp = _stamp(datetime.now())
+    events = {}
+    for row in _agenda_rows(conn, trainer_id, window_start, window_start + FEED_PAST + FEED_FUTURE):
+        key = (row.kind, row.item_id)
+        cached = old_events.get(key)
+        events[key] = cached if cached and cached[0] == row else (row, render_event(row, dtstamp))
+
+    body = "".join([
+        "BEGIN:VCALENDAR\r\n",
+        "VERSION:2.0\r\n",
+        f"PRODID:{PRODID}\r\n",
+        "CALSCALE:GREGORIAN\r\n",
+        _fold(f"X-WR-CALNAME:{_escape(f'Trainer {trainer_id} schedule')}") + "\r\n",
+        *(text for _, text in events.values()),
+        "END:VCALENDAR\r\n",
+    ])
+
+    with _cache_lock:
+        _cache[trainer_id] = {"etag": etag, "body": body, "checked": now, "events": events}
+    return Feed(trainer_id, etag, body, etag == if_none_match)
+
+
+def clear_feed_cache(trainer_id=None):
+    with _cache_lock:
+        if trainer_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(trainer_id, None)
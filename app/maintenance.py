@@ -0,0 +1,271 @@
+from collections import namedtuple
+
+import psycopg2
+
+from refcache import REFDATA
+
+
+# ========= MAINTENANCE WORK QUEUE =========
+# Unresolved tickets (status 'Open' or 'In Progress') ordered by priority,
+# then age. The queue queries filter on status <> 'Resolved' so they are
+# answered from the partial indexes of migration 0017, which only hold the
+# open backlog; the history of resolved tickets is never read. The full
+# history is paged newest first by fetch_maintenance_page.
+#
+# Equipment.status is kept in step with the tickets by the triggers of
+# migration 0016, inside the same transaction as the ticket change.
+
+STATUSES = ("Open", "In Progress", "Resolved")
+PRIORITIES = {1: "Critical", 2: "High", 3: "Normal", 4: "Low"}
+DEFAULT_PRIORITY = 3
+
+QueueItem = namedtuple("QueueItem", [
+    "maintenance_id", "priority", "reported_at", "status", "assigned_to",
+    "equipment_id", "equipment_name", "room_id", "issue_description",
+])
+EquipmentBacklog = namedtuple("EquipmentBacklog", [
+    "equipment_id", "equipment_name", "room_id", "equipment_status",
+    "open_tickets", "top_priority", "oldest_reported_at",
+])
+MaintenanceRecord = namedtuple("MaintenanceRecord", [
+    "maintenance_id", "equipment_id", "equipment_name", "issue_description", "status",
+    "reported_at", "assigned_to", "resolved_at", "priority",
+])
+RoomOldest = namedtuple("RoomOldest", [
+    "room_id", "room_name", "maintenance_id", "priority", "reported_at",
+    "equipment_id", "equipment_name", "issue_description",
+])
+
+
+def normalize_status(status):
+    """The canonical spelling of a ticket status, or None if it isn't one."""
+    for canonical in STATUSES:
+        if status.strip().lower() == canonical.lower():
+            return canonical
+    return None
+
+
+def fetch_work_queue(conn, after=None, limit=20, room_id=None, max_priority=None):
+    """
+    One page of the open work queue: most urgent first, then oldest.
+    `after` is the (priority, reported_at, maintenance_id) of the last row
+    already shown; room_id and max_priority (e.g. 2 = critical and high
+    only) are optional filters.
+    """
+    after_priority, after_reported, after_id = after or (None, None, None)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT em.maintenance_id, em.priority, em.reported_at, em.status, em.assigned_to,
+                   e.equipment_id, e.name, e.room_id, em.issue_description
+            FROM EquipmentMaintenance em
+            JOIN Equipment e ON e.equipment_id = em.equipment_id
+            WHERE em.status <> 'Resolved'
+            AND (%(after_priority)s::SMALLINT IS NULL
+                 OR (em.priority, em.reported_at, em.maintenance_id)
+                    > (%(after_priority)s, %(after_reported)s, %(after_id)s))
+            AND (%(max_priority)s::SMALLINT IS NULL OR em.priority <= %(max_priority)s)
+            AND (%(room_id)s::INT IS NULL OR e.room_id = %(room_id)s)
+            ORDER BY em.priority, em.reported_at, em.maintenance_id
+            LIMIT %(limit)s;
+            """,
+            {
+                "after_priority": after_priority,
+                "after_reported": after_reported,
+                "after_id": after_id,
+                "max_priority": max_priority,
+                "room_id": room_id,
+                "limit": limit,
+            },
+        )
+        rows = [QueueItem(*r) for r in cur.fetchall()]
+    conn.rollback()
+    return rows
+
+
+def queue_key(item):
+    return (item.priority, item.reported_at, item.maintenance_id)
+
+
+def fetch_maintenance_page(conn, after=None, limit=20, status=None,
+                           reported_from=None, reported_to=None):
+    """
+    One page of maintenance requests (MaintenanceRecord), newest first,
+    resolved ones included.
+    `after` is the (reported_at, maintenance_id) of the last row already shown;
+    status and the reported_at range [reported_from, reported_to) are optional filters.
+    """
+    after_reported, after_id = after or (None, None)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT em.maintenance_id,
+                   e.equipment_id,
+                   e.name,
+                   em.issue_description,
+                   em.status,
+                   em.reported_at,
+                   em.assigned_to,
+                   em.resolved_at,
+                   em.priority
+            FROM EquipmentMaintenance em
+            JOIN Equipment e ON em.equipment_id = e.equipment_id
+            WHERE (%(after_reported)s::TIMESTAMP IS NULL
+                   OR (em.reported_at, em.maintenance_id) < (%(after_reported)s, %(after_id)s))
+            AND (%(status)s::TEXT IS NULL OR em.status ILIKE %(status)s)
+            AND (%(reported_from)s::TIMESTAMP IS NULL OR em.reported_at >= %(reported_from)s)
+            AND (%(reported_to)s::TIMESTAMP IS NULL OR em.reported_at < %(reported_to)s)
+            ORDER BY em.reported_at DESC, em.maintenance_id DESC
+            LIMIT %(limit)s;
+            """,
+            {
+                "after_reported": after_reported,
+                "after_id": after_id,
+                "status": status,
+                "reported_from": reported_from,
+                "reported_to": reported_to,
+                "limit": limit,
+            },
+        )
+        rows = [MaintenanceRecord(*r) for r in cur.fetchall()]
+    conn.rollback()
+    return rows
+
+
+def fetch_open_by_equipment(conn, room_id=None):
+    """Machines with open tickets, grouped: most urgent, then longest waiting, first."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT e.equipment_id, e.name, e.room_id, e.status,
+                   t.open_tickets, t.top_priority, t.oldest_reported_at
+            FROM (
+                SELECT equipment_id,
+                       COUNT(*) AS open_tickets,
+                       MIN(priority) AS top_priority,
+                       MIN(reported_at) AS oldest_reported_at
+                FROM EquipmentMaintenance
+                WHERE status <> 'Resolved'
+                GROUP BY equipment_id
+            ) t
+            JOIN Equipment e ON e.equipment_id = t.equipment_id
+            WHERE (%(room_id)s::INT IS NULL OR e.room_id = %(room_id)s)
+            ORDER BY t.top_priority, t.oldest_reported_at, e.equipment_id;
+            """,
+            {"room_id": room_id},
+        )
+        rows = [EquipmentBacklog(*r) for r in cur.fetchall()]
+    conn.rollback()
+    return rows
+
+
+def fetch_oldest_open_per_room(conn):
+    """
+    The longest-waiting open ticket in each room (rooms without open tickets
+    are omitted; equipment not in a room is grouped under room None).
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT DISTINCT ON (e.room_id)
+                   e.room_id, r.name, em.maintenance_id, em.priority, em.reported_at,
+                   e.equipment_id, e.name, em.issue_description
+            FROM EquipmentMaintenance em
+            JOIN Equipment e ON e.equipment_id = em.equipment_id
+            LEFT JOIN Room r ON r.room_id = e.room_id
+            WHERE em.status <> 'Resolved'
+            ORDER BY e.room_id, em.reported_at, em.maintenance_id;
+            """
+        )
+        rows = [RoomOldest(*r) for r in cur.fetchall()]
+    conn.rollback()
+    return rows
+
+
+def insert_ticket(conn, equipment_id, issue_description, priority=DEFAULT_PRIORITY):
+    """
+    Open a ticket in the caller's transaction (nothing is committed).
+    Returns (maintenance_id, equipment status after the change).
+    """
+    if int(priority) not in PRIORITIES:
+        raise ValueError(f"Priority must be one of {', '.join(map(str, PRIORITIES))}.")
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO EquipmentMaintenance(equipment_id, issue_description, status, priority)
+            VALUES (%s, %s, 'Open', %s)
+            RETURNING maintenance_id;
+            """,
+            (equipment_id, issue_description, int(priority)),
+        )
+        maintenance_id = cur.fetchone()[0]
+        cur.execute("SELECT status FROM Equipment WHERE equipment_id = %s;", (equipment_id,))
+        return maintenance_id, cur.fetchone()[0]
+
+
+def change_ticket(conn, maintenance_id, status, assigned_to=None, priority=None):
+    """
+    Change a ticket's status (and optionally assignee and priority) in the
+    caller's transaction. resolved_at is set when it becomes Resolved and
+    cleared otherwise. Returns (equipment_id, equipment status after the
+    change), or None if there is no such ticket.
+    """
+    canonical = normalize_status(status)
+    if canonical is None:
+        raise ValueError("Status must be Open, In Progress or Resolved.")
+    if priority is not None and int(priority) not in PRIORITIES:
+        raise ValueError(f"Priority must be one of {', '.join(map(str, PRIORITIES))}.")
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE EquipmentMaintenance
+            SET status = %(status)s,
+                assigned_to = NULLIF(%(assigned_to)s, ''),
+                priority = COALESCE(%(priority)s, priority),
+                resolved_at = CASE WHEN %(status)s = 'Resolved'
+                                   THEN COALESCE(resolved_at, NOW()) END
+            WHERE maintenance_id = %(maintenance_id)s
+            RETURNING equipment_id;
+            """,
+            {
+                "status": canonical,
+                "assigned_to": assigned_to or "",
+                "priority": priority,
+                "maintenance_id": maintenance_id,
+            },
+        )
+        row = cur.fetchone()
+        if row is None:
+            return None
+        cur.execute("SELECT status FROM Equipment WHERE equipment_id = %s;", row)
+        return row[0], cur.fetchone()[0]
+
+
+def log_ticket(conn, equipment_id, issue_description, priority=DEFAULT_PRIORITY):
+    """Open a ticket. Returns (maintenance_id, equipment status after the change)."""
+    try:
+        result = insert_ticket(conn, equipment_id, issue_description, priority)
+        conn.commit()
+    except (psycopg2.Error, ValueError):
+        conn.rollback()
+        raise
+    REFDATA.invalidate("equipment", int(equipment_id))
+    return result
+
+
+def update_ticket(conn, maintenance_id, status, assigned_to=None, priority=None):
+    """
+    Change a ticket and commit. Returns (equipment_id, equipment status after
+    the change), or None if there is no such ticket.
+    """
+    try:
+        result = change_ticket(conn, maintenance_id, status, assigned_to, priority)
+        if result is None:
+            conn.rollback()
+            return None
+        conn.commit()
+    except (psycopg2.Error, ValueError):
+        conn.rollback()
+        raise
+    REFDATA.invalidate("equipment", result[0])
+    return result
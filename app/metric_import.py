@@ -0,0 +1,292 @@
+import csv
+import json
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+import psycopg2
+
+
+# ========= BULK HEALTH METRIC IMPORT =========
+# Wearable exports (CSV with a header row, or JSON lines) are streamed into
+# a temporary staging table with COPY and then moved into HealthMetric with
+# one INSERT ... SELECT. Original timestamps are kept, readings that are
+# already loaded (same member_id + recorded_at) are skipped and bad rows
+# are reported instead of aborting the whole file. Readings in a month that
+# partition_maintenance.py has archived are rejected until it is restored.
+
+COLUMNS = ("member_id", "recorded_at", "weight", "heart_rate", "body_fat_percentage", "notes")
+
+ImportResult = namedtuple("ImportResult", ["read", "loaded", "duplicates", "rejected"])
+# rejected is a list of (line_number, reason)
+
+
+def _parse_decimal(value, field):
+    if value in (None, ""):
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"{field} is not a number: {value}") from None
+    # round as DECIMAL(5,2) will before checking, so 999.996 is rejected
+    # here rather than overflowing inside COPY
+    if not number.is_finite():
+        raise ValueError(f"{field} out of range: {value}")
+    number = number.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    if abs(number) >= 1000:
+        raise ValueError(f"{field} out of range: {value}")
+    return str(number)
+
+
+def _parse_int(value, field):
+    if value in (None, ""):
+        return None
+    number = int(value) if isinstance(value, int) else int(float(value))
+    if not -2**31 <= number < 2**31:
+        raise ValueError(f"{field} out of range: {value}")
+    return str(number)
+
+
+def _parse_timestamp(value):
+    if not value:
+        raise ValueError("recorded_at is required")
+    # accept a trailing Z from wearable exports; the offset is kept and
+    # load_health_metrics converts it to the database session's time zone
+    recorded_at = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return recorded_at.isoformat(" ")
+
+
+def _escape(value):
+    """Encode one value in COPY text format."""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _read_records(path):
+    """Yield (line_number, dict) from a CSV or JSONL file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_no, e
+                    continue
+                yield line_no, record if isinstance(record, dict) else ValueError("not a JSON object")
+        else:
+            reader = csv.DictReader(f)
+            missing = {"member_id", "recorded_at"} - set(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f"CSV header is missing: {', '.join(sorted(missing))}")
+            # header is line 1
+            for line_no, record in enumerate(reader, start=2):
+                yield line_no, record
+
+
+class _CopyStream:
+    """
+    File-like object that feeds validated rows to COPY as they are parsed,
+    so memory use does not depend on the size of the export.
+    """
+
+    def __init__(self, records, rejected):
+        self._records = records
+        self._rejected = rejected
+        self._buffer = ""
+        self.read_count = 0
+
+    def _next_line(self):
+        for line_no, record in self._records:
+            self.read_count += 1
+            if isinstance(record, Exception):
+                self._rejected.append((line_no, f"invalid JSON: {record}"))
+                continue
+            try:
+                values = (
+                    str(line_no),
+                    _parse_int(record.get("member_id"), "member_id"),
+                    _parse_timestamp(record.get("recorded_at")),
+                    _parse_decimal(record.get("weight"), "weight"),
+                    _parse_int(record.get("heart_rate"), "heart_rate"),
+                    _parse_decimal(record.get("body_fat_percentage"), "body_fat_percentage"),
+                    record.get("notes") or None,
+                )
+            except (TypeError, ValueError) as e:
+                self._rejected.append((line_no, str(e)))
+                continue
+            if values[1] is None:
+                self._rejected.append((line_no, "member_id is required"))
+                continue
+            return "\t".join(_escape(v) for v in values) + "\n"
+        return ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = self._next_line()
+            if not line:
+                break
+            self._buffer += line
+        if size < 0:
+            chunk, self._buffer = self._buffer, ""
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def load_health_metrics(conn, path):
+    """
+    Bulk-load a CSV/JSONL export into HealthMetric in one transaction.
+    Returns an ImportResult. Raises psycopg2.Error or ValueError (unreadable
+    file, e.g. a CSV without the required header) after rolling back.
+    """
+    rejected = []
+    stream = _CopyStream(_read_records(path), rejected)
+
+    try:
+        with conn.cursor() as cur:
+            # one import at a time, so two copies of the same export
+            # cannot both pass the duplicate check
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('healthmetric_import'));")
+            cur.execute(
+                """
+                CREATE TEMP TABLE metric_staging (
+                    line_no             INT,
+                    member_id           INT,
+                    recorded_at         TIMESTAMPTZ,
+                    weight              DECIMAL(5,2),
+                    heart_rate          INT,
+                    body_fat_percentage DECIMAL(5,2),
+                    notes               TEXT
+                ) ON COMMIT DROP;
+                """
+            )
+            cur.copy_expert("COPY metric_staging FROM STDIN;", stream, size=65536)
+            # HealthMetric.recorded_at is local time of the database session
+            # (like NOW()): readings with a UTC offset are converted to it,
+            # naive ones are read as already being in it
+            cur.execute(
+                """
+                ALTER TABLE metric_staging
+                ALTER COLUMN recorded_at TYPE TIMESTAMP
+                USING recorded_at AT TIME ZONE current_setting('TimeZone');
+                """
+            )
+            cur.execute("ANALYZE metric_staging;")
+            # archived months stay archived: re-creating the partition would
+            # make the next archive run replace the archive file
+            cur.execute(
+                """
+                DELETE FROM metric_staging s
+                USING HealthMetricArchive a
+                WHERE s.recorded_at >= a.range_start
+                AND s.recorded_at < a.range_end
+                RETURNING s.line_no, a.partition_name;
+                """
+            )
+            archived = [(line_no, f"month is archived ({name}); restore it first")
+                        for line_no, name in cur.fetchall()]
+            # HealthMetric is partitioned by month; old exports may need their
+            # months back. Only the months left in staging, so an import that
+            # spans an archived month does not re-create it empty
+            cur.execute(
+                """
+                SELECT create_healthmetric_partitions(m.month, m.month)
+                FROM (SELECT DISTINCT date_trunc('month', recorded_at) AS month
+                      FROM metric_staging) m;
+                """
+            )
+
+            cur.execute(
+                """
+                SELECT s.line_no
+                FROM metric_staging s
+                WHERE NOT EXISTS (SELECT 1 FROM Member m WHERE m.member_id = s.member_id)
+                ORDER BY s.line_no;
+                """
+            )
+            unknown = [(r[0], "unknown member_id") for r in cur.fetchall()]
+
+            cur.execute(
+                """
+                INSERT INTO HealthMetric(
+                    member_id, recorded_at, weight, heart_rate,
+                    body_fat_percentage, notes
+                )
+                SELECT DISTINCT ON (s.member_id, s.recorded_at)
+                       s.member_id, s.recorded_at, s.weight, s.heart_rate,
+                       s.body_fat_percentage, s.notes
+                FROM metric_staging s
+                JOIN Member m ON m.member_id = s.member_id
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM HealthMetric hm
+                    WHERE hm.member_id = s.member_id
+                    AND hm.recorded_at = s.recorded_at
+                )
+                ORDER BY s.member_id, s.recorded_at, s.line_no;
+                """
+            )
+            loaded = cur.rowcount
+        conn.commit()
+    except (psycopg2.Error, ValueError):
+        conn.rollback()
+        raise
+
+    skipped = archived + unknown
+    rejected.extend(skipped)
+    rejected.sort()
+    staged = stream.read_count - (len(rejected) - len(skipped))
+    return ImportResult(
+        read=stream.read_count,
+        loaded=loaded,
+        duplicates=staged - len(skipped) - loaded,
+        rejected=rejected,
+    )
+
+
+def print_import_result(path, result, max_rejects=20):
+    print(f"\n{path}: read {result.read} rows, loaded {result.loaded}, "
+          f"skipped {result.duplicates} duplicates, rejected {len(result.rejected)}")
+    for line_no, reason in result.rejected[:max_rejects]:
+        print(f"    line {line_no}: {reason}")
+    if len(result.rejected) > max_rejects:
+        print(f"    ... {len(result.rejected) - max_rejects} more rejected rows")
+
+
+def main(paths):
+    """Command-line entry point: python metric_import.py export1.csv export2.jsonl ..."""
+    from db import get_connection
+
+    conn = get_connection()
+    if not conn:
+        return 1
+    status = 0
+    try:
+        for path in paths:
+            if not os.path.isfile(path):
+                print(f"{path}: file not found")
+                status = 1
+                continue
+            try:
+                print_import_result(path, load_health_metrics(conn, path))
+            except (psycopg2.Error, ValueError) as e:
+                print(f"{path}: import failed: {e}")
+                status = 1
+    finally:
+        conn.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,243 @@
+import argparse
+import csv
+import gzip
+import os
+import re
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+import psycopg2
+from psycopg2 import sql
+
+from db import get_connection
+
+
+# ========= HEALTHMETRIC PARTITION MAINTENANCE =========
+# HealthMetric is range-partitioned by month (migration 0013). This job
+#   ensure   creates the partitions for the next MONTHS_AHEAD months,
+#   archive  detaches months older than the retention period, writes each
+#            to <archive dir>/<partition>.csv.gz (never replacing an
+#            existing file that holds a different number of rows), logs it in
+#            HealthMetricArchive and drops it (the daily/weekly rollups
+#            of those months are kept),
+#   restore  loads an archive file back into HealthMetric,
+#   status   lists partitions and archives.
+# Run `ensure` and `archive` daily from cron; main.py also runs `ensure` at
+# start-up. An archive run that was interrupted after detaching a
+# partition picks it up again on the next run.
+
+MONTHS_AHEAD = 3
+KEEP_MONTHS = int(os.environ.get("HEALTHCLUB_METRIC_RETENTION_MONTHS", "24"))
+ARCHIVE_DIR = os.environ.get("HEALTHCLUB_ARCHIVE_DIR", "archive")
+
+Partition = namedtuple("Partition", ["name", "range_start", "range_end", "attached", "estimated_rows"])
+
+_PARTITION_NAME = re.compile(r"^healthmetric_y(\d{4})m(\d{2})$")
+
+
+def _month_range(name):
+    match = _PARTITION_NAME.match(name)
+    year, month = int(match.group(1)), int(match.group(2))
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def _months_before(moment, months):
+    index = moment.year * 12 + moment.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def ensure_partitions(conn, months_ahead=MONTHS_AHEAD):
+    """Create missing partitions from this month to `months_ahead` months out. Returns the number created."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT create_healthmetric_partitions(NOW()::TIMESTAMP, "
+            "(NOW() + make_interval(months => %s))::TIMESTAMP);",
+            (months_ahead,),
+        )
+        created = cur.fetchone()[0]
+    conn.commit()
+    return created
+
+
+def list_partitions(conn):
+    """
+    Monthly HealthMetric partitions, oldest first, including tables left
+    detached by an interrupted archive run (attached = False).
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            r"""
+            SELECT c.relname,
+                   EXISTS (SELECT 1 FROM pg_inherits i
+                           WHERE i.inhrelid = c.oid
+                           AND i.inhparent = 'healthmetric'::regclass),
+                   GREATEST(c.reltuples, 0)::BIGINT
+            FROM pg_class c
+            WHERE c.relkind = 'r'
+            AND c.relname ~ '^healthmetric_y\d{4}m\d{2}$'
+            AND pg_table_is_visible(c.oid)
+            ORDER BY c.relname;
+            """
+        )
+        rows = cur.fetchall()
+    conn.rollback()
+    return [Partition(name, *_month_range(name), attached, estimate) for name, attached, estimate in rows]
+
+
+def _archived_rows(path):
+    """Number of readings in an existing archive file."""
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
+def archive_partition(conn, partition, archive_dir=ARCHIVE_DIR):
+    """
+    Detach `partition` (if still attached), export it to a gzipped CSV and
+    drop it. Returns (path, row_count). Raises ValueError, leaving the
+    partition detached, if an archive file for the month already exists
+    with a different number of rows.
+    """
+    name = sql.Identifier(partition.name)
+    if partition.attached:
+        with conn.cursor() as cur:
+            # don't queue behind long dashboard queries for the parent's lock
+            cur.execute("SET LOCAL lock_timeout = '5s';")
+            cur.execute(sql.SQL("ALTER TABLE HealthMetric DETACH PARTITION {};").format(name))
+        conn.commit()
+
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{partition.name}.csv.gz")
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", newline="") as f:
+        with conn.cursor() as cur:
+            cur.copy_expert(sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)").format(name), f)
+            rows = cur.rowcount
+    conn.rollback()
+    if os.path.exists(path) and _archived_rows(path) != rows:
+        os.remove(tmp)
+        raise ValueError(f"{path} already exists with a different row count than {partition.name} "
+                         f"({rows} rows); restore or move it first")
+    os.replace(tmp, path)
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO HealthMetricArchive(partition_name, range_start, range_end, row_count, archive_file)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (partition_name) DO UPDATE
+                SET row_count = EXCLUDED.row_count,
+                    archive_file = EXCLUDED.archive_file,
+                    archived_at = NOW();
+                """,
+                (partition.name, partition.range_start, partition.range_end, rows, os.path.abspath(path)),
+            )
+            cur.execute(sql.SQL("DROP TABLE {};").format(name))
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    return path, rows
+
+
+def archive_old_partitions(conn, keep_months=KEEP_MONTHS, archive_dir=ARCHIVE_DIR, dry_run=False):
+    """
+    Archive every month that ended before the retention period (the current
+    month plus `keep_months` full months before it), and any detached
+    leftovers. Returns the partitions handled.
+    """
+    cutoff = _months_before(datetime.now(), keep_months)
+    due = [p for p in list_partitions(conn) if p.range_end <= cutoff or not p.attached]
+    for p in due:
+        if dry_run:
+            print(f"[dry run] would archive {p.name} (~{p.estimated_rows} rows)")
+            continue
+        path, rows = archive_partition(conn, p, archive_dir)
+        print(f"Archived {p.name}: {rows} rows -> {path}")
+    return due
+
+
+def restore_archive(conn, path):
+    """Load an archived partition file back into HealthMetric. Returns the row count."""
+    name = os.path.basename(path).split(".")[0]
+    if not _PARTITION_NAME.match(name):
+        raise ValueError(f"not a HealthMetric archive file: {path}")
+    start, end = _month_range(name)
+    try:
+        with conn.cursor() as cur:
+            # archived months are skipped by create_healthmetric_partitions
+            cur.execute("DELETE FROM HealthMetricArchive WHERE partition_name = %s;", (name,))
+            cur.execute("SELECT create_healthmetric_partitions(%s, %s);", (start, start))
+            with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+                cur.copy_expert("COPY HealthMetric FROM STDIN WITH (FORMAT csv, HEADER);", f)
+                rows = cur.rowcount
+            # the rollups still hold the archived month; the insert trigger
+            # just added it again, so recompute those days from the raw rows
+            cur.execute("SELECT rebuild_healthmetric_rollups(%s, %s);", (start, end))
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    return rows
+
+
+def print_status(conn):
+    partitions = list_partitions(conn)
+    for p in partitions:
+        state = "attached" if p.attached else "DETACHED (archive pending)"
+        print(f"{p.name:<24} {p.range_start:%Y-%m-%d} - {p.range_end:%Y-%m-%d}  ~{p.estimated_rows:>10} rows  {state}")
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT partition_name, row_count, archive_file, archived_at
+            FROM HealthMetricArchive
+            ORDER BY range_start;
+            """
+        )
+        archives = cur.fetchall()
+    conn.rollback()
+    if archives:
+        print("\nArchived:")
+        for name, rows, archive_file, archived_at in archives:
+            print(f"{name:<24} {rows:>10} rows  {archive_file}  ({archived_at:%Y-%m-%d})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create, archive and restore HealthMetric partitions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ensure = sub.add_parser("ensure", help="create upcoming monthly partitions")
+    ensure.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD)
+    archive = sub.add_parser("archive", help="detach and archive months past retention")
+    archive.add_argument("--keep-months", type=int, default=KEEP_MONTHS)
+    archive.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    archive.add_argument("--dry-run", action="store_true")
+    restore = sub.add_parser("restore", help="load an archive file back into HealthMetric")
+    restore.add_argument("path")
+    sub.add_parser("status", help="list partitions and archives")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    if not conn:
+        return 1
+    try:
+        if args.command == "ensure":
+            print(f"Created {ensure_partitions(conn, args.months_ahead)} partition(s).")
+        elif args.command == "archive":
+            archive_old_partitions(conn, args.keep_months, args.archive_dir, args.dry_run)
+        elif args.command == "restore":
+            print(f"Restored {restore_archive(conn, args.path)} rows.")
+        else:
+            print_status(conn)
+        return 0
+    except (psycopg2.Error, OSError, ValueError) as e:
+        print(f"{args.command} failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
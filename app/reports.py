@@ -0,0 +1,224 @@
+import argparse
+import sys
+import time
+from collections import namedtuple
+
+import psycopg2
+from psycopg2 import sql
+
+from db import get_connection
+
+
+# ========= UTILIZATION REPORTS =========
+# Admin reports are precomputed in materialized views (migration 0015) and
+# refreshed in the background, so reading one is an index scan over a few
+# hundred rows and never competes with bookings for locks:
+#   class_fill      fill rate per class title and trainer
+#   room_occupancy  booked minutes per room, weekday and hour
+#   trainer_hours   booked vs available hours per trainer and week
+#   no_show         PT session outcomes per trainer and month
+# Run `python reports.py refresh --every 900` (or `refresh` from cron). Each
+# view is refreshed CONCURRENTLY in its own transaction, so readers keep
+# seeing the previous contents until the new ones are committed.
+
+REPORT_VIEWS = {
+    "class_fill": "mv_class_fill",
+    "room_occupancy": "mv_room_occupancy",
+    "trainer_hours": "mv_trainer_utilization",
+    "no_show": "mv_pt_no_show",
+}
+REFRESH_INTERVAL = 900
+_REFRESH_LOCK = 20015       # advisory lock key: one refresh run at a time
+
+ClassFill = namedtuple("ClassFill", [
+    "title", "trainer_id", "classes", "seats", "registered", "fill_pct", "full_classes", "last_held",
+])
+RoomOccupancy = namedtuple("RoomOccupancy", ["room_id", "dow", "hour", "booked_minutes", "occupancy_pct"])
+TrainerHours = namedtuple("TrainerHours", [
+    "trainer_id", "week", "available_hours", "class_hours", "pt_hours", "utilization_pct",
+])
+NoShowRate = namedtuple("NoShowRate", [
+    "trainer_id", "month", "sessions", "completed", "no_shows", "cancelled", "no_show_pct",
+])
+RefreshStatus = namedtuple("RefreshStatus", ["report", "refreshed_at", "duration_ms"])
+
+
+def refresh_reports(conn, reports=None):
+    """
+    Refresh the given reports (default: all). Returns [(report, ms), ...], or
+    None if another refresh is already running.
+    """
+    reports = list(reports or REPORT_VIEWS)
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s);", (_REFRESH_LOCK,))
+        locked = cur.fetchone()[0]
+    conn.commit()
+    if not locked:
+        return None
+
+    timings = []
+    try:
+        for report in reports:
+            view = REPORT_VIEWS[report]
+            started = time.perf_counter()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {};")
+                                .format(sql.Identifier(view)))
+                    ms = int((time.perf_counter() - started) * 1000)
+                    cur.execute(
+                        """
+                        INSERT INTO ReportRefresh(view_name, refreshed_at, duration_ms)
+                        VALUES (%s, NOW(), %s)
+                        ON CONFLICT (view_name) DO UPDATE
+                        SET refreshed_at = EXCLUDED.refreshed_at,
+                            duration_ms = EXCLUDED.duration_ms;
+                        """,
+                        (view, ms),
+                    )
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+                raise
+            timings.append((report, ms))
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (_REFRESH_LOCK,))
+        conn.commit()
+    return timings
+
+
+def report_status(conn):
+    """RefreshStatus for every report; refreshed_at is None if it never ran."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT view_name, refreshed_at, duration_ms FROM ReportRefresh;")
+        rows = {view: (at, ms) for view, at, ms in cur.fetchall()}
+    conn.rollback()
+    return [RefreshStatus(report, *rows.get(view, (None, None))) for report, view in REPORT_VIEWS.items()]
+
+
+def _fetch(conn, query, params, row_type):
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        rows = [row_type(*r) for r in cur.fetchall()]
+    conn.rollback()
+    return rows
+
+
+# ---- reports ----
+
+def fetch_class_fill(conn, limit=20, lowest_first=True):
+    """Class series by fill rate (emptiest first by default)."""
+    order = "ASC" if lowest_first else "DESC"
+    return _fetch(
+        conn,
+        f"""
+        SELECT title, trainer_id, classes, seats, registered, fill_pct, full_classes, last_held
+        FROM mv_class_fill
+        ORDER BY fill_pct {order} NULLS LAST, title
+        LIMIT %s;
+        """,
+        (limit,),
+        ClassFill,
+    )
+
+
+def fetch_room_occupancy(conn, room_id):
+    """The 7 x 24 weekday/hour cells of one room (dow 1 = Monday)."""
+    return _fetch(
+        conn,
+        """
+        SELECT room_id, dow, hour, booked_minutes, occupancy_pct
+        FROM mv_room_occupancy
+        WHERE room_id = %s
+        ORDER BY dow, hour;
+        """,
+        (room_id,),
+        RoomOccupancy,
+    )
+
+
+def fetch_trainer_hours(conn, trainer_id=None, week=None):
+    """Booked vs available hours for one trainer (all weeks) or one week (all trainers)."""
+    return _fetch(
+        conn,
+        """
+        SELECT trainer_id, week, available_hours, class_hours, pt_hours, utilization_pct
+        FROM mv_trainer_utilization
+        WHERE (%(trainer_id)s::INT IS NULL OR trainer_id = %(trainer_id)s)
+        AND (%(week)s::DATE IS NULL OR week = date_trunc('week', %(week)s::DATE)::DATE)
+        ORDER BY week, trainer_id;
+        """,
+        {"trainer_id": trainer_id, "week": week},
+        TrainerHours,
+    )
+
+
+def fetch_no_show_rates(conn, months=3):
+    """
+    Per-trainer totals over the last `months` months (including this one),
+    highest no-show rate first; month is the first month counted.
+    """
+    return _fetch(
+        conn,
+        """
+        SELECT trainer_id, MIN(month), SUM(sessions), SUM(completed), SUM(no_shows), SUM(cancelled),
+               ROUND(100.0 * SUM(no_shows) / NULLIF(SUM(sessions) - SUM(cancelled), 0), 1) AS no_show_pct
+        FROM mv_pt_no_show
+        WHERE month >= date_trunc('month', NOW()) - make_interval(months => %s)
+        GROUP BY trainer_id
+        ORDER BY no_show_pct DESC NULLS LAST, trainer_id;
+        """,
+        (months - 1,),
+        NoShowRate,
+    )
+
+
+def print_status(conn):
+    for status in report_status(conn):
+        if status.refreshed_at is None:
+            print(f"{status.report:<16} never refreshed")
+        else:
+            print(f"{status.report:<16} {status.refreshed_at:%Y-%m-%d %H:%M:%S}  ({status.duration_ms} ms)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the admin utilization reports.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh = sub.add_parser("refresh", help="refresh the report views")
+    refresh.add_argument("reports", nargs="*", help=f"any of {', '.join(REPORT_VIEWS)} (default: all)")
+    refresh.add_argument("--every", type=int, metavar="SECONDS",
+                         help=f"keep refreshing at this interval (e.g. {REFRESH_INTERVAL})")
+    sub.add_parser("status", help="show when each report was last refreshed")
+    args = parser.parse_args(argv)
+    unknown = [r for r in getattr(args, "reports", []) if r not in REPORT_VIEWS]
+    if unknown:
+        parser.error(f"unknown report(s): {', '.join(unknown)}")
+
+    conn = get_connection()
+    if not conn:
+        return 1
+    try:
+        if args.command == "status":
+            print_status(conn)
+            return 0
+        while True:
+            timings = refresh_reports(conn, args.reports)
+            if timings is None:
+                print("Another refresh is running; skipped.")
+            else:
+                print(", ".join(f"{report} {ms} ms" for report, ms in timings))
+            if not args.every:
+                return 0
+            time.sleep(args.every)
+    except psycopg2.Error as e:
+        print(f"{args.command} failed: {e}")
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import argparse
+import sys
+from collections import namedtuple
+from datetime import date, timedelta
+
+import psycopg2
+from psycopg2 import extensions
+
+from db import get_connection
+
+
+# ========= HEALTHMETRIC ROLLUPS =========
+# Per-member daily and weekly min/max/avg of weight, heart rate and body
+# fat (migration 0014). Triggers on HealthMetric keep them current, only
+# touching the buckets a statement changed, so a year of weekly points is
+# at most 53 rows instead of every raw reading.
+
+PERIODS = {"day": "HealthMetricDaily", "week": "HealthMetricWeekly"}
+
+MetricBucket = namedtuple("MetricBucket", [
+    "bucket", "readings",
+    "weight_avg", "weight_min", "weight_max",
+    "heart_rate_avg", "heart_rate_min", "heart_rate_max",
+    "body_fat_avg", "body_fat_min", "body_fat_max",
+])
+
+# {table} is one of PERIODS; shared with the asyncio path (async_dal.py)
+ROLLUP_QUERY = """
+    SELECT bucket, readings,
+           weight_avg, weight_min, weight_max,
+           heart_rate_avg, heart_rate_min, heart_rate_max,
+           body_fat_avg, body_fat_min, body_fat_max
+    FROM {table}
+    WHERE member_id = %(member_id)s
+    AND bucket >= %(since)s
+    AND (%(until)s::DATE IS NULL OR bucket < %(until)s)
+    ORDER BY bucket;
+"""
+
+
+def fetch_metric_rollups(conn, member_id, period="week", since=None, until=None):
+    """
+    A member's rollup buckets for `period` ("day" or "week"), oldest first.
+    since defaults to one year ago; until (exclusive) is optional.
+    """
+    since = since or date.today() - timedelta(days=365)
+    # like the dal.py readers: leave a transaction the caller has open
+    caller_transaction = conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE
+    with conn.cursor() as cur:
+        cur.execute(
+            ROLLUP_QUERY.format(table=PERIODS[period]),
+            {"member_id": member_id, "since": since, "until": until},
+        )
+        rows = [MetricBucket(*r) for r in cur.fetchall()]
+    if not caller_transaction:
+        conn.rollback()
+    return rows
+
+
+def rebuild_rollups(conn, start, end, member_ids=None):
+    """
+    Recompute the buckets with raw readings in [start, end) from HealthMetric,
+    e.g. after editing readings with the triggers disabled. Returns the
+    number of days rebuilt.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT rebuild_healthmetric_rollups(%s, %s, %s);",
+                (start, end, member_ids),
+            )
+            days = cur.fetchone()[0]
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    return days
+
+
+def main(argv=None):
+    """Command-line entry point: python rollups.py FROM TO [--members 1,2,3]"""
+    parser = argparse.ArgumentParser(description="Rebuild HealthMetric rollups for a time range.")
+    parser.add_argument("start", help="YYYY-MM-DD (inclusive)")
+    parser.add_argument("end", help="YYYY-MM-DD (exclusive)")
+    parser.add_argument("--members", help="comma-separated member IDs (default: everyone)")
+    args = parser.parse_args(argv)
+    member_ids = [int(m) for m in args.members.split(",")] if args.members else None
+
+    conn = get_connection()
+    if not conn:
+        return 1
+    try:
+        print(f"Rebuilt {rebuild_rollups(conn, args.start, args.end, member_ids)} member-days.")
+        return 0
+    except psycopg2.Error as e:
+        print(f"Rebuild failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,422 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import psycopg2
+from psycopg2 import errorcodes
+
+
+# ========= PT SESSION BOOKING =========
+# A booking request (member, trainer, optional room, time window) is checked
+# against the trainer's recurring TrainerAvailability windows and against
+# everything that already occupies the trainer, the member or the room:
+# PTSession rows, GroupClass rows and the member's class registrations.
+#
+# Only rows inside a bounded search horizon are fetched (index range scans
+# on start_time), so a trainer's years of history never reach Python. The
+# free time is then computed with a sorted sweep over the intervals.
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# sessions/classes are assumed shorter than this; bounds the index range scans
+MAX_BOOKING_LENGTH = timedelta(days=1)
+
+Busy = namedtuple("Busy", ["start", "end", "reason"])
+FreeRoom = namedtuple("FreeRoom", ["room_id", "name", "room_type", "capacity"])
+SlotCheck = namedtuple("SlotCheck", ["available", "conflicts", "suggestions"])
+# conflicts: list of Busy overlapping the request (reason "outside availability"
+#            when the request is not inside one of the trainer's windows)
+# suggestions: list of (start, end) free slots of the same length, nearest first
+
+
+# Exclusion constraints that guard the schedule (migration 0009)
+CONFLICT_MESSAGES = {
+    "trainer_availability_no_overlap": "Trainer availability overlaps with an existing slot on that day.",
+    "room_no_double_booking": "Room is already booked at that time.",
+    "trainer_no_double_booking": "Trainer is already booked at that time.",
+}
+
+ScheduleConflict = namedtuple("ScheduleConflict", ["constraint", "message", "detail"])
+
+
+def schedule_conflict(error):
+    """
+    Return a ScheduleConflict if `error` is an overlap (exclusion constraint)
+    violation, otherwise None.
+    """
+    if getattr(error, "pgcode", None) != errorcodes.EXCLUSION_VIOLATION:
+        return None
+    name = error.diag.constraint_name
+    return ScheduleConflict(
+        constraint=name,
+        message=CONFLICT_MESSAGES.get(name, error.diag.message_primary),
+        detail=error.diag.message_detail,
+    )
+
+
+def print_db_error(action, error):
+    """Print a psycopg2 error, spelling out schedule overlaps."""
+    conflict = schedule_conflict(error)
+    if conflict:
+        print(f"Error {action}: {conflict.message}")
+        if conflict.detail:
+            print(f"    {conflict.detail}")
+    else:
+        print(f"Error {action}: {error}")
+
+
+# ---- interval helpers ----
+
+def merge_intervals(intervals):
+    """Union of (start, end) intervals as a sorted list of disjoint tuples."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(m) for m in merged]
+
+
+def subtract_intervals(windows, busy):
+    """
+    Parts of `windows` not covered by `busy`. Both inputs must be sorted,
+    disjoint (start, end) lists; runs as one linear sweep over both.
+    """
+    free = []
+    j = 0
+    for w_start, w_end in windows:
+        cursor = w_start
+        # skip busy intervals that end before this window
+        while j < len(busy) and busy[j][1] <= w_start:
+            j += 1
+        k = j
+        while k < len(busy) and busy[k][0] < w_end:
+            b_start, b_end = busy[k]
+            if b_start > cursor:
+                free.append((cursor, b_start))
+            cursor = max(cursor, b_end)
+            if cursor >= w_end:
+                break
+            k += 1
+        if cursor < w_end:
+            free.append((cursor, w_end))
+    return free
+
+
+def nearest_slots(free, start, length, limit):
+    """Up to `limit` slots of `length` inside `free`, closest to `start` first."""
+    candidates = []
+    for f_start, f_end in free:
+        if f_end - f_start < length:
+            continue
+        # the slot in this free interval closest to the requested start
+        slot_start = min(max(start, f_start), f_end - length)
+        candidates.append((abs(slot_start - start), slot_start))
+    candidates.sort()
+    return [(s, s + length) for _, s in candidates[:limit]]
+
+
+# ---- data access ----
+
+def availability_windows(conn, trainer_id, horizon_start, horizon_end):
+    """Expand the trainer's weekly TrainerAvailability rows into concrete datetime windows."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT day_of_week, start_time, end_time
+            FROM TrainerAvailability
+            WHERE trainer_id = %s;
+            """,
+            (trainer_id,),
+        )
+        weekly = {}
+        for day, start_time, end_time in cur.fetchall():
+            weekly.setdefault(day.strip().capitalize(), []).append((start_time, end_time))
+
+    windows = []
+    day = horizon_start.date()
+    while day <= horizon_end.date():
+        for start_time, end_time in weekly.get(DAYS[day.weekday()], ()):
+            w_start = max(datetime.combine(day, start_time), horizon_start)
+            w_end = min(datetime.combine(day, end_time), horizon_end)
+            if w_start < w_end:
+                windows.append((w_start, w_end))
+        day += timedelta(days=1)
+    return merge_intervals(windows)
+
+
+def busy_intervals(conn, horizon_start, horizon_end, trainer_id=None, member_id=None,
+                   room_id=None, exclude_session_id=None):
+    """
+    Everything that occupies the trainer, member or room within the horizon.
+    Each branch is a range scan on a (…, start_time) index.
+    """
+    params = {
+        "hs": horizon_start,
+        "he": horizon_end,
+        "hs_floor": horizon_start - MAX_BOOKING_LENGTH,
+        "trainer_id": trainer_id,
+        "member_id": member_id,
+        "room_id": room_id,
+        "exclude": exclude_session_id,
+    }
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT start_time, end_time, 'trainer has PT session ' || pt_session_id
+            FROM PTSession
+            WHERE trainer_id = %(trainer_id)s
+            AND start_time > %(hs_floor)s AND start_time < %(he)s AND end_time > %(hs)s
+            AND status <> 'Cancelled'
+            AND pt_session_id IS DISTINCT FROM %(exclude)s
+
+            UNION ALL
+            SELECT start_time, end_time, 'trainer teaches class ' || class_id
+            FROM GroupClass
+            WHERE trainer_id = %(trainer_id)s
+            AND start_time > %(hs_floor)s AND start_time < %(he)s AND end_time > %(hs)s
+
+            UNION ALL
+            SELECT start_time, end_time, 'member has PT session ' || pt_session_id
+            FROM PTSession
+            WHERE member_id = %(member_id)s
+            AND start_time > %(hs_floor)s AND start_time < %(he)s AND end_time > %(hs)s
+            AND status <> 'Cancelled'
+            AND pt_session_id IS DISTINCT FROM %(exclude)s
+
+            UNION ALL
+            SELECT gc.start_time, gc.end_time, 'member registered for class ' || gc.class_id
+            FROM ClassRegistration cr
+            JOIN GroupClass gc ON gc.class_id = cr.class_id
+            WHERE cr.member_id = %(member_id)s
+            AND gc.start_time > %(hs_floor)s AND gc.start_time < %(he)s AND gc.end_time > %(hs)s
+
+            UNION ALL
+            SELECT start_time, end_time, 'room used by PT session ' || pt_session_id
+            FROM PTSession
+            WHERE room_id = %(room_id)s
+            AND start_time > %(hs_floor)s AND start_time < %(he)s AND end_time > %(hs)s
+            AND status <> 'Cancelled'
+            AND pt_session_id IS DISTINCT FROM %(exclude)s
+
+            UNION ALL
+            SELECT start_time, end_time, 'room used by class ' || class_id
+            FROM GroupClass
+            WHERE room_id = %(room_id)s
+            AND start_time > %(hs_floor)s AND start_time < %(he)s AND end_time > %(hs)s;
+            """,
+            params,
+        )
+        return [Busy(*r) for r in cur.fetchall()]
+
+
+# ---- booking API ----
+
+def check_pt_slot(conn, member_id, trainer_id, start, end, room_id=None,
+                  suggestions=5, horizon=timedelta(days=14)):
+    """
+    Check whether a PT session can be booked and, if not, why not.
+    Returns a SlotCheck; suggestions are the nearest free slots of the
+    same length within `horizon` either side of the requested start.
+    """
+    if end <= start:
+        raise ValueError("Session end must be after its start.")
+    length = end - start
+    horizon_start = max(start - horizon, datetime.now())
+    horizon_end = end + horizon
+
+    windows = availability_windows(conn, trainer_id, horizon_start, horizon_end)
+    busy = busy_intervals(conn, horizon_start, horizon_end,
+                          trainer_id=trainer_id, member_id=member_id, room_id=room_id)
+    conn.rollback()
+
+    conflicts = [b for b in busy if b.start < end and b.end > start]
+    if not any(w_start <= start and end <= w_end for w_start, w_end in windows):
+        conflicts.insert(0, Busy(start, end, "outside trainer availability"))
+    conflicts.sort(key=lambda b: b.start)
+
+    free = subtract_intervals(windows, merge_intervals((b.start, b.end) for b in busy))
+    if start < datetime.now():
+        conflicts.insert(0, Busy(start, end, "start time is in the past"))
+    return SlotCheck(
+        available=not conflicts,
+        conflicts=conflicts,
+        suggestions=nearest_slots(free, start, length, suggestions),
+    )
+
+
+def reserve_pt_session(conn, member_id, trainer_id, start, end, room_id=None):
+    """
+    The checks and insert of book_pt_session in the caller's transaction
+    (nothing is committed or rolled back). Returns (pt_session_id, conflicts);
+    pt_session_id is None and conflicts (Busy rows) say why when the slot
+    is not free.
+    """
+    if end <= start:
+        raise ValueError("Session end must be after its start.")
+    with conn.cursor() as cur:
+        # serialize bookings touching the same trainer, room or member
+        # (always locked in this order, so bookings cannot deadlock).
+        # NO KEY UPDATE still lets other transactions insert rows that
+        # reference them (registrations, metrics, classes) meanwhile
+        cur.execute("SELECT 1 FROM Trainer WHERE trainer_id = %s FOR NO KEY UPDATE;", (trainer_id,))
+        if not cur.fetchone():
+            raise ValueError("Trainer not found.")
+        if room_id is not None:
+            cur.execute("SELECT 1 FROM Room WHERE room_id = %s FOR NO KEY UPDATE;", (room_id,))
+            if not cur.fetchone():
+                raise ValueError("Room not found.")
+        cur.execute("SELECT 1 FROM Member WHERE member_id = %s FOR NO KEY UPDATE;", (member_id,))
+        if not cur.fetchone():
+            raise ValueError("Member not found.")
+
+        windows = availability_windows(conn, trainer_id, start, end)
+        conflicts = busy_intervals(conn, start, end, trainer_id=trainer_id,
+                                   member_id=member_id, room_id=room_id)
+        if not any(w_start <= start and end <= w_end for w_start, w_end in windows):
+            conflicts.insert(0, Busy(start, end, "outside trainer availability"))
+        if start < datetime.now():
+            conflicts.insert(0, Busy(start, end, "start time is in the past"))
+        if conflicts:
+            return None, conflicts
+
+        cur.execute(
+            """
+            INSERT INTO PTSession(member_id, trainer_id, room_id, start_time, end_time, status)
+            VALUES (%s, %s, %s, %s, %s, 'Scheduled')
+            RETURNING pt_session_id;
+            """,
+            (member_id, trainer_id, room_id, start, end),
+        )
+        return cur.fetchone()[0], []
+
+
+def book_pt_session(conn, member_id, trainer_id, start, end, room_id=None):
+    """
+    Book a PT session if the slot is free.
+    Returns (pt_session_id, check); pt_session_id is None when the slot was
+    not free, and check (a SlotCheck) explains why.
+    """
+    try:
+        pt_session_id, _ = reserve_pt_session(conn, member_id, trainer_id, start, end, room_id)
+        if pt_session_id is None:
+            conn.rollback()
+            return None, check_pt_slot(conn, member_id, trainer_id, start, end, room_id)
+        conn.commit()
+        return pt_session_id, SlotCheck(True, [], [])
+    except psycopg2.Error as e:
+        conn.rollback()
+        if schedule_conflict(e) is None:
+            raise
+        # a concurrent booking won the slot after our check
+        return None, check_pt_slot(conn, member_id, trainer_id, start, end, room_id)
+    except ValueError:
+        conn.rollback()
+        raise
+
+
+# ---- room search ----
+
+def find_free_rooms(conn, start, end, min_capacity=1, room_type=None, limit=10):
+    """
+    Rooms with at least `min_capacity` seats (optionally of `room_type`) that
+    no class or PT session occupies between start and end, best fit first.
+    The overlap test is answered by the GiST index behind the
+    room_no_double_booking constraint on ScheduleOccupancy.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT r.room_id, r.name, r.room_type, r.capacity
+            FROM Room r
+            WHERE r.capacity >= %(min_capacity)s
+            AND (%(room_type)s::TEXT IS NULL OR r.room_type ILIKE %(room_type)s)
+            AND NOT EXISTS (
+                SELECT 1 FROM ScheduleOccupancy o
+                WHERE o.room_id = r.room_id
+                AND o.during && tsrange(%(start)s::TIMESTAMP, %(end)s::TIMESTAMP)
+            )
+            ORDER BY r.capacity - %(min_capacity)s, r.room_id
+            LIMIT %(limit)s;
+            """,
+            {
+                "start": start,
+                "end": end,
+                "min_capacity": min_capacity,
+                "room_type": room_type,
+                "limit": limit,
+            },
+        )
+        rooms = [FreeRoom(*r) for r in cur.fetchall()]
+    conn.rollback()
+    return rooms
+
+
+# ---- trainer agenda ----
+
+AGENDA_COLUMNS = ("kind", "item_id", "title", "start_time", "end_time", "room_id", "member_id", "status")
+AgendaItem = namedtuple("AgendaItem", AGENDA_COLUMNS)
+
+# shared with the asyncio path (async_dal.py)
+AGENDA_PAGE_QUERY = """
+    SELECT kind, item_id, title, start_time, end_time, room_id, member_id, status
+    FROM (
+        SELECT 'class' AS kind, class_id AS item_id, title,
+               start_time, end_time, room_id,
+               NULL::INT AS member_id, NULL::VARCHAR AS status
+        FROM GroupClass
+        WHERE trainer_id = %(trainer_id)s
+        AND start_time >= COALESCE(%(starts_from)s::TIMESTAMP, NOW())
+        AND (%(starts_before)s::TIMESTAMP IS NULL OR start_time < %(starts_before)s)
+        AND (%(after_start)s::TIMESTAMP IS NULL
+             OR (start_time, 'class', class_id) > (%(after_start)s, %(after_kind)s, %(after_id)s))
+
+        UNION ALL
+
+        SELECT 'pt', pt_session_id, 'PT session with member ' || member_id,
+               start_time, end_time, room_id,
+               member_id, status
+        FROM PTSession
+        WHERE trainer_id = %(trainer_id)s
+        AND start_time >= COALESCE(%(starts_from)s::TIMESTAMP, NOW())
+        AND (%(starts_before)s::TIMESTAMP IS NULL OR start_time < %(starts_before)s)
+        AND (%(after_start)s::TIMESTAMP IS NULL
+             OR (start_time, 'pt', pt_session_id) > (%(after_start)s, %(after_kind)s, %(after_id)s))
+    ) agenda
+    ORDER BY start_time, kind, item_id
+    LIMIT %(limit)s;
+"""
+
+
+def fetch_trainer_agenda_page(conn, trainer_id, after=None, limit=20,
+                              starts_from=None, starts_before=None):
+    """
+    One page of a trainer's merged agenda: group classes and PT sessions in
+    one time-ordered list, keyed on (start_time, kind, item_id).
+    Rows are AgendaItems (AGENDA_COLUMNS); kind is 'class' or 'pt'.
+    starts_from defaults to now; starts_before is optional.
+    Each branch is a range scan on its (trainer_id, start_time, id) index.
+    """
+    after_start, after_kind, after_id = after or (None, None, None)
+    with conn.cursor() as cur:
+        cur.execute(
+            AGENDA_PAGE_QUERY,
+            {
+                "trainer_id": trainer_id,
+                "starts_from": starts_from,
+                "starts_before": starts_before,
+                "after_start": after_start,
+                "after_kind": after_kind,
+                "after_id": after_id,
+                "limit": limit,
+            },
+        )
+        rows = [AgendaItem(*r) for r in cur.fetchall()]
+    conn.rollback()
+    return rows
+
+
+def agenda_key(row):
+    """Keyset value of an agenda row: (start_time, kind, item_id)."""
+    return row.start_time, row.kind, row.item_id
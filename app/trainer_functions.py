@@ -1,15 +1,34 @@
+import os
+
 import psycopg2
 
+from availability_import import (
+    AvailabilityImportResult,
+    import_availability,
+    print_availability_result,
+    read_template,
+)
+from dal import insert_availability
+from db import iter_keyset_pages, print_pages
+from ical import trainer_feed
+from refcache import get_trainer
+from scheduling import agenda_key, fetch_trainer_agenda_page, print_db_error
+
 
 # ========= TRAINER OPERATIONS =========
 # 6) Set Availability
+# 6b) Bulk weekly availability import
 # 7) Schedule View
+# 7b) Schedule export (.ics)
+#
+# These functions only prompt and print; the queries are in dal.py and
+# scheduling.py.
 
 
 def set_trainer_availability(conn):
     """
     Insert a new availability slot into TrainerAvailability.
-    Trigger/constraints will block overlaps if you set them in DDL.
+    Overlapping slots are rejected by the trainer_availability_no_overlap constraint.
     """
     print("\n=== Set Trainer Availability ===")
     trainer_id = input("Trainer ID: ").strip()
@@ -22,26 +41,60 @@ def set_trainer_availability(conn):
     end_time = input("End time (HH:MM): ").strip()
 
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO TrainerAvailability(trainer_id, day_of_week, start_time, end_time)
-            VALUES (%s, %s, %s::TIME, %s::TIME);
-            """,
-            (trainer_id, day_of_week, start_time, end_time),
-        )
+        insert_availability(conn, trainer_id, day_of_week, start_time, end_time)
         conn.commit()
         print("Availability added successfully.")
     except psycopg2.Error as e:
         conn.rollback()
-        print(f"Error setting availability: {e}")
-    finally:
-        cur.close()
+        print_db_error("setting availability", e)
+
+
+def import_weekly_availability(conn):
+    """
+    Replace one or more trainers' weekly availability from a CSV/JSON template
+    in a single transaction. See availability_import.py for the file format.
+    """
+    print("\n=== Import Weekly Availability ===")
+    path = input("Path to template (CSV or JSON): ").strip()
+    if not os.path.isfile(path):
+        print("File not found.")
+        return
+
+    try:
+        slots, trainers, errors = read_template(path)
+    except (OSError, ValueError) as e:
+        print(f"Could not read template: {e}")
+        return
+    if errors:
+        print_availability_result(AvailabilityImportResult(len(trainers), 0, 0, 0, errors))
+        return
+
+    try:
+        preview = import_availability(conn, slots, trainers, dry_run=True)
+        print_availability_result(preview, dry_run=True)
+        if preview.errors:
+            return
+        if input("Apply these changes? (y/N): ").strip().lower() != "y":
+            print("No changes made.")
+            return
+        print_availability_result(import_availability(conn, slots, trainers))
+    except psycopg2.Error as e:
+        conn.rollback()
+        print_db_error("importing availability", e)
+
+
+def print_agenda_row(r):
+    if r.kind == "class":
+        print(f"{r.start_time} - {r.end_time} | Class {r.item_id}: {r.title} | Room {r.room_id}")
+    else:
+        print(f"{r.start_time} - {r.end_time} | Session {r.item_id} with Member {r.member_id} | "
+              f"Room {r.room_id} | Status: {r.status}")
 
 
 def view_trainer_schedule(conn):
     """
-    Show upcoming group classes and PT sessions for a trainer.
+    Show a trainer's classes and PT sessions as one time-ordered agenda,
+    a page at a time.
     """
     print("\n=== Trainer Schedule View ===")
     trainer_id = input("Trainer ID: ").strip()
@@ -49,49 +102,53 @@ def view_trainer_schedule(conn):
         print("Invalid trainer ID.")
         return
 
+    starts_from = input("From (YYYY-MM-DD, blank = now): ").strip() or None
+    starts_before = input("Until (YYYY-MM-DD, optional): ").strip() or None
+
     try:
-        cur = conn.cursor()
-
-        print("\nUpcoming Group Classes:")
-        cur.execute(
-            """
-            SELECT class_id, title, start_time, end_time, room_id
-            FROM GroupClass
-            WHERE trainer_id = %s AND start_time >= NOW()
-            ORDER BY start_time;
-            """,
-            (trainer_id,),
+        trainer = get_trainer(conn, trainer_id)
+        if trainer is None:
+            print("Trainer not found.")
+            return
+        print(f"\nAgenda for {trainer.full_name}:")
+        print_pages(
+            iter_keyset_pages(
+                lambda after, limit: fetch_trainer_agenda_page(
+                    conn, trainer_id, after, limit, starts_from, starts_before
+                ),
+                key=agenda_key,
+            ),
+            print_agenda_row,
+            "No upcoming classes or PT sessions.",
         )
-        rows = cur.fetchall()
-        if rows:
-            for r in rows:
-                print(
-                    f"Class {r[0]}: {r[1]} | {r[2]} - {r[3]} | Room {r[4]}"
-                )
-        else:
-            print("No upcoming group classes.")
-
-        print("\nUpcoming PT Sessions:")
-        cur.execute(
-            """
-            SELECT pt_session_id, member_id, start_time, end_time, room_id, status
-            FROM PTSession
-            WHERE trainer_id = %s AND start_time >= NOW()
-            ORDER BY start_time;
-            """,
-            (trainer_id,),
-        )
-        rows = cur.fetchall()
-        if rows:
-            for r in rows:
-                print(
-                    f"Session {r[0]} with Member {r[1]} | "
-                    f"{r[2]} - {r[3]} | Room {r[4]} | Status: {r[5]}"
-                )
-        else:
-            print("No upcoming PT sessions.")
 
     except psycopg2.Error as e:
+        conn.rollback()
         print(f"Error fetching schedule: {e}")
-    finally:
-        cur.close()
+
+
+def export_trainer_calendar(conn):
+    """
+    Write a trainer's schedule as an iCalendar (.ics) file that calendar apps
+    can import or subscribe to.
+    """
+    print("\n=== Export Schedule (.ics) ===")
+    trainer_id = input("Trainer ID: ").strip()
+    if not trainer_id.isdigit():
+        print("Invalid trainer ID.")
+        return
+    path = input(f"Output file [trainer_{trainer_id}.ics]: ").strip() or f"trainer_{trainer_id}.ics"
+
+    try:
+        feed = trainer_feed(conn, int(trainer_id))
+        if feed is None:
+            print("Trainer not found.")
+            return
+        with open(path, "w", newline="") as f:
+            f.write(feed.body)
+        print(f"Schedule written to {path} (version {feed.etag}).")
+    except OSError as e:
+        print(f"Could not write {path}: {e}")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error exporting schedule: {e}")
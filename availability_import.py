@@ -0,0 +1,229 @@
+import csv
+import json
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from scheduling import DAYS, print_db_error
+
+
+# ========= BULK WEEKLY AVAILABILITY IMPORT =========
+# A weekly template lists every availability slot of one or more trainers.
+# For each trainer in the template it *replaces* that trainer's rota:
+#   1. the template is checked for overlaps in memory (sorted per trainer/day),
+#   2. it is diffed against the existing TrainerAvailability rows,
+#   3. removed slots are deleted and new slots inserted with one multi-row
+#      statement each, all in one transaction.
+# Slots that did not change are left alone, so their availability_id stays.
+#
+# CSV:   trainer_id,day_of_week,start_time,end_time   (header row required)
+# JSON:  {"<trainer_id>": [{"day_of_week": "Monday", "start_time": "09:00", "end_time": "12:00"}, ...]}
+
+Slot = namedtuple("Slot", ["trainer_id", "day_of_week", "start_time", "end_time"])
+AvailabilityImportResult = namedtuple(
+    "AvailabilityImportResult", ["trainers", "inserted", "deleted", "unchanged", "errors"]
+)
+
+
+def _parse_time(value):
+    value = str(value).strip()
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            pass
+    raise ValueError(f"invalid time: {value!r}")
+
+
+def _make_slot(trainer_id, day, start, end):
+    day = str(day).strip().capitalize()
+    if day not in DAYS:
+        raise ValueError(f"invalid day_of_week: {day!r}")
+    slot = Slot(int(trainer_id), day, _parse_time(start), _parse_time(end))
+    if slot.end_time <= slot.start_time:
+        raise ValueError(f"end_time must be after start_time ({start} - {end})")
+    return slot
+
+
+def read_template(path):
+    """
+    Read a CSV or JSON weekly template.
+    Returns (slots, trainer_ids, errors). Trainers listed with no slots in a
+    JSON template are included, so importing clears their availability.
+    """
+    slots, errors, trainers = [], [], set()
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            template = json.load(f)
+        if not isinstance(template, dict):
+            errors.append("template must be a JSON object of trainer_id -> list of slots")
+            return slots, [], errors
+        for trainer_id, rota in template.items():
+            try:
+                trainers.add(int(trainer_id))
+            except ValueError:
+                errors.append(f"trainer {trainer_id!r}: invalid trainer ID")
+                continue
+            if not isinstance(rota, list):
+                errors.append(f"trainer {trainer_id}: slots must be a list")
+                continue
+            for i, entry in enumerate(rota, start=1):
+                if not isinstance(entry, dict):
+                    errors.append(f"trainer {trainer_id} slot {i}: must be an object")
+                    continue
+                try:
+                    slots.append(_make_slot(trainer_id, entry["day_of_week"],
+                                            entry["start_time"], entry["end_time"]))
+                except (KeyError, TypeError, ValueError) as e:
+                    errors.append(f"trainer {trainer_id} slot {i}: {e}")
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    slot = _make_slot(row["trainer_id"], row["day_of_week"],
+                                      row["start_time"], row["end_time"])
+                except (KeyError, TypeError, ValueError) as e:
+                    errors.append(f"line {line_no}: {e}")
+                    continue
+                slots.append(slot)
+                trainers.add(slot.trainer_id)
+    return slots, sorted(trainers), errors
+
+
+def find_overlaps(slots):
+    """
+    Overlapping slots within the template, found with one sorted pass per
+    (trainer, day). Touching slots (12:00-13:00 and 13:00-14:00) are fine.
+    """
+    problems = []
+    ordered = sorted(slots, key=lambda s: (s.trainer_id, s.day_of_week, s.start_time, s.end_time))
+    for prev, cur in zip(ordered, ordered[1:]):
+        if (prev.trainer_id, prev.day_of_week) != (cur.trainer_id, cur.day_of_week):
+            continue
+        if cur.start_time < prev.end_time:
+            problems.append(
+                f"trainer {cur.trainer_id} {cur.day_of_week}: "
+                f"{prev.start_time:%H:%M}-{prev.end_time:%H:%M} overlaps "
+                f"{cur.start_time:%H:%M}-{cur.end_time:%H:%M}"
+            )
+    return problems
+
+
+def import_availability(conn, slots, trainers, dry_run=False):
+    """
+    Replace the weekly availability of `trainers` with `slots`.
+    Returns an AvailabilityImportResult; nothing is written if errors are found
+    or dry_run is set.
+    """
+    errors = find_overlaps(slots)
+    if errors:
+        return AvailabilityImportResult(len(trainers), 0, 0, 0, errors)
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT trainer_id FROM Trainer WHERE trainer_id = ANY(%s);", (trainers,))
+            known = {r[0] for r in cur.fetchall()}
+            missing = [t for t in trainers if t not in known]
+            if missing:
+                conn.rollback()
+                return AvailabilityImportResult(
+                    len(trainers), 0, 0, 0,
+                    [f"trainer {t}: not found" for t in missing],
+                )
+
+            # lock the existing rota so a concurrent edit can't slip between diff and apply
+            cur.execute(
+                """
+                SELECT availability_id, trainer_id, day_of_week, start_time, end_time
+                FROM TrainerAvailability
+                WHERE trainer_id = ANY(%s)
+                FOR UPDATE;
+                """,
+                (trainers,),
+            )
+            existing = {}
+            for availability_id, trainer_id, day, start_time, end_time in cur.fetchall():
+                key = Slot(trainer_id, day.strip().capitalize(), start_time, end_time)
+                existing.setdefault(key, []).append(availability_id)
+
+            wanted = set(slots)
+            to_insert = sorted(wanted - existing.keys())
+            to_delete = [availability_id
+                         for key, ids in existing.items()
+                         for i, availability_id in enumerate(ids)
+                         # drop removed slots and any exact duplicates of kept ones
+                         if key not in wanted or i > 0]
+            unchanged = len(wanted) - len(to_insert)
+
+            if dry_run:
+                conn.rollback()
+                return AvailabilityImportResult(len(trainers), len(to_insert), len(to_delete), unchanged, [])
+
+            if to_delete:
+                cur.execute(
+                    "DELETE FROM TrainerAvailability WHERE availability_id = ANY(%s);",
+                    (to_delete,),
+                )
+            if to_insert:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO TrainerAvailability(trainer_id, day_of_week, start_time, end_time)
+                    VALUES %s;
+                    """,
+                    to_insert,
+                    page_size=1000,
+                )
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+
+    return AvailabilityImportResult(len(trainers), len(to_insert), len(to_delete), unchanged, [])
+
+
+def print_availability_result(result, dry_run=False):
+    if result.errors:
+        print("Template rejected, nothing was changed:")
+        for error in result.errors:
+            print(f"    {error}")
+        return
+    prefix = "[dry run] " if dry_run else ""
+    print(f"{prefix}{result.trainers} trainer(s): {result.inserted} slots added, "
+          f"{result.deleted} removed, {result.unchanged} unchanged.")
+
+
+def main(argv):
+    """Command-line entry point: python availability_import.py TEMPLATE [--dry-run]"""
+    from db import get_connection
+
+    paths = [a for a in argv if not a.startswith("--")]
+    dry_run = "--dry-run" in argv
+    if len(paths) != 1:
+        print("Usage: python availability_import.py TEMPLATE.csv|TEMPLATE.json [--dry-run]")
+        return 1
+
+    slots, trainers, errors = read_template(paths[0])
+    if errors:
+        print_availability_result(AvailabilityImportResult(len(trainers), 0, 0, 0, errors))
+        return 1
+
+    conn = get_connection()
+    if not conn:
+        return 1
+    try:
+        result = import_availability(conn, slots, trainers, dry_run)
+        print_availability_result(result, dry_run)
+        return 1 if result.errors else 0
+    except psycopg2.Error as e:
+        print_db_error("importing availability", e)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
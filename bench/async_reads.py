@@ -0,0 +1,199 @@
+"""
+Synchronous vs asyncio read path at increasing client counts.
+
+For each operation and each client count (default 1, 10 and 100) this runs
+the same number of requests twice against the loaded data:
+  sync   one thread per client, psycopg2 through db.ConnectionPool
+  async  one task per client on one event loop, psycopg 3 through
+         async_dal.open_async_pool
+Both pools have --pool-size connections in autocommit mode, so the ratio
+compares the client paths rather than BEGIN/ROLLBACK round trips. With 100
+clients most of them wait for a connection, as they would behind a
+service. Every request checks a connection out and back in. Reports requests/s and p50/p95/p99
+latency per path and the async/sync throughput ratio.
+
+Usage:
+    python bench/async_reads.py
+    python bench/async_reads.py --ops dashboard,overview --clients 1,10,100 --requests 3000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import async_dal  # noqa: E402
+from dal import fetch_member_dashboard, fetch_member_overview, fetch_upcoming_classes  # noqa: E402
+from db import ConnectionPool  # noqa: E402
+from run_benchmarks import id_range, percentile  # noqa: E402
+from scheduling import fetch_trainer_agenda_page  # noqa: E402
+
+
+def build_operations(conn):
+    """Map operation name -> (sync callable(conn, rng), async callable(conn, rng))."""
+    members = id_range(conn, "Member", "member_id")
+    trainers = id_range(conn, "Trainer", "trainer_id")
+    return {
+        "dashboard": (
+            lambda c, rng: fetch_member_dashboard(c, rng.randint(*members)),
+            lambda c, rng: async_dal.fetch_member_dashboard(c, rng.randint(*members)),
+        ),
+        "overview": (
+            lambda c, rng: fetch_member_overview(c, rng.randint(*members)),
+            lambda c, rng: async_dal.fetch_member_overview(c, rng.randint(*members)),
+        ),
+        "schedule": (
+            lambda c, rng: fetch_trainer_agenda_page(c, rng.randint(*trainers), limit=20),
+            lambda c, rng: async_dal.fetch_trainer_agenda_page(c, rng.randint(*trainers), limit=20),
+        ),
+        "classes": (
+            lambda c, rng: fetch_upcoming_classes(c),
+            lambda c, rng: async_dal.fetch_upcoming_classes(c),
+        ),
+    }
+
+
+def summarize(samples, errors, elapsed):
+    samples.sort()
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "requests_per_s": len(samples) / elapsed if elapsed else 0.0,
+    }
+
+
+def run_sync(pool, operation, requests, clients, seed):
+    samples = []
+    errors = [0]
+    lock = threading.Lock()
+    per_client = [requests // clients + (1 if i < requests % clients else 0) for i in range(clients)]
+
+    def worker(index, count):
+        rng = random.Random(seed + index)
+        local = []
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                with pool.connection() as conn:
+                    operation(conn, rng)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append((time.perf_counter() - started) * 1000)
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_client)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(samples, errors[0], time.perf_counter() - started)
+
+
+async def run_async(pool, operation, requests, clients, seed):
+    samples = []
+    errors = 0
+    per_client = [requests // clients + (1 if i < requests % clients else 0) for i in range(clients)]
+
+    async def worker(index, count):
+        nonlocal errors
+        rng = random.Random(seed + index)
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                async with pool.connection() as conn:
+                    await operation(conn, rng)
+            except Exception:
+                errors += 1
+                continue
+            samples.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i, n) for i, n in enumerate(per_client)))
+    return summarize(samples, errors, time.perf_counter() - started)
+
+
+def print_results(results):
+    print(f"{'operation':<10} {'clients':>7} {'path':<6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'errors':>6}  async/sync")
+    for r in results:
+        ratio = (r["async"]["requests_per_s"] / r["sync"]["requests_per_s"]
+                 if r["sync"]["requests_per_s"] else 0.0)
+        for path in ("sync", "async"):
+            s = r[path]
+            print(f"{r['operation']:<10} {r['clients']:>7} {path:<6} {s['requests_per_s']:>9.1f} "
+                  f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['errors']:>6}"
+                  + (f"  {ratio:.2f}x" if path == "async" else ""))
+
+
+async def run_all(args, operations, selected, clients_list):
+    sync_pool = ConnectionPool(minconn=args.pool_size, maxconn=args.pool_size, validate=False,
+                               autocommit=True)
+    async_pool = await async_dal.open_async_pool(min_size=args.pool_size, max_size=args.pool_size)
+    results = []
+    try:
+        for name in selected:
+            sync_op, async_op = operations[name]
+            for clients in clients_list:
+                # the sync run blocks in threads; keep it off the event loop
+                sync_result = await asyncio.to_thread(run_sync, sync_pool, sync_op, args.requests,
+                                                      clients, args.seed)
+                async_result = await run_async(async_pool, async_op, args.requests, clients, args.seed)
+                results.append({"operation": name, "clients": clients,
+                                "sync": sync_result, "async": async_result})
+    finally:
+        await async_pool.close()
+        sync_pool.closeall()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ops", help="comma-separated operations (default: all)")
+    parser.add_argument("--clients", default="1,10,100", help="comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per operation and client count")
+    parser.add_argument("--pool-size", type=int, default=async_dal.ASYNC_POOL_SIZE)
+    parser.add_argument("--seed", type=int, default=3005)
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args()
+    clients_list = [int(c) for c in args.clients.split(",")]
+
+    setup_pool = ConnectionPool(minconn=1, maxconn=1)
+    try:
+        with setup_pool.connection() as conn:
+            operations = build_operations(conn)
+    finally:
+        setup_pool.closeall()
+    selected = args.ops.split(",") if args.ops else list(operations)
+    unknown = set(selected) - set(operations)
+    if unknown:
+        raise SystemExit(f"Unknown operations: {', '.join(sorted(unknown))}")
+
+    try:
+        results = asyncio.run(run_all(args, operations, selected, clients_list))
+    except async_dal.AsyncUnavailable as e:
+        raise SystemExit(str(e))
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"),
+                       "args": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Dashboard latency benchmark as HealthMetric history grows.
+
+Creates a throw-away member plus a crowd of background metric rows for
+other throw-away members, then grows the history step by step (e.g. up to
+a few million rows) and times fetch_member_dashboard() at every step.
+With the lateral join and the (member_id, recorded_at) index the latency
+should stay flat. All benchmark rows are removed afterwards.
+
+Usage:
+    python bench/dashboard_latency.py --steps 1000,10000,100000,1000000,3000000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db import get_connection  # noqa: E402
+from dal import fetch_member_dashboard  # noqa: E402
+
+
+def create_members(conn, tag, count):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO Member(full_name, email, target_weight)
+            SELECT 'Dashboard Bench ' || g, 'dash-' || %s || '-' || g || '@example.com', 75
+            FROM generate_series(1, %s) AS g
+            RETURNING member_id;
+            """,
+            (tag, count),
+        )
+        ids = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    return ids
+
+
+def create_partitions(conn, minutes):
+    """HealthMetric is partitioned by month (migration 0013); create the months the history spans."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regproc('create_healthmetric_partitions') IS NOT NULL;")
+        if not cur.fetchone()[0]:
+            return
+        cur.execute(
+            "SELECT create_healthmetric_partitions((NOW() - make_interval(mins => %s))::TIMESTAMP, "
+            "NOW()::TIMESTAMP);",
+            (minutes,),
+        )
+    conn.commit()
+
+
+def grow_history(conn, member_ids, rows):
+    """Spread `rows` new readings across the given members, one per minute back in time."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO HealthMetric(member_id, recorded_at, weight, heart_rate, body_fat_percentage)
+            SELECT ids[1 + g %% array_length(ids, 1)],
+                   NOW() - (g || ' minutes')::INTERVAL,
+                   60 + random() * 40,
+                   55 + (random() * 40)::INT,
+                   10 + random() * 20
+            FROM generate_series(1, %s) AS g,
+                 (SELECT %s::INT[] AS ids) AS m;
+            """,
+            (rows, member_ids),
+        )
+    conn.commit()
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE HealthMetric;")
+    conn.commit()
+
+
+def time_dashboard(conn, member_id, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fetch_member_dashboard(conn, member_id)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--steps", default="1000,10000,100000,1000000",
+                        help="comma-separated total history sizes to measure at")
+    parser.add_argument("--members", type=int, default=100,
+                        help="members sharing the generated history")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    steps = sorted(int(s) for s in args.steps.split(","))
+
+    conn = get_connection()
+    if not conn:
+        return
+
+    tag = uuid.uuid4().hex[:8]
+    member_ids = create_members(conn, tag, args.members)
+    probe = member_ids[0]
+    loaded = 0
+    try:
+        # readings go up to max(steps) minutes back
+        create_partitions(conn, max(steps))
+        print(f"{'rows':>12} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        for total in steps:
+            grow_history(conn, member_ids, total - loaded)
+            loaded = total
+            samples = sorted(time_dashboard(conn, probe, args.repeat))
+            p95 = samples[int(len(samples) * 0.95) - 1]
+            print(f"{total:>12} {statistics.median(samples):>8.3f} {p95:>8.3f} {samples[-1]:>8.3f}")
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM Member WHERE member_id = ANY(%s);", (member_ids,))
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Seeded synthetic data generator for the sql/DDL.sql schema.
+
+Fills every table to the requested sizes with COPY, using a fixed random
+seed so two runs with the same arguments produce the same database.
+Schedules are generated on a grid so that no room or trainer is ever
+double-booked and no class is filled past its capacity. The class and PT
+grids are centred on today, so about half of them are still upcoming.
+
+The generator owns the ID space: it refuses to run against a database
+that already has members unless --reset is given, which TRUNCATEs every
+table first.
+
+Usage:
+    python bench/generate_data.py --reset --preset small
+    python bench/generate_data.py --reset --preset large     # 100k members, 50M metrics, 1M registrations
+    python bench/generate_data.py --reset --members 5000 --metrics 2000000
+"""
+
+import argparse
+import io
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db import get_connection  # noqa: E402
+
+
+PRESETS = {
+    "small": dict(members=1000, trainers=20, rooms=8, classes=2000,
+                  registrations=20000, metrics=100000, pt_sessions=5000,
+                  equipment=200, maintenance=2000),
+    "medium": dict(members=20000, trainers=100, rooms=20, classes=20000,
+                   registrations=200000, metrics=5000000, pt_sessions=50000,
+                   equipment=1000, maintenance=50000),
+    "large": dict(members=100000, trainers=300, rooms=40, classes=80000,
+                  registrations=1000000, metrics=50000000, pt_sessions=300000,
+                  equipment=5000, maintenance=1000000),
+}
+
+# ScheduleOccupancy (a trigger-maintained mirror without FKs) and the archive
+# log are listed explicitly: TRUNCATE fires no row triggers and CASCADE
+# only follows foreign keys
+TABLES = [
+    "EquipmentMaintenance", "Equipment", "PTSession", "TrainerAvailability",
+    "ClassRegistration", "GroupClass", "Room", "HealthMetric", "Trainer", "Member",
+    "ScheduleOccupancy", "HealthMetricArchive",
+]
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+ROOM_TYPES = ["Yoga", "HIIT", "Strength", "Cycling", "Pilates", "Cardio"]
+SPECIALIZATIONS = ["Strength Training", "HIIT & Cardio", "Yoga", "Mobility", "Boxing"]
+CLASS_TITLES = ["Morning HIIT", "Strength 101", "Power Yoga", "Spin", "Core Blast", "Pilates Flow"]
+MAINTENANCE_STATUSES = ["Open", "In Progress", "Resolved", "Resolved", "Resolved"]
+
+
+class RowStream(io.TextIOBase):
+    """Feed rows from a generator to COPY in text format without building the file in memory."""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._buffer = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += "\t".join("\\N" if v is None else str(v) for v in row) + "\n"
+        if size < 0:
+            chunk, self._buffer = self._buffer, ""
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def copy_rows(conn, table, columns, rows):
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.copy_expert(
+            f"COPY {table}({', '.join(columns)}) FROM STDIN;",
+            RowStream(iter(rows)),
+            size=1 << 18,
+        )
+        count = cur.rowcount
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, %s), "
+            f"GREATEST((SELECT MAX({columns[0]}) FROM {table}), 1));",
+            (table.lower(), columns[0]),
+        )
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    print(f"  {table:<22} {count:>12,} rows  {elapsed:8.1f}s  {count / max(elapsed, 1e-9):>12,.0f} rows/s")
+
+
+# ---- row generators ----
+
+def gen_members(rng, n):
+    today = datetime.now().date()
+    for i in range(1, n + 1):
+        born = today - timedelta(days=rng.randint(18 * 365, 70 * 365))
+        joined = today - timedelta(days=rng.randint(0, 5 * 365))
+        yield (i, f"Member {i}", born, rng.choice(["Male", "Female", "Other"]),
+               f"member{i}@example.com", f"555-{i % 10000:04d}", joined,
+               "Generated goal", round(rng.uniform(50, 110), 2))
+
+
+def gen_trainers(rng, n):
+    for i in range(1, n + 1):
+        yield (i, f"Trainer {i}", f"trainer{i}@fitclub.com", f"555-9{i % 1000:03d}",
+               rng.choice(SPECIALIZATIONS), datetime(2015, 1, 1).date() + timedelta(days=rng.randint(0, 3000)))
+
+
+def gen_rooms(rng, n):
+    for i in range(1, n + 1):
+        yield (i, f"Studio {i}", rng.choice(ROOM_TYPES), rng.randint(10, 40))
+
+
+def gen_availability(rng, trainers):
+    # two non-overlapping windows on three different days per trainer
+    availability_id = 0
+    for t in range(1, trainers + 1):
+        for day in rng.sample(DAYS, 3):
+            for start, end in (("07:00", "11:00"), ("13:00", "18:00")):
+                availability_id += 1
+                yield (availability_id, t, day, start, end)
+
+
+def grid_base(today, count, rooms, trainers):
+    """
+    Start of a grid of `count` bookings (see schedule_grid) centred on
+    `today` (midnight), so part of the schedule lies in the future. It is
+    always an even number of hours before midnight, which keeps classes on
+    even hours and PT sessions on odd hours whatever the grid sizes.
+    """
+    slots = math.ceil(count / max(1, min(rooms, trainers)))
+    return today - timedelta(hours=2 * (slots // 2))
+
+
+def schedule_grid(classes, rooms, trainers, base):
+    """
+    Yield (slot_start, room_id, trainer_id) for `classes` one-hour classes.
+    Classes run on even hours with at most min(rooms, trainers) in parallel,
+    so no room or trainer is booked twice; odd hours are left for PT sessions.
+    """
+    parallel = max(1, min(rooms, trainers))
+    for i in range(classes):
+        slot, idx = divmod(i, parallel)
+        start = base + timedelta(hours=2 * slot)
+        yield start, idx + 1, (idx + slot) % trainers + 1
+
+
+def gen_classes(rng, n, rooms, trainers, base, capacities):
+    for class_id, (start, room_id, trainer_id) in enumerate(schedule_grid(n, rooms, trainers, base), start=1):
+        yield (class_id, rng.choice(CLASS_TITLES), "Generated class", start,
+               start + timedelta(hours=1), capacities[class_id - 1], trainer_id, room_id)
+
+
+def gen_registrations(rng, members, class_capacities, total):
+    # classes are filled to capacity in random order, so past and upcoming
+    # classes both get registrations and some upcoming ones still have room
+    class_ids = list(range(1, len(class_capacities) + 1))
+    rng.shuffle(class_ids)
+    registration_id = 0
+    for class_id in class_ids:
+        capacity = class_capacities[class_id - 1]
+        if registration_id >= total:
+            return
+        take = min(capacity, total - registration_id, members)
+        for member_id in rng.sample(range(1, members + 1), take):
+            registration_id += 1
+            yield (registration_id, member_id, class_id)
+
+
+METRIC_HISTORY = timedelta(days=2 * 365)
+
+
+def gen_metrics(rng, members, n, now):
+    span = int(METRIC_HISTORY.total_seconds())
+    for i in range(1, n + 1):
+        member_id = rng.randint(1, members)
+        yield (i, member_id, now - timedelta(seconds=rng.randint(0, span)),
+               round(rng.uniform(55, 120), 2), rng.randint(48, 110),
+               round(rng.uniform(8, 35), 2), None)
+
+
+def gen_pt_sessions(rng, n, members, rooms, trainers, base):
+    # odd hours only, so sessions never overlap the class grid
+    parallel = max(1, min(rooms, trainers))
+    for i in range(n):
+        slot, idx = divmod(i, parallel)
+        start = base + timedelta(hours=2 * slot + 1)
+        status = "Scheduled" if start > datetime.now() else rng.choice(["Completed", "Completed", "No-Show", "Cancelled"])
+        yield (i + 1, rng.randint(1, members), (idx + slot) % trainers + 1, idx + 1,
+               start, start + timedelta(hours=1), status)
+
+
+def gen_equipment(rng, n, rooms):
+    for i in range(1, n + 1):
+        yield (i, rng.randint(1, rooms), f"Machine {i}",
+               rng.choice(["Cardio Machine", "Strength Machine", "Weights"]), "Working")
+
+
+def gen_maintenance(rng, n, equipment, now):
+    span = 3 * 365 * 24 * 3600
+    for i in range(1, n + 1):
+        reported = now - timedelta(seconds=rng.randint(0, span))
+        # the history is resolved; only recent tickets can still be open
+        recent = now - reported < timedelta(days=60)
+        status = rng.choice(MAINTENANCE_STATUSES) if recent else "Resolved"
+        resolved = reported + timedelta(hours=rng.randint(1, 240)) if status == "Resolved" else None
+        yield (i, rng.randint(1, equipment), reported, f"Generated issue {i}", status,
+               rng.choice([None, "Tech A", "Tech B"]), resolved)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    for name in PRESETS["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name,
+                            help=f"override the preset's {name} count")
+    parser.add_argument("--seed", type=int, default=3005)
+    parser.add_argument("--reset", action="store_true",
+                        help="TRUNCATE all tables before loading")
+    args = parser.parse_args()
+
+    sizes = dict(PRESETS[args.preset])
+    for name in sizes:
+        if getattr(args, name) is not None:
+            sizes[name] = getattr(args, name)
+    # enough class seats for the requested registrations (avg capacity ~20)
+    sizes["classes"] = max(sizes["classes"], math.ceil(sizes["registrations"] / 15))
+
+    conn = get_connection()
+    if not conn:
+        return 1
+
+    with conn.cursor() as cur:
+        if args.reset:
+            cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE;")
+        else:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM Member);")
+            if cur.fetchone()[0]:
+                print("Database already has data; rerun with --reset to replace it.")
+                conn.close()
+                return 1
+    conn.commit()
+
+    rng = random.Random(args.seed)
+    now = datetime.now().replace(microsecond=0)
+    today = now.replace(hour=0, minute=0, second=0)
+    class_base = grid_base(today, sizes["classes"], sizes["rooms"], sizes["trainers"])
+    pt_base = grid_base(today, sizes["pt_sessions"], sizes["rooms"], sizes["trainers"])
+    print(f"Generating with seed {args.seed}: {sizes}")
+
+    room_caps = [r[3] for r in gen_rooms(random.Random(args.seed), sizes["rooms"])]
+    # class capacity never exceeds the room it is scheduled in
+    class_caps = [
+        min(rng.randint(10, 30), room_caps[room_id - 1])
+        for _, room_id, _ in schedule_grid(sizes["classes"], sizes["rooms"], sizes["trainers"], class_base)
+    ]
+
+    started = time.perf_counter()
+    copy_rows(conn, "Member", ["member_id", "full_name", "date_of_birth", "gender", "email",
+                               "phone", "join_date", "goal_description", "target_weight"],
+              gen_members(rng, sizes["members"]))
+    copy_rows(conn, "Trainer", ["trainer_id", "full_name", "email", "phone",
+                                "specialization", "employment_start_date"],
+              gen_trainers(rng, sizes["trainers"]))
+    copy_rows(conn, "Room", ["room_id", "name", "room_type", "capacity"],
+              gen_rooms(random.Random(args.seed), sizes["rooms"]))
+    copy_rows(conn, "TrainerAvailability", ["availability_id", "trainer_id", "day_of_week",
+                                            "start_time", "end_time"],
+              gen_availability(rng, sizes["trainers"]))
+    copy_rows(conn, "GroupClass", ["class_id", "title", "description", "start_time", "end_time",
+                                   "capacity", "trainer_id", "room_id"],
+              gen_classes(rng, sizes["classes"], sizes["rooms"], sizes["trainers"], class_base,
+                          class_caps))
+
+    # the counter triggers are per statement (migration 0012), so the whole
+    # COPY updates each class's registered_count once
+    copy_rows(conn, "ClassRegistration", ["registration_id", "member_id", "class_id"],
+              gen_registrations(rng, sizes["members"], class_caps, sizes["registrations"]))
+
+    # HealthMetric is partitioned by month (migration 0013); create the months the data spans
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regproc('create_healthmetric_partitions') IS NOT NULL;")
+        if cur.fetchone()[0]:
+            cur.execute("SELECT create_healthmetric_partitions(%s, %s);", (now - METRIC_HISTORY, now))
+    conn.commit()
+    copy_rows(conn, "HealthMetric", ["metric_id", "member_id", "recorded_at", "weight",
+                                     "heart_rate", "body_fat_percentage", "notes"],
+              gen_metrics(rng, sizes["members"], sizes["metrics"], now))
+    copy_rows(conn, "PTSession", ["pt_session_id", "member_id", "trainer_id", "room_id",
+                                  "start_time", "end_time", "status"],
+              gen_pt_sessions(rng, sizes["pt_sessions"], sizes["members"], sizes["rooms"],
+                              sizes["trainers"], pt_base))
+    copy_rows(conn, "Equipment", ["equipment_id", "room_id", "name", "equipment_type", "status"],
+              gen_equipment(rng, sizes["equipment"], sizes["rooms"]))
+    copy_rows(conn, "EquipmentMaintenance", ["maintenance_id", "equipment_id", "reported_at",
+                                             "issue_description", "status", "assigned_to",
+                                             "resolved_at"],
+              gen_maintenance(rng, sizes["maintenance"], sizes["equipment"], now))
+
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE;")
+    conn.close()
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
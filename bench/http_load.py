@@ -0,0 +1,164 @@
+"""
+Load test for the HTTP/JSON service.
+
+Start the service first (python app/main.py serve --pool-size 16), then
+run this against it. N client threads each hold one keep-alive connection
+and send a weighted mix of member, trainer and admin requests for the
+given duration, picking IDs from the loaded data (bench/generate_data.py).
+Reports requests/s overall and p50/p95/p99 latency and status codes per
+endpoint. The register endpoint writes real registrations, like the
+register operation of run_benchmarks.py.
+
+Usage:
+    python bench/http_load.py --clients 32 --duration 30
+    python bench/http_load.py --mix dashboard=5,schedule=2,queue=1 --json http.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db import get_connection  # noqa: E402
+from run_benchmarks import id_range, percentile, upcoming_class_ids  # noqa: E402
+
+DEFAULT_MIX = "dashboard=6,profile=2,classes=1,schedule=3,calendar=1,queue=2,rooms=1,register=2"
+
+
+def build_requests(conn):
+    """Map endpoint name -> callable(rng) returning (method, path, body or None)."""
+    members = id_range(conn, "Member", "member_id")
+    trainers = id_range(conn, "Trainer", "trainer_id")
+    classes = upcoming_class_ids(conn) or [id_range(conn, "GroupClass", "class_id")[1]]
+    return {
+        "dashboard": lambda rng: ("GET", f"/members/{rng.randint(*members)}/dashboard", None),
+        "profile": lambda rng: ("GET", f"/members/{rng.randint(*members)}", None),
+        "classes": lambda rng: ("GET", "/classes", None),
+        "schedule": lambda rng: ("GET", f"/trainers/{rng.randint(*trainers)}/schedule?limit=20", None),
+        "calendar": lambda rng: ("GET", f"/trainers/{rng.randint(*trainers)}/calendar.ics", None),
+        "queue": lambda rng: ("GET", "/maintenance/queue?limit=20", None),
+        "rooms": lambda rng: ("GET", "/rooms?limit=20", None),
+        "register": lambda rng: ("POST", f"/classes/{rng.choice(classes)}/registrations",
+                                 {"member_id": rng.randint(*members)}),
+    }
+
+
+def parse_mix(text, requests):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in requests:
+            raise SystemExit(f"Unknown endpoint {name!r}; choose from {', '.join(requests)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def run_load(url, requests, mix, clients, duration, seed):
+    target = urlsplit(url)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = defaultdict(list)
+    statuses = defaultdict(Counter)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        local = defaultdict(list)
+        local_status = defaultdict(Counter)
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, path, body = requests[name](rng)
+            data = json.dumps(body).encode() if body is not None else None
+            headers = {"Content-Type": "application/json"} if data else {}
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+                status = "error"
+            local[name].append((time.perf_counter() - started) * 1000)
+            local_status[name][status] += 1
+        conn.close()
+        with lock:
+            for name, values in local.items():
+                samples[name].extend(values)
+                statuses[name].update(local_status[name])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in names:
+        values = sorted(samples[name])
+        results[name] = {
+            "requests": len(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+            "requests_per_s": len(values) / elapsed if elapsed else 0.0,
+            "statuses": {str(k): v for k, v in sorted(statuses[name].items(), key=str)},
+        }
+    total = sum(r["requests"] for r in results.values())
+    return results, total / elapsed if elapsed else 0.0
+
+
+def print_results(results, throughput):
+    print(f"{'endpoint':<12} {'requests':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}  statuses")
+    for name, r in results.items():
+        codes = " ".join(f"{k}:{v}" for k, v in r["statuses"].items())
+        print(f"{name:<12} {r['requests']:>9} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['requests_per_s']:>9.1f}  {codes}")
+    print(f"total: {throughput:.1f} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,... (see DEFAULT_MIX)")
+    parser.add_argument("--seed", type=int, default=3005)
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    if not conn:
+        raise SystemExit(1)
+    try:
+        requests = build_requests(conn)
+    finally:
+        conn.close()
+    mix = parse_mix(args.mix, requests)
+
+    results, throughput = run_load(args.url, requests, mix, args.clients, args.duration, args.seed)
+    print_results(results, throughput)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"), "args": vars(args),
+                       "requests_per_s": throughput, "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Contention benchmark for group class registration.
+
+Creates one class and a batch of throw-away members, then lets N threads
+register those members for the class at the same time through the
+connection pool. Reports throughput, the outcome counts and whether the
+class was overbooked. All benchmark rows are removed afterwards.
+
+Usage:
+    python bench/registration_contention.py --clients 50 --attempts 500 --capacity 100
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db import ConnectionPool  # noqa: E402
+from dal import register_member_for_class, REGISTERED  # noqa: E402
+
+
+def setup(pool, attempts, capacity):
+    tag = uuid.uuid4().hex[:8]
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO GroupClass(title, description, start_time, end_time, capacity)
+                VALUES (%s, 'registration benchmark',
+                        NOW() + INTERVAL '1 day', NOW() + INTERVAL '1 day 1 hour', %s)
+                RETURNING class_id;
+                """,
+                (f"bench-{tag}", capacity),
+            )
+            class_id = cur.fetchone()[0]
+            cur.execute(
+                """
+                INSERT INTO Member(full_name, email)
+                SELECT 'Bench Member ' || g, 'bench-' || %s || '-' || g || '@example.com'
+                FROM generate_series(1, %s) AS g
+                RETURNING member_id;
+                """,
+                (tag, attempts),
+            )
+            member_ids = [r[0] for r in cur.fetchall()]
+        conn.commit()
+    return class_id, member_ids
+
+
+def teardown(pool, class_id, member_ids):
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM GroupClass WHERE class_id = %s;", (class_id,))
+            cur.execute("DELETE FROM Member WHERE member_id = ANY(%s);", (member_ids,))
+        conn.commit()
+
+
+def run(pool, class_id, member_ids, clients):
+    outcomes = Counter()
+    lock = threading.Lock()
+    start_gate = threading.Barrier(clients)
+    chunks = [member_ids[i::clients] for i in range(clients)]
+
+    def worker(ids):
+        local = Counter()
+        start_gate.wait()
+        with pool.connection() as conn:
+            for member_id in ids:
+                local[register_member_for_class(conn, member_id, class_id)] += 1
+        with lock:
+            outcomes.update(local)
+
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return outcomes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--attempts", type=int, default=400)
+    parser.add_argument("--capacity", type=int, default=100)
+    args = parser.parse_args()
+
+    pool = ConnectionPool(minconn=args.clients, maxconn=args.clients + 1)
+    class_id, member_ids = setup(pool, args.attempts, args.capacity)
+    try:
+        outcomes, elapsed = run(pool, class_id, member_ids, args.clients)
+
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT COUNT(*) FROM ClassRegistration WHERE class_id = %s;",
+                    (class_id,),
+                )
+                stored = cur.fetchone()[0]
+            conn.rollback()
+    finally:
+        teardown(pool, class_id, member_ids)
+        pool.closeall()
+
+    print(f"clients={args.clients} attempts={args.attempts} capacity={args.capacity}")
+    print(f"elapsed={elapsed:.3f}s throughput={args.attempts / elapsed:.1f} registrations/s")
+    print("outcomes:", dict(outcomes))
+    print(f"stored registrations={stored} overbooked={stored > args.capacity}")
+    if outcomes[REGISTERED] != stored:
+        print("WARNING: reported registrations do not match stored rows")
+
+
+if __name__ == "__main__":
+    main()
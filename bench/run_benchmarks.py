@@ -0,0 +1,221 @@
+"""
+Benchmark harness for the menu operations.
+
+Runs each operation non-interactively (through the same functions the
+menus call) against whatever data is loaded, usually a database filled
+by bench/generate_data.py. It reports p50/p95/p99 latency and throughput
+per operation and can save the results as JSON so runs before and after
+a change can be compared.
+
+Usage:
+    python bench/run_benchmarks.py --iterations 2000 --concurrency 8
+    python bench/run_benchmarks.py --ops dashboard,trainer_schedule --json after.json
+    python bench/run_benchmarks.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db import ConnectionPool  # noqa: E402
+from dal import (  # noqa: E402
+    fetch_member_dashboard, fetch_rooms_page, register_member_for_class, register_members_for_classes,
+)
+from maintenance import fetch_maintenance_page, fetch_oldest_open_per_room, fetch_work_queue  # noqa: E402
+from scheduling import fetch_trainer_agenda_page  # noqa: E402
+
+
+def id_range(conn, table, column):
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT MIN({column}), MAX({column}) FROM {table};")
+        low, high = cur.fetchone()
+    conn.rollback()
+    if low is None:
+        raise SystemExit(f"{table} is empty; load data with bench/generate_data.py first.")
+    return low, high
+
+
+def upcoming_class_ids(conn, limit=5000):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT class_id FROM GroupClass WHERE start_time > NOW() ORDER BY start_time LIMIT %s;",
+            (limit,),
+        )
+        ids = [r[0] for r in cur.fetchall()]
+    conn.rollback()
+    return ids
+
+
+def build_operations(conn):
+    """Map operation name -> callable(conn, rng) performing one request."""
+    members = id_range(conn, "Member", "member_id")
+    trainers = id_range(conn, "Trainer", "trainer_id")
+    classes = upcoming_class_ids(conn) or [id_range(conn, "GroupClass", "class_id")[1]]
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def dashboard(c, rng):
+        fetch_member_dashboard(c, rng.randint(*members))
+
+    def register(c, rng):
+        register_member_for_class(c, rng.randint(*members), rng.choice(classes))
+
+    def register_batch(c, rng):
+        # one member into a short class series, as from a school program roster
+        member_id = rng.randint(*members)
+        series = rng.sample(classes, min(12, len(classes)))
+        register_members_for_classes(c, [(member_id, class_id) for class_id in series])
+
+    def trainer_schedule(c, rng):
+        trainer_id = rng.randint(*trainers)
+        starts_from = today + timedelta(days=rng.randint(-180, 30))
+        fetch_trainer_agenda_page(c, trainer_id, starts_from=starts_from)
+
+    def maintenance(c, rng):
+        fetch_maintenance_page(c)
+
+    def maintenance_open(c, rng):
+        fetch_maintenance_page(c, status="Open")
+
+    def maintenance_queue(c, rng):
+        fetch_work_queue(c)
+
+    def oldest_open_per_room(c, rng):
+        fetch_oldest_open_per_room(c)
+
+    def rooms(c, rng):
+        fetch_rooms_page(c)
+
+    return {
+        "dashboard": dashboard,
+        "register": register,
+        "register_batch": register_batch,
+        "trainer_schedule": trainer_schedule,
+        "maintenance": maintenance,
+        "maintenance_open": maintenance_open,
+        "maintenance_queue": maintenance_queue,
+        "oldest_open_per_room": oldest_open_per_room,
+        "rooms": rooms,
+    }
+
+
+def percentile(sorted_samples, p):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(p / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+def run_operation(pool, operation, iterations, concurrency, seed):
+    samples = []
+    errors = [0]
+    lock = threading.Lock()
+    per_worker = [iterations // concurrency + (1 if i < iterations % concurrency else 0)
+                  for i in range(concurrency)]
+
+    def worker(index, count):
+        rng = random.Random(seed + index)
+        local = []
+        with pool.connection() as conn:
+            for _ in range(count):
+                started = time.perf_counter()
+                try:
+                    operation(conn, rng)
+                except Exception:
+                    conn.rollback()
+                    with lock:
+                        errors[0] += 1
+                    continue
+                local.append((time.perf_counter() - started) * 1000)
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_worker)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "errors": errors[0],
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "mean_ms": sum(samples) / len(samples) if samples else 0.0,
+        "throughput_per_s": len(samples) / elapsed if elapsed else 0.0,
+    }
+
+
+def print_results(results):
+    print(f"{'operation':<18} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10} {'errors':>7}")
+    for name, r in results.items():
+        print(f"{name:<18} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+              f"{r['throughput_per_s']:>10.1f} {r['errors']:>7}")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)["results"]
+    with open(after_path) as f:
+        after = json.load(f)["results"]
+    print(f"{'operation':<18} {'p95 before':>11} {'p95 after':>10} {'change':>8}")
+    for name in after:
+        if name not in before:
+            continue
+        b, a = before[name]["p95_ms"], after[name]["p95_ms"]
+        change = (a - b) / b * 100 if b else 0.0
+        print(f"{name:<18} {b:>11.3f} {a:>10.3f} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ops", help="comma-separated operations (default: all)")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=3005)
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two saved JSON result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    pool = ConnectionPool(minconn=1, maxconn=args.concurrency + 1)
+    try:
+        with pool.connection() as conn:
+            operations = build_operations(conn)
+        selected = args.ops.split(",") if args.ops else list(operations)
+        unknown = set(selected) - set(operations)
+        if unknown:
+            raise SystemExit(f"Unknown operations: {', '.join(sorted(unknown))}")
+
+        results = {}
+        for name in selected:
+            results[name] = run_operation(pool, operations[name], args.iterations,
+                                          args.concurrency, args.seed)
+    finally:
+        pool.closeall()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"),
+                       "args": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,591 @@
+import argparse
+import inspect
+import json
+import logging
+import os
+import re
+import sys
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import psycopg2
+from psycopg2 import errorcodes
+
+from dal import (ALREADY_REGISTERED, CLASS_FULL, NOT_FOUND, REGISTERED, fetch_member_dashboard,
+                 fetch_member_overview, fetch_rooms_page, fetch_upcoming_classes_page, get_group_class,
+                 get_member_profile, insert_availability, insert_group_class, insert_health_metric,
+                 insert_member, insert_room, register_member_for_class, register_members_for_classes,
+                 upcoming_class_key, update_class, update_member)
+from db import PoolTimeout, close_pool, get_pool
+from ical import trainer_feed
+from instrument import COLLECTORS, METRICS, set_application_name, timed_operation
+from maintenance import fetch_work_queue, log_ticket, queue_key, update_ticket
+from member_functions import REGISTRATION_MESSAGES
+from partition_maintenance import ensure_partitions
+from refcache import start_listener, stop_listener
+from scheduling import agenda_key, book_pt_session, fetch_trainer_agenda_page
+
+
+# ========= HTTP/JSON SERVICE =========
+# `python main.py serve` exposes the member, trainer and admin operations
+# to the member app and the kiosk:
+#
+#   GET   /health                          pool status
+#   GET   /metrics                         query timings (Prometheus text)
+#   POST  /members                         register a member
+#   GET   /members/{id}                    profile
+#   PATCH /members/{id}                    update profile fields
+#   GET   /members/{id}/dashboard          dashboard
+#   GET   /members/{id}/overview           dashboard, next classes, weekly rollups
+#   POST  /members/{id}/metrics            add a health metric
+#   GET   /classes                         upcoming classes page (?after=&limit=)
+#   POST  /classes                         create a class
+#   GET   /classes/{id}                    one class
+#   PATCH /classes/{id}                    update class fields
+#   POST  /classes/{id}/registrations      {"member_id": ...}
+#   POST  /registrations                   {"pairs": [[member_id, class_id], ...], "dry_run": false}
+#   GET   /trainers/{id}/schedule          agenda page (?after=&limit=&from=&before=)
+#   GET   /trainers/{id}/calendar.ics      iCalendar feed, honours If-None-Match
+#   POST  /trainers/{id}/availability      add an availability window
+#   POST  /pt-sessions                     book a PT session
+#   GET   /rooms                           rooms page (?after=&limit=&type=)
+#   POST  /rooms                           add a room
+#   GET   /maintenance/queue               open tickets page (?after=&limit=&room_id=&max_priority=)
+#   POST  /equipment/{id}/issues           open a ticket
+#   PATCH /maintenance/{id}                change a ticket
+#
+# Requests and responses are JSON objects; timestamps are ISO 8601.
+# Listings are keyset pages: {"items": [...], "next": cursor or null}, and
+# the cursor is passed back as ?after= for the next page.
+#
+# The server runs one thread per client connection (HTTP/1.1 keep-alive)
+# and all threads share the process connection pool, so the pool size caps
+# database concurrency; a request that cannot get a connection within
+# HTTP_POOL_TIMEOUT seconds is answered 503. Every session starts with
+# statement_timeout = HTTP_STATEMENT_TIMEOUT_MS; routes that need longer
+# (batch registration) raise it for that request only. A query cancelled by
+# the timeout is answered 503 as well.
+
+HTTP_STATEMENT_TIMEOUT_MS = int(os.environ.get("HEALTHCLUB_HTTP_STATEMENT_TIMEOUT_MS", "2000"))
+HTTP_BATCH_TIMEOUT_MS = int(os.environ.get("HEALTHCLUB_HTTP_BATCH_TIMEOUT_MS", "30000"))
+HTTP_POOL_SIZE = int(os.environ.get("HEALTHCLUB_HTTP_POOL_SIZE", "16"))
+HTTP_POOL_TIMEOUT = float(os.environ.get("HEALTHCLUB_HTTP_POOL_TIMEOUT", "5"))
+MAX_PAGE_SIZE = 100
+MAX_BODY_BYTES = 1 << 20
+
+log = logging.getLogger("healthclub.http")
+
+Request = namedtuple("Request", ["params", "query", "body", "headers"])
+Response = namedtuple("Response", ["status", "body", "content_type", "headers"])
+Route = namedtuple("Route", ["method", "pattern", "handler", "timeout_ms"])
+
+REGISTRATION_STATUS = {
+    REGISTERED: HTTPStatus.CREATED,
+    CLASS_FULL: HTTPStatus.CONFLICT,
+    ALREADY_REGISTERED: HTTPStatus.CONFLICT,
+    NOT_FOUND: HTTPStatus.NOT_FOUND,
+}
+
+
+class HttpError(Exception):
+    """Raised by handlers to answer with an error status and message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ---- JSON helpers ----
+
+def _jsonable(value):
+    if hasattr(value, "_asdict"):
+        return {k: _jsonable(v) for k, v in value._asdict().items()}
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return value
+
+
+def json_response(status, payload, headers=()):
+    body = json.dumps(_jsonable(payload), separators=(",", ":"))
+    return Response(status, body, "application/json", headers)
+
+
+def _error(status, message, headers=()):
+    return json_response(status, {"error": message}, headers)
+
+
+def _fields(fn, body, **fixed):
+    """
+    `body` as keyword arguments of fn(conn, **fixed, ...): unknown or missing
+    fields are a 400, like a bad line in batch_ops.
+    """
+    try:
+        inspect.signature(fn).bind(None, **fixed, **body)
+    except TypeError as e:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"bad fields: {e}") from None
+    return dict(body, **fixed)
+
+
+def _query(request, name, convert=str, default=None):
+    values = request.query.get(name)
+    if not values or values[0] == "":
+        return default
+    try:
+        return convert(values[0])
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"bad value for {name}: {values[0]!r}") from None
+
+
+def _limit(request):
+    return max(1, min(_query(request, "limit", int, 20), MAX_PAGE_SIZE))
+
+
+def _timestamp(value, name):
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{name} must be an ISO 8601 timestamp") from None
+
+
+def _cursor(key):
+    return ",".join(v.isoformat() if isinstance(v, datetime) else str(v) for v in key)
+
+
+def _after(request, *types):
+    """Decode ?after= (a cursor from a previous page) into a keyset tuple of `types`."""
+    raw = _query(request, "after")
+    if raw is None:
+        return None
+    parts = raw.split(",")
+    try:
+        if len(parts) != len(types):
+            raise ValueError(raw)
+        return tuple(datetime.fromisoformat(p) if t is datetime else t(p) for t, p in zip(types, parts))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"bad cursor: {raw!r}") from None
+
+
+def _page(rows, limit, key):
+    """A page fetched with limit + 1 rows: {"items": ..., "next": cursor or None}."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {"items": rows, "next": _cursor(key(rows[-1])) if has_more else None}
+
+
+def _found(row, what):
+    if row is None:
+        raise HttpError(HTTPStatus.NOT_FOUND, f"{what} not found")
+    return json_response(HTTPStatus.OK, row)
+
+
+# ---- members ----
+
+def create_member(conn, request):
+    member_id = insert_member(conn, **_fields(insert_member, request.body))
+    conn.commit()
+    return json_response(HTTPStatus.CREATED, {"member_id": member_id})
+
+
+def member_profile(conn, request):
+    return _found(get_member_profile(conn, int(request.params[0])), "member")
+
+
+def change_member(conn, request):
+    member_id = int(request.params[0])
+    if not update_member(conn, **_fields(update_member, request.body, member_id=member_id)):
+        raise HttpError(HTTPStatus.NOT_FOUND, "member not found")
+    conn.commit()
+    return json_response(HTTPStatus.OK, {"member_id": member_id})
+
+
+def member_dashboard(conn, request):
+    return _found(fetch_member_dashboard(conn, int(request.params[0])), "member")
+
+
+def member_overview(conn, request):
+    overview = fetch_member_overview(conn, int(request.params[0]))
+    if overview.dashboard is None:
+        raise HttpError(HTTPStatus.NOT_FOUND, "member not found")
+    return json_response(HTTPStatus.OK, overview)
+
+
+def add_member_metric(conn, request):
+    metric_id = insert_health_metric(
+        conn, **_fields(insert_health_metric, request.body, member_id=int(request.params[0]))
+    )
+    conn.commit()
+    return json_response(HTTPStatus.CREATED, {"metric_id": metric_id})
+
+
+# ---- classes and registrations ----
+
+def upcoming_classes(conn, request):
+    limit = _limit(request)
+    rows = fetch_upcoming_classes_page(conn, _after(request, datetime, int), limit + 1)
+    return json_response(HTTPStatus.OK, _page(rows, limit, upcoming_class_key))
+
+
+def create_class(conn, request):
+    class_id = insert_group_class(conn, **_fields(insert_group_class, request.body))
+    conn.commit()
+    return json_response(HTTPStatus.CREATED, {"class_id": class_id})
+
+
+def group_class(conn, request):
+    return _found(get_group_class(conn, int(request.params[0])), "class")
+
+
+def change_class(conn, request):
+    class_id = int(request.params[0])
+    if not update_class(conn, **_fields(update_class, request.body, class_id=class_id)):
+        raise HttpError(HTTPStatus.NOT_FOUND, "class not found")
+    conn.commit()
+    return json_response(HTTPStatus.OK, {"class_id": class_id})
+
+
+def register_for_class(conn, request):
+    fields = _fields(register_member_for_class, request.body, class_id=int(request.params[0]))
+    outcome = register_member_for_class(conn, **fields)
+    return json_response(REGISTRATION_STATUS.get(outcome, HTTPStatus.CONFLICT),
+                         {"outcome": outcome, "message": REGISTRATION_MESSAGES.get(outcome, outcome)})
+
+
+def register_batch(conn, request):
+    pairs = request.body.get("pairs")
+    if not isinstance(pairs, list) or not all(isinstance(p, list) and len(p) == 2 for p in pairs):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "pairs must be a list of [member_id, class_id]")
+    results = register_members_for_classes(conn, pairs, bool(request.body.get("dry_run")))
+    return json_response(HTTPStatus.OK, {"items": results})
+
+
+# ---- trainers and PT sessions ----
+
+def trainer_schedule(conn, request):
+    limit = _limit(request)
+    rows = fetch_trainer_agenda_page(
+        conn, int(request.params[0]),
+        after=_after(request, datetime, str, int),
+        limit=limit + 1,
+        starts_from=_query(request, "from", datetime.fromisoformat),
+        starts_before=_query(request, "before", datetime.fromisoformat),
+    )
+    return json_response(HTTPStatus.OK, _page(rows, limit, agenda_key))
+
+
+def trainer_calendar(conn, request):
+    feed = trainer_feed(conn, int(request.params[0]), request.headers.get("If-None-Match"))
+    if feed is None:
+        raise HttpError(HTTPStatus.NOT_FOUND, "trainer not found")
+    headers = (("ETag", feed.etag), ("Cache-Control", "no-cache"))
+    if feed.not_modified:
+        return Response(HTTPStatus.NOT_MODIFIED, "", None, headers)
+    return Response(HTTPStatus.OK, feed.body, "text/calendar; charset=utf-8", headers)
+
+
+def add_availability(conn, request):
+    availability_id = insert_availability(
+        conn, **_fields(insert_availability, request.body, trainer_id=int(request.params[0]))
+    )
+    conn.commit()
+    return json_response(HTTPStatus.CREATED, {"availability_id": availability_id})
+
+
+def book_session(conn, request):
+    body = dict(request.body)
+    start = _timestamp(body.pop("start_time", None), "start_time")
+    end = _timestamp(body.pop("end_time", None), "end_time")
+    fields = _fields(book_pt_session, body, start=start, end=end)
+    pt_session_id, check = book_pt_session(conn, **fields)
+    if pt_session_id is None:
+        return json_response(HTTPStatus.CONFLICT, {
+            "error": "slot not available",
+            "conflicts": check.conflicts,
+            "suggestions": check.suggestions,
+        })
+    return json_response(HTTPStatus.CREATED, {"pt_session_id": pt_session_id})
+
+
+# ---- rooms and maintenance ----
+
+def rooms(conn, request):
+    limit = _limit(request)
+    after = _after(request, int)
+    rows = fetch_rooms_page(conn, after[0] if after else None, limit + 1, _query(request, "type"))
+    return json_response(HTTPStatus.OK, _page(rows, limit, lambda r: (r.room_id,)))
+
+
+def create_room(conn, request):
+    room_id = insert_room(conn, **_fields(insert_room, request.body))
+    conn.commit()
+    return json_response(HTTPStatus.CREATED, {"room_id": room_id})
+
+
+def work_queue(conn, request):
+    limit = _limit(request)
+    rows = fetch_work_queue(
+        conn,
+        after=_after(request, int, datetime, int),
+        limit=limit + 1,
+        room_id=_query(request, "room_id", int),
+        max_priority=_query(request, "max_priority", int),
+    )
+    return json_response(HTTPStatus.OK, _page(rows, limit, queue_key))
+
+
+def open_ticket(conn, request):
+    fields = _fields(log_ticket, request.body, equipment_id=int(request.params[0]))
+    maintenance_id, equipment_status = log_ticket(conn, **fields)
+    return json_response(HTTPStatus.CREATED,
+                         {"maintenance_id": maintenance_id, "equipment_status": equipment_status})
+
+
+def change_ticket_status(conn, request):
+    fields = _fields(update_ticket, request.body, maintenance_id=int(request.params[0]))
+    result = update_ticket(conn, **fields)
+    if result is None:
+        raise HttpError(HTTPStatus.NOT_FOUND, "maintenance request not found")
+    return json_response(HTTPStatus.OK, {"equipment_id": result[0], "equipment_status": result[1]})
+
+
+def _route(method, pattern, handler, timeout_ms=None):
+    return Route(method, re.compile(pattern), handler, timeout_ms)
+
+
+ROUTES = [
+    _route("POST", r"/members", create_member),
+    _route("GET", r"/members/(\d+)", member_profile),
+    _route("PATCH", r"/members/(\d+)", change_member),
+    _route("GET", r"/members/(\d+)/dashboard", member_dashboard),
+    _route("GET", r"/members/(\d+)/overview", member_overview),
+    _route("POST", r"/members/(\d+)/metrics", add_member_metric),
+    _route("GET", r"/classes", upcoming_classes),
+    _route("POST", r"/classes", create_class),
+    _route("GET", r"/classes/(\d+)", group_class),
+    _route("PATCH", r"/classes/(\d+)", change_class),
+    _route("POST", r"/classes/(\d+)/registrations", register_for_class),
+    _route("POST", r"/registrations", register_batch, HTTP_BATCH_TIMEOUT_MS),
+    _route("GET", r"/trainers/(\d+)/schedule", trainer_schedule),
+    _route("GET", r"/trainers/(\d+)/calendar\.ics", trainer_calendar),
+    _route("POST", r"/trainers/(\d+)/availability", add_availability),
+    _route("POST", r"/pt-sessions", book_session),
+    _route("GET", r"/rooms", rooms),
+    _route("POST", r"/rooms", create_room),
+    _route("GET", r"/maintenance/queue", work_queue),
+    _route("POST", r"/equipment/(\d+)/issues", open_ticket),
+    _route("PATCH", r"/maintenance/(\d+)", change_ticket_status),
+]
+
+
+# ---- dispatch ----
+
+def _set_statement_timeout(conn, timeout_ms):
+    # outside a transaction, so the operation's own commits and rollbacks
+    # can't undo it; None goes back to the session default
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            if timeout_ms is None:
+                cur.execute("RESET statement_timeout;")
+            else:
+                cur.execute("SET statement_timeout = %s;", (int(timeout_ms),))
+    finally:
+        conn.autocommit = False
+
+
+@contextmanager
+def statement_timeout(conn, timeout_ms):
+    """Run the block with statement_timeout = timeout_ms (None: keep the session's)."""
+    if timeout_ms is None:
+        yield
+        return
+    _set_statement_timeout(conn, timeout_ms)
+    try:
+        yield
+    finally:
+        if not conn.closed:
+            conn.rollback()
+            _set_statement_timeout(conn, None)
+
+
+def _db_message(e):
+    return (e.pgerror or str(e)).strip().splitlines()[0]
+
+
+def _find_route(method, path):
+    allowed = False
+    for route in ROUTES:
+        match = route.pattern.fullmatch(path)
+        if match:
+            if route.method == method:
+                return route, match.groups()
+            allowed = True
+    raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED if allowed else HTTPStatus.NOT_FOUND,
+                    f"no route for {method} {path}")
+
+
+def dispatch(pool, method, path, query, body, headers):
+    """Run one request against a pooled connection. Returns a Response."""
+    try:
+        route, params = _find_route(method, path)
+        request = Request(params, query, body, headers)
+        with pool.connection() as conn, timed_operation(f"http.{route.handler.__name__}"):
+            set_application_name(conn, "healthclub-http")
+            try:
+                with statement_timeout(conn, route.timeout_ms):
+                    return route.handler(conn, request)
+            except BaseException:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+    except HttpError as e:
+        return _error(e.status, str(e))
+    except PoolTimeout:
+        return _error(HTTPStatus.SERVICE_UNAVAILABLE, "database busy, try again", (("Retry-After", "1"),))
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        if getattr(e, "pgcode", None) == errorcodes.QUERY_CANCELED:
+            return _error(HTTPStatus.SERVICE_UNAVAILABLE, "statement timeout", (("Retry-After", "1"),))
+        log.warning("database connection error: %s", e)
+        return _error(HTTPStatus.SERVICE_UNAVAILABLE, "database unavailable")
+    except psycopg2.IntegrityError as e:
+        return _error(HTTPStatus.CONFLICT, _db_message(e))
+    except psycopg2.DataError as e:
+        return _error(HTTPStatus.BAD_REQUEST, _db_message(e))
+    except psycopg2.Error as e:
+        log.exception("%s %s failed", method, path)
+        return _error(HTTPStatus.INTERNAL_SERVER_ERROR, _db_message(e))
+    except (ValueError, TypeError) as e:
+        return _error(HTTPStatus.BAD_REQUEST, str(e))
+    except Exception:
+        log.exception("%s %s failed", method, path)
+        return _error(HTTPStatus.INTERNAL_SERVER_ERROR, "internal error")
+
+
+def metrics_text():
+    return METRICS.to_prometheus() + "".join(c.to_prometheus() for c in COLLECTORS.values())
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "HealthClub/1.0"
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True    # the body is left unread
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e}") from None
+        if not isinstance(body, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "request body must be a JSON object")
+        return body
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        if method == "GET" and url.path == "/health":
+            response = json_response(HTTPStatus.OK, {"status": "ok", "pool": self.server.pool.stats()})
+        elif method == "GET" and url.path == "/metrics":
+            response = Response(HTTPStatus.OK, metrics_text(), "text/plain; version=0.0.4", ())
+        else:
+            try:
+                body = self._read_body()
+            except HttpError as e:
+                response = _error(e.status, str(e))
+            else:
+                response = dispatch(self.server.pool, method, url.path,
+                                    parse_qs(url.query), body, self.headers)
+        self._send(response)
+
+    def _send(self, response):
+        data = response.body.encode("utf-8")
+        self.send_response(response.status)
+        if response.content_type:
+            self.send_header("Content-Type", response.content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in response.headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        log.info("%s %s", self.address_string(), format % args)
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, pool):
+        super().__init__(address, ApiHandler)
+        self.pool = pool
+
+
+def main(argv=None):
+    """Command-line entry point: python main.py serve [--host H] [--port P] [--pool-size N]"""
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Serve the health club operations over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--pool-size", type=int, default=HTTP_POOL_SIZE,
+                        help="database connections shared by all requests")
+    parser.add_argument("--statement-timeout-ms", type=int, default=HTTP_STATEMENT_TIMEOUT_MS)
+    parser.add_argument("--access-log", action="store_true", help="log every request to stderr")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO if args.access_log else logging.WARNING,
+                        format="%(asctime)s %(name)s %(message)s")
+    # connections are not validated on checkout (one round trip less per
+    # request); a dead one fails its request with a 503 and is dropped
+    pool = get_pool(minconn=1, maxconn=max(args.pool_size, 1), timeout=HTTP_POOL_TIMEOUT, validate=False,
+                    options=f"-c statement_timeout={args.statement_timeout_ms}")
+    if not pool:
+        return 1
+    try:
+        with pool.connection() as conn:
+            ensure_partitions(conn)
+    except psycopg2.Error as e:
+        print(f"Warning: could not create upcoming HealthMetric partitions: {e}", file=sys.stderr)
+    start_listener()
+
+    server = ApiServer((args.host, args.port), pool)
+    print(f"Serving on http://{args.host}:{args.port} "
+          f"({args.pool_size} connections, statement timeout {args.statement_timeout_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stop_listener()
+        close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
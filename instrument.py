@@ -0,0 +1,199 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from psycopg2 import extensions
+
+
+# ========= QUERY INSTRUMENTATION =========
+# Every cursor created by the pool is a TimedCursor. Each execute is timed
+# and recorded under the current logical operation label, for example
+# "member.register_for_group_class.register". Statements slower than
+# SLOW_QUERY_MS are logged together with their parameters.
+
+SLOW_QUERY_MS = float(os.environ.get("HEALTHCLUB_SLOW_QUERY_MS", "200"))
+
+# histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+log = logging.getLogger("healthclub.sql")
+
+_current_operation = contextvars.ContextVar("healthclub_operation", default=None)
+
+
+@contextmanager
+def timed_operation(name):
+    """
+    Label the queries run inside the block. Nested labels are joined with
+    dots, so a step inside "member.register_for_group_class" named
+    "register" is recorded as "member.register_for_group_class.register".
+    """
+    parent = _current_operation.get()
+    token = _current_operation.set(f"{parent}.{name}" if parent else name)
+    try:
+        yield
+    finally:
+        _current_operation.reset(token)
+
+
+def current_operation():
+    return _current_operation.get() or "unlabelled"
+
+
+class QueryMetrics:
+    """Per-operation latency histograms, safe to update from many threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops = {}
+
+    def observe(self, operation, seconds, slow=False):
+        with self._lock:
+            op = self._ops.get(operation)
+            if op is None:
+                op = self._ops[operation] = {
+                    "count": 0, "sum": 0.0, "max": 0.0, "slow": 0,
+                    "buckets": [0] * len(BUCKETS),
+                }
+            op["count"] += 1
+            op["sum"] += seconds
+            op["max"] = max(op["max"], seconds)
+            if slow:
+                op["slow"] += 1
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    op["buckets"][i] += 1
+                    break
+
+    def snapshot(self):
+        """Return {operation: {count, sum, max, slow, buckets}} with cumulative buckets."""
+        with self._lock:
+            result = {}
+            for name, op in sorted(self._ops.items()):
+                running = 0
+                cumulative = []
+                for n in op["buckets"]:
+                    running += n
+                    cumulative.append(running)
+                result[name] = {
+                    "count": op["count"],
+                    "sum_seconds": op["sum"],
+                    "max_seconds": op["max"],
+                    "slow": op["slow"],
+                    "buckets": dict(zip((str(b) for b in BUCKETS), cumulative)),
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._ops.clear()
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP healthclub_query_duration_seconds Time spent in cursor execute, per logical operation.",
+            "# TYPE healthclub_query_duration_seconds histogram",
+        ]
+        snapshot = self.snapshot()
+        for name, op in snapshot.items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for bound, count in op["buckets"].items():
+                lines.append(f'healthclub_query_duration_seconds_bucket{{operation="{label}",le="{bound}"}} {count}')
+            lines.append(f'healthclub_query_duration_seconds_bucket{{operation="{label}",le="+Inf"}} {op["count"]}')
+            lines.append(f'healthclub_query_duration_seconds_sum{{operation="{label}"}} {op["sum_seconds"]:.6f}')
+            lines.append(f'healthclub_query_duration_seconds_count{{operation="{label}"}} {op["count"]}')
+        lines.append("# HELP healthclub_slow_queries_total Statements slower than the slow-query threshold.")
+        lines.append("# TYPE healthclub_slow_queries_total counter")
+        for name, op in snapshot.items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'healthclub_slow_queries_total{{operation="{label}"}} {op["slow"]}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = QueryMetrics()
+
+
+def _record(query, params, seconds):
+    operation = current_operation()
+    slow = seconds * 1000 >= SLOW_QUERY_MS
+    METRICS.observe(operation, seconds, slow)
+    if slow:
+        statement = query.decode() if isinstance(query, bytes) else str(query)
+        log.warning(
+            "slow query (%.1f ms) in %s: %s params=%r",
+            seconds * 1000, operation, " ".join(statement.split()), params,
+        )
+
+
+class TimedCursor(extensions.cursor):
+    """psycopg2 cursor that records every statement in METRICS."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _record(query, vars, time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _record(query, "<executemany>", time.perf_counter() - started)
+
+    def callproc(self, procname, parameters=None):
+        started = time.perf_counter()
+        try:
+            return super().callproc(procname, parameters)
+        finally:
+            _record(f"CALL {procname}", parameters, time.perf_counter() - started)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            _record(sql, "<copy>", time.perf_counter() - started)
+
+
+def set_application_name(conn, name):
+    """
+    Tag the session in pg_stat_activity. application_name is reported by
+    the server, so this costs a round trip only when the name changes.
+    """
+    if conn.get_parameter_status("application_name") == name:
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT set_config('application_name', %s, false);", (name,))
+    conn.commit()
+
+
+# other components (e.g. the reference data cache) export their own series;
+# a collector provides stats() -> dict and to_prometheus() -> str
+COLLECTORS = {}
+
+
+def register_collector(name, collector):
+    COLLECTORS[name] = collector
+
+
+def write_metrics(path):
+    """
+    Write METRICS and the registered collectors to `path`: JSON if it ends
+    in .json, Prometheus text otherwise.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        if path.endswith(".json"):
+            snapshot = {"queries": METRICS.snapshot()}
+            snapshot.update((name, c.stats()) for name, c in COLLECTORS.items())
+            json.dump(snapshot, f, indent=2)
+        else:
+            f.write(METRICS.to_prometheus())
+            for collector in COLLECTORS.values():
+                f.write(collector.to_prometheus())
+    os.replace(tmp, path)
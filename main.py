@@ -1,6 +1,13 @@
 # app/main.py
 
-from db import get_connection
+import logging
+import os
+import sys
+
+from db import get_pool, close_pool, run_with_connection
+from instrument import write_metrics
+from partition_maintenance import ensure_partitions
+from refcache import start_listener, stop_listener
 
 # ---- import your feature functions ----
 # Make sure these names exist in the three modules.
@@ -10,23 +17,31 @@ from member_functions import (
     add_health_metric,          # Health History – Add metric
     view_member_dashboard,      # Dashboard
     register_for_group_class,   # Group Class Registration
+    import_health_metrics,      # Health History – Bulk import
+    view_progress_trends,       # Progress analytics
+    view_metric_history,        # Health History – Daily/weekly rollups
 )
 
 from trainer_functions import (
     set_trainer_availability,   # Set Availability
     view_trainer_schedule,      # Schedule View
+    import_weekly_availability, # Bulk availability import
+    export_trainer_calendar,    # Schedule export (.ics)
 )
 
 from admin_functions import (
     manage_rooms,               # Room Booking (Add/List Rooms)
     manage_group_classes,       # Class Management (Create/Update Group Classes)
     manage_equipment_maintenance,  # Equipment Maintenance (log + view/update)
+    show_cache_stats,           # Reference cache hit/miss statistics
+    utilization_reports,        # Utilization Reports
+    schedule_pt_session,        # PT Session Booking
 )
 
 
 # ---------- MENUS ----------
 
-def member_menu(conn):
+def member_menu(pool):
     while True:
         print("\n=== Member Menu ===")
         print("1. User Registration")
@@ -34,61 +49,85 @@ def member_menu(conn):
         print("3. Add Health Metric")
         print("4. View Dashboard")
         print("5. Register for Group Class")
+        print("6. Import Wearable Metrics (CSV/JSONL)")
+        print("7. Progress Trends")
+        print("8. Metric History (weekly/daily)")
         print("0. Back to Main Menu")
 
         choice = input("Select an option: ").strip()
 
         if choice == "1":
-            register_member(conn)
+            run_with_connection(pool, register_member)
         elif choice == "2":
-            update_member_profile(conn)
+            run_with_connection(pool, update_member_profile)
         elif choice == "3":
-            add_health_metric(conn)
+            run_with_connection(pool, add_health_metric)
         elif choice == "4":
-            view_member_dashboard(conn)
+            run_with_connection(pool, view_member_dashboard)
         elif choice == "5":
-            register_for_group_class(conn)
+            run_with_connection(pool, register_for_group_class)
+        elif choice == "6":
+            run_with_connection(pool, import_health_metrics)
+        elif choice == "7":
+            run_with_connection(pool, view_progress_trends)
+        elif choice == "8":
+            run_with_connection(pool, view_metric_history)
         elif choice == "0":
             break
         else:
             print("Invalid choice, please try again.")
 
 
-def trainer_menu(conn):
+def trainer_menu(pool):
     while True:
         print("\n=== Trainer Menu ===")
         print("1. Set Availability")
         print("2. View Schedule")
+        print("3. Import Weekly Availability")
+        print("4. Export Schedule (.ics)")
         print("0. Back to Main Menu")
 
         choice = input("Select an option: ").strip()
 
         if choice == "1":
-            set_trainer_availability(conn)
+            run_with_connection(pool, set_trainer_availability)
         elif choice == "2":
-            view_trainer_schedule(conn)
+            run_with_connection(pool, view_trainer_schedule)
+        elif choice == "3":
+            run_with_connection(pool, import_weekly_availability)
+        elif choice == "4":
+            run_with_connection(pool, export_trainer_calendar)
         elif choice == "0":
             break
         else:
             print("Invalid choice, please try again.")
 
 
-def admin_menu(conn):
+def admin_menu(pool):
     while True:
         print("\n=== Admin Menu ===")
         print("1. Room Booking (Add/List Rooms)")
         print("2. Group Class Management")
         print("3. Equipment Maintenance")
+        print("4. PT Session Booking")
+        print("5. Reference Cache Stats")
+        print("6. Utilization Reports")
         print("0. Back to Main Menu")
 
         choice = input("Select an option: ").strip()
 
         if choice == "1":
-            manage_rooms(conn)
+            manage_rooms(pool)
         elif choice == "2":
-            manage_group_classes(conn)
+            manage_group_classes(pool)
         elif choice == "3":
-            manage_equipment_maintenance(conn)
+            manage_equipment_maintenance(pool)
+        elif choice == "4":
+            run_with_connection(pool, schedule_pt_session)
+        elif choice == "5":
+            show_cache_stats()
+        elif choice == "6":
+            utilization_reports(pool)
         elif choice == "0":
             break
         else:
@@ -98,25 +137,44 @@ def admin_menu(conn):
 # ---------- MAIN APP ----------
 
 def main():
+    # slow queries go to a log file so they don't interrupt the menus
+    logging.basicConfig(
+        filename=os.environ.get("HEALTHCLUB_SLOW_LOG", "slow_queries.log"),
+        level=logging.WARNING,
+        format="%(asctime)s %(name)s %(message)s",
+    )
+
     print("Connecting to database...")
-    conn = get_connection()
+    pool = get_pool()
 
-    if not conn:
-        # get_connection already prints the error
+    if not pool:
+        # get_pool already prints the error
         print("Could not connect to database. Exiting.")
         return
 
     # quick sanity check (similar to your old SELECT 1 test)
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1;")
-            result = cur.fetchone()
-            print("DB test result:", result)
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+                result = cur.fetchone()
+                print("DB test result:", result)
     except Exception as e:
         print("Database test query failed:", e)
-        conn.close()
+        close_pool()
         return
 
+    # HealthMetric is partitioned by month; make sure new readings have somewhere to go
+    # (normally done by the daily partition_maintenance.py job)
+    try:
+        with pool.connection() as conn:
+            ensure_partitions(conn)
+    except Exception as e:
+        print("Warning: could not create upcoming HealthMetric partitions:", e)
+
+    # keeps the room/trainer/equipment cache in sync with other sessions' writes
+    start_listener()
+
     # top-level menu
     while True:
         print("\n=== Health Club Management System ===")
@@ -128,20 +186,34 @@ def main():
         role = input("Select your role: ").strip()
 
         if role == "1":
-            member_menu(conn)
+            member_menu(pool)
         elif role == "2":
-            trainer_menu(conn)
+            trainer_menu(pool)
         elif role == "3":
-            admin_menu(conn)
+            admin_menu(pool)
         elif role == "0":
             print("Goodbye!")
             break
         else:
             print("Invalid choice, please try again.")
 
-    conn.close()
+    stop_listener()
+    close_pool()
+
+    metrics_file = os.environ.get("HEALTHCLUB_METRICS_FILE")
+    if metrics_file:
+        write_metrics(metrics_file)
+        print(f"Query metrics written to {metrics_file}")
 
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["run"]:
+        # scripted mode: python main.py run ops.jsonl (see batch_ops.py)
+        from batch_ops import main as run_operations_file
+        sys.exit(run_operations_file(sys.argv[2:]))
+    if sys.argv[1:2] == ["serve"]:
+        # HTTP/JSON service for the member app and kiosk (see http_api.py)
+        from http_api import main as serve
+        sys.exit(serve(sys.argv[2:]))
     main()
 
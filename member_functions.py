@@ -1,5 +1,18 @@
+import os
+
 import psycopg2
-from datetime import datetime
+
+from analytics import HISTORY_DAYS, AnalyticsUnavailable, member_progress
+from dal import (
+    ALREADY_REGISTERED, CLASS_FULL, NOT_FOUND, REGISTERED,
+    fetch_member_classes, fetch_member_dashboard, fetch_upcoming_classes_page, get_member_profile,
+    insert_health_metric, insert_member, register_member_for_class, register_members_for_classes,
+    upcoming_class_key, update_member,
+)
+from db import iter_keyset_pages, print_pages
+from instrument import timed_operation
+from metric_import import COLUMNS as METRIC_COLUMNS, load_health_metrics, print_import_result
+from rollups import fetch_metric_rollups
 
 
 # ========= MEMBER OPERATIONS =========
@@ -7,7 +20,12 @@ from datetime import datetime
 # 2) Profile Management
 # 3) Health History - Add metric
 # 4) Dashboard
-# 5) Group Class Registration
+# 5) Group Class Registration (one class, or several in one batch)
+# 6) Health History - Bulk import from wearable exports
+# 7) Progress trends (rolling averages, velocity, target projection)
+# 8) Health History - Daily/weekly rollups
+#
+# These functions only prompt and print; the queries are in dal.py.
 
 
 def register_member(conn):
@@ -28,39 +46,19 @@ def register_member(conn):
         return
 
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO Member(
-                full_name, email, date_of_birth, gender,
-                phone, goal_description, target_weight
-            )
-            VALUES (%s, %s,
-                    NULLIF(%s, '')::DATE,
-                    NULLIF(%s, ''),
-                    NULLIF(%s, ''),
-                    NULLIF(%s, ''),
-                    NULLIF(%s, '')::DECIMAL)
-            RETURNING member_id;
-            """,
-            (
-                full_name,
-                email,
-                date_of_birth,
-                gender,
-                phone,
-                goal_description,
-                target_weight,
-            ),
+        new_id = insert_member(
+            conn, full_name, email,
+            date_of_birth=date_of_birth or None,
+            gender=gender or None,
+            phone=phone or None,
+            goal_description=goal_description or None,
+            target_weight=target_weight or None,
         )
-        new_id = cur.fetchone()[0]
         conn.commit()
         print(f"Member registered successfully with ID: {new_id}")
     except psycopg2.Error as e:
         conn.rollback()
         print(f"Error registering member: {e}")
-    finally:
-        cur.close()
 
 
 def update_member_profile(conn):
@@ -74,25 +72,18 @@ def update_member_profile(conn):
         return
 
     try:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT member_id, full_name, email, phone, goal_description, target_weight "
-            "FROM Member WHERE member_id = %s;",
-            (member_id,),
-        )
-        row = cur.fetchone()
-        if not row:
+        profile = get_member_profile(conn, member_id)
+        if not profile:
             print("Member not found.")
-            cur.close()
             return
 
         print("\nCurrent profile:")
-        print(f"ID: {row[0]}")
-        print(f"Name: {row[1]}")
-        print(f"Email: {row[2]}")
-        print(f"Phone: {row[3]}")
-        print(f"Goal: {row[4]}")
-        print(f"Target weight: {row[5]}")
+        print(f"ID: {profile.member_id}")
+        print(f"Name: {profile.full_name}")
+        print(f"Email: {profile.email}")
+        print(f"Phone: {profile.phone}")
+        print(f"Goal: {profile.goal_description}")
+        print(f"Target weight: {profile.target_weight}")
 
         print("\nEnter new values (leave blank to keep current):")
         new_email = input("New email: ").strip()
@@ -100,38 +91,23 @@ def update_member_profile(conn):
         new_goal = input("New goal description: ").strip()
         new_target_weight = input("New target weight in kg: ").strip()
 
-        fields = []
-        params = []
-
-        if new_email:
-            fields.append("email = %s")
-            params.append(new_email)
-        if new_phone:
-            fields.append("phone = %s")
-            params.append(new_phone)
-        if new_goal:
-            fields.append("goal_description = %s")
-            params.append(new_goal)
-        if new_target_weight:
-            fields.append("target_weight = %s")
-            params.append(new_target_weight)
-
-        if not fields:
+        if not (new_email or new_phone or new_goal or new_target_weight):
             print("No changes provided.")
-            cur.close()
             return
 
-        params.append(member_id)
-        query = "UPDATE Member SET " + ", ".join(fields) + " WHERE member_id = %s;"
-        cur.execute(query, tuple(params))
+        update_member(
+            conn, member_id,
+            email=new_email or None,
+            phone=new_phone or None,
+            goal_description=new_goal or None,
+            target_weight=new_target_weight or None,
+        )
         conn.commit()
         print("Member profile updated successfully.")
 
     except psycopg2.Error as e:
         conn.rollback()
         print(f"Error updating profile: {e}")
-    finally:
-        cur.close()
 
 
 def add_health_metric(conn):
@@ -150,37 +126,72 @@ def add_health_metric(conn):
     notes = input("Notes (optional): ").strip()
 
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO HealthMetric(
-                member_id, recorded_at, weight, heart_rate,
-                body_fat_percentage, notes
-            )
-            VALUES (
-                %s,
-                NOW(),
-                NULLIF(%s, '')::DECIMAL,
-                NULLIF(%s, '')::INT,
-                NULLIF(%s, '')::DECIMAL,
-                NULLIF(%s, '')
-            );
-            """,
-            (
-                member_id,
-                weight,
-                heart_rate,
-                body_fat_percentage,
-                notes,
-            ),
+        insert_health_metric(
+            conn, member_id,
+            weight=weight or None,
+            heart_rate=heart_rate or None,
+            body_fat_percentage=body_fat_percentage or None,
+            notes=notes or None,
         )
         conn.commit()
         print("Health metric added successfully.")
     except psycopg2.Error as e:
         conn.rollback()
         print(f"Error adding health metric: {e}")
-    finally:
-        cur.close()
+
+
+def import_health_metrics(conn):
+    """
+    Bulk-load wearable readings (CSV or JSONL) into HealthMetric,
+    keeping the original timestamps. See metric_import.py for the format.
+    """
+    print("\n=== Import Wearable Metrics ===")
+    print("Columns: " + ", ".join(METRIC_COLUMNS))
+    path = input("Path to CSV/JSONL file: ").strip()
+    if not os.path.isfile(path):
+        print("File not found.")
+        return
+
+    try:
+        result = load_health_metrics(conn, path)
+        print_import_result(path, result)
+    except (psycopg2.Error, ValueError) as e:
+        print(f"Error importing health metrics: {e}")
+
+
+def view_metric_history(conn):
+    """
+    Show a member's weight, heart rate and body fat per week (or day),
+    read from the rollup tables rather than the raw readings.
+    """
+    print("\n=== Health Metric History ===")
+    member_id = input("Member ID: ").strip()
+    if not member_id.isdigit():
+        print("Invalid member ID.")
+        return
+    period = input("Per week or day? (w/d) [w]: ").strip().lower() or "w"
+    if period not in ("w", "d"):
+        print("Choose w or d.")
+        return
+    since = input("From (YYYY-MM-DD, blank = one year ago): ").strip() or None
+
+    try:
+        buckets = fetch_metric_rollups(conn, member_id, "week" if period == "w" else "day", since)
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error fetching metric history: {e}")
+        return
+    if not buckets:
+        print("No health metrics in that period.")
+        return
+
+    print(f"\n{'Period':<10} {'n':>4} | {'Weight avg (min-max)':<24} | "
+          f"{'HR avg (min-max)':<20} | Body fat avg (min-max)")
+    for b in buckets:
+        print(f"{b.bucket:%Y-%m-%d} {b.readings:>4} | "
+              f"{f'{b.weight_avg} ({b.weight_min}-{b.weight_max})':<24} | "
+              f"{f'{b.heart_rate_avg} ({b.heart_rate_min}-{b.heart_rate_max})':<20} | "
+              f"{b.body_fat_avg} ({b.body_fat_min}-{b.body_fat_max})")
 
 
 def view_member_dashboard(conn):
@@ -196,50 +207,77 @@ def view_member_dashboard(conn):
         return
 
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT *
-            FROM member_dashboard_view
-            WHERE member_id = %s;
-            """,
-            (member_id,),
-        )
-        row = cur.fetchone()
-        if not row:
+        d = fetch_member_dashboard(conn, member_id)
+        if not d:
             print("No dashboard data found for that member.")
             return
 
-        # Adjust indexing if your view columns differ
-        (
-            m_id,
-            full_name,
-            goal_description,
-            target_weight,
-            latest_weight,
-            latest_heart_rate,
-            latest_body_fat,
-            upcoming_classes,
-        ) = row
-
-        print(f"\nDashboard for Member {m_id} - {full_name}")
+        print(f"\nDashboard for Member {d.member_id} - {d.full_name}")
         print("----------------------------------")
-        print(f"Goal: {goal_description}")
-        print(f"Target Weight: {target_weight}")
-        print(f"Latest Weight: {latest_weight}")
-        print(f"Latest Heart Rate: {latest_heart_rate}")
-        print(f"Latest Body Fat %: {latest_body_fat}")
-        print(f"Upcoming Classes: {upcoming_classes}")
+        print(f"Goal: {d.goal_description}")
+        print(f"Target Weight: {d.target_weight}")
+        print(f"Latest Weight: {d.latest_weight}")
+        print(f"Latest Heart Rate: {d.latest_heart_rate}")
+        print(f"Latest Body Fat %: {d.latest_body_fat}")
+        print(f"30-day Avg Weight: {d.avg_weight_30d}")
+        print(f"30-day Avg Heart Rate: {d.avg_heart_rate_30d}")
+        print(f"Upcoming Classes: {d.upcoming_classes}")
+        for c in fetch_member_classes(conn, d.member_id):
+            print(f"    {c.start_time:%Y-%m-%d %H:%M}  {c.title} (class {c.class_id})")
 
     except psycopg2.Error as e:
+        conn.rollback()
         print(f"Error fetching dashboard: {e}")
-    finally:
-        cur.close()
+
+
+def view_progress_trends(conn):
+    """
+    Show weight and heart-rate trends for a member; see analytics.py.
+    """
+    print("\n=== Progress Trends ===")
+    member_id = input("Member ID: ").strip()
+    if not member_id.isdigit():
+        print("Invalid member ID.")
+        return
+
+    try:
+        trend, series = member_progress(conn, int(member_id))
+    except AnalyticsUnavailable as e:
+        print(e)
+        return
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Error computing trends: {e}")
+        return
+    if trend is None:
+        print(f"No health metrics recorded in the last {HISTORY_DAYS} days.")
+        return
+
+    print(f"\nReadings: {trend.readings} | Last: {trend.last_recorded:%Y-%m-%d %H:%M}")
+    print(f"Latest weight: {trend.latest_weight} | 7-day avg: {trend.avg_7d} | 30-day avg: {trend.avg_30d}")
+    print(f"Weight change: {trend.weight_velocity} kg/week (last 30 days)")
+    print(f"Target weight: {trend.target_weight} | Projected to reach it: "
+          f"{trend.projected_target_date or 'not on current trend'}")
+    print(f"Resting heart rate drift: {trend.resting_hr_drift} bpm per 30 days")
+
+    print("\nRecent readings:")
+    for p in series[-10:]:
+        print(f"  {p.recorded_at:%Y-%m-%d %H:%M} | Weight: {p.weight} | "
+              f"7d: {p.avg_7d} | 30d: {p.avg_30d} | HR: {p.heart_rate}")
+
+
+# What to tell the member for each register_for_class() outcome
+REGISTRATION_MESSAGES = {
+    REGISTERED: "Successfully registered for the class.",
+    CLASS_FULL: "Class is full. Cannot register.",
+    ALREADY_REGISTERED: "You are already registered for this class.",
+    NOT_FOUND: "Class or member not found.",
+}
 
 
 def register_for_group_class(conn):
     """
-    Register a member for a group class (ClassRegistration table).
+    Register a member for one or more group classes (ClassRegistration table).
     Enforces capacity and prevents duplicate registration.
     """
     print("\n=== Group Class Registration ===")
@@ -249,94 +287,43 @@ def register_for_group_class(conn):
         return
 
     try:
-        cur = conn.cursor()
-
-        # List upcoming classes with remaining spots
-        cur.execute(
-            """
-            SELECT
-                gc.class_id,
-                gc.title,
-                gc.start_time,
-                gc.end_time,
-                gc.capacity,
-                COALESCE(COUNT(cr.registration_id), 0) AS current_reg
-            FROM GroupClass gc
-            LEFT JOIN ClassRegistration cr
-                ON gc.class_id = cr.class_id
-            WHERE gc.start_time > NOW()
-            GROUP BY gc.class_id, gc.title, gc.start_time, gc.end_time, gc.capacity
-            ORDER BY gc.start_time;
-            """
-        )
-        classes = cur.fetchall()
-
-        if not classes:
-            print("No upcoming classes available.")
-            return
+        # List upcoming classes with remaining spots, a page at a time (each
+        # page's read-only transaction is ended, so the pooled connection
+        # isn't left idle in transaction while the member picks a class)
+        def fetch_page(after, limit):
+            with timed_operation("list_classes"):
+                return fetch_upcoming_classes_page(conn, after, limit)
 
         print("\nAvailable upcoming classes:")
-        for c in classes:
-            class_id, title, start_time, end_time, capacity, current_reg = c
-            remaining = capacity - current_reg
-            print(
-                f"ID {class_id}: {title} "
-                f"({start_time} - {end_time}) "
-                f"Capacity: {capacity} | Registered: {current_reg} | Remaining: {remaining}"
-            )
-
-        class_id = input("\nEnter class ID to register for: ").strip()
-        if not class_id.isdigit():
-            print("Invalid class ID.")
-            return
-
-        # Check member already registered
-        cur.execute(
-            """
-            SELECT 1 FROM ClassRegistration
-            WHERE member_id = %s AND class_id = %s;
-            """,
-            (member_id, class_id),
+        shown = print_pages(
+            iter_keyset_pages(fetch_page, upcoming_class_key),
+            lambda c: print(
+                f"ID {c.class_id}: {c.title} "
+                f"({c.start_time} - {c.end_time}) "
+                f"Capacity: {c.capacity} | Registered: {c.registered_count} | Remaining: {c.remaining}"
+            ),
+            "No upcoming classes available.",
         )
-        if cur.fetchone():
-            print("You are already registered for this class.")
+        if not shown:
             return
 
-        # Check capacity again, to be safe
-        cur.execute(
-            """
-            SELECT gc.capacity, COALESCE(COUNT(cr.registration_id), 0)
-            FROM GroupClass gc
-            LEFT JOIN ClassRegistration cr
-                ON gc.class_id = cr.class_id
-            WHERE gc.class_id = %s
-            GROUP BY gc.capacity;
-            """,
-            (class_id,),
-        )
-        row = cur.fetchone()
-        if not row:
-            print("Class not found.")
+        class_ids = input("\nEnter class ID(s) to register for (comma-separated): ").split(",")
+        class_ids = [c.strip() for c in class_ids if c.strip()]
+        if not class_ids or not all(c.isdigit() for c in class_ids):
+            print("Invalid class ID.")
             return
 
-        capacity, current_reg = row
-        if current_reg >= capacity:
-            print("Class is full. Cannot register.")
+        if len(class_ids) == 1:
+            with timed_operation("register"):
+                outcome = register_member_for_class(conn, member_id, class_ids[0])
+            print(REGISTRATION_MESSAGES.get(outcome, f"Unexpected outcome: {outcome}"))
             return
 
-        # Insert registration
-        cur.execute(
-            """
-            INSERT INTO ClassRegistration(member_id, class_id)
-            VALUES (%s, %s);
-            """,
-            (member_id, class_id),
-        )
-        conn.commit()
-        print("Successfully registered for the class.")
+        with timed_operation("register_batch"):
+            results = register_members_for_classes(conn, [(member_id, c) for c in class_ids])
+        for r in results:
+            print(f"Class {r.class_id}: " + REGISTRATION_MESSAGES.get(r.outcome, f"Unexpected outcome: {r.outcome}"))
 
     except psycopg2.Error as e:
         conn.rollback()
         print(f"Error registering for class: {e}")
-    finally:
-        cur.close()
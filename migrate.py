@@ -0,0 +1,300 @@
+import argparse
+import hashlib
+import os
+import re
+import sys
+from collections import namedtuple
+
+import psycopg2
+
+from db import get_connection
+
+
+# ========= SCHEMA MIGRATIONS =========
+# Forward-only, versioned migrations in sql/migrations, named
+# NNNN_description.sql and applied in version order. Applied versions are
+# recorded in schema_migrations, so a live database can be upgraded
+# without re-running sql/DDL.sql.
+#
+# A migration runs in a single transaction unless its first line is
+#     -- migrate:no-transaction
+# in which case each statement runs on its own in autocommit mode. That is
+# required for CREATE INDEX CONCURRENTLY, which cannot run in a transaction.
+#
+# Fresh install:  psql -f sql/DDL.sql; psql -f sql/DML.sql; python migrate.py up
+# Upgrade:        python migrate.py up --dry-run; python migrate.py up
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = next(
+    (d for d in (os.path.join(_HERE, "sql", "migrations"),
+                 os.path.join(_HERE, "..", "sql", "migrations"))
+     if os.path.isdir(d)),
+    os.path.join(_HERE, "sql", "migrations"),
+)
+
+NO_TRANSACTION = "-- migrate:no-transaction"
+
+# serializes migration runners across processes
+MIGRATION_LOCK_ID = 3005_0001
+
+Migration = namedtuple("Migration", ["version", "name", "path", "sql", "checksum", "transactional"])
+
+_FILENAME = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, encoding="utf-8") as f:
+            sql = f.read()
+        migrations.append(Migration(
+            version=match.group(1),
+            name=match.group(2),
+            path=path,
+            sql=sql,
+            checksum=hashlib.sha256(sql.encode()).hexdigest(),
+            transactional=not sql.lstrip().startswith(NO_TRANSACTION),
+        ))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration version in " + directory)
+    return migrations
+
+
+def split_statements(sql):
+    """
+    Split a script into statements on top-level semicolons, leaving
+    quoted strings, dollar-quoted bodies and comments intact.
+    """
+    statements = []
+    current = []
+    i = 0
+    dollar_tag = None
+    in_quote = False
+    while i < len(sql):
+        ch = sql[i]
+        if dollar_tag:
+            if sql.startswith(dollar_tag, i):
+                current.append(dollar_tag)
+                i += len(dollar_tag)
+                dollar_tag = None
+                continue
+        elif in_quote:
+            if ch == "'":
+                in_quote = False
+        elif ch == "'":
+            in_quote = True
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = len(sql) if end == -1 else end
+            current.append(sql[i:end])
+            i = end
+            continue
+        elif ch == "$":
+            match = re.match(r"\$[A-Za-z_]*\$", sql[i:])
+            if match:
+                dollar_tag = match.group(0)
+                current.append(dollar_tag)
+                i += len(dollar_tag)
+                continue
+        elif ch == ";":
+            statements.append("".join(current).strip())
+            current = []
+            i += 1
+            continue
+        current.append(ch)
+        i += 1
+    tail = "".join(current).strip()
+    if tail:
+        statements.append(tail)
+    # drop statements that are only comments
+    return [s for s in statements
+            if any(line.strip() and not line.strip().startswith("--") for line in s.splitlines())]
+
+
+def ensure_version_table(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version     VARCHAR(20) PRIMARY KEY,
+                name        VARCHAR(200) NOT NULL,
+                checksum    CHAR(64) NOT NULL,
+                applied_at  TIMESTAMP NOT NULL DEFAULT NOW()
+            );
+            """
+        )
+    conn.commit()
+
+
+def applied_migrations(conn):
+    """Return {version: checksum} of recorded migrations."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL;")
+        if not cur.fetchone()[0]:
+            conn.commit()
+            return {}
+        cur.execute("SELECT version, checksum FROM schema_migrations;")
+        rows = dict(cur.fetchall())
+    conn.commit()
+    return rows
+
+
+def _record(cur, migration):
+    cur.execute(
+        "INSERT INTO schema_migrations(version, name, checksum) VALUES (%s, %s, %s);",
+        (migration.version, migration.name, migration.checksum),
+    )
+
+
+def apply_migration(conn, migration):
+    if migration.transactional:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(migration.sql)
+                _record(cur, migration)
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        return
+
+    # statements run one at a time in autocommit; each must be idempotent
+    # (e.g. CREATE INDEX CONCURRENTLY IF NOT EXISTS) so a failed run can be retried
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for statement in split_statements(migration.sql):
+                cur.execute(statement)
+            _record(cur, migration)
+    finally:
+        conn.autocommit = False
+
+
+def invalid_indexes(conn):
+    """Indexes left INVALID by an interrupted CREATE INDEX CONCURRENTLY."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE NOT i.indisvalid;
+            """
+        )
+        names = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    return names
+
+
+def pending_migrations(conn, migrations):
+    applied = applied_migrations(conn)
+    for m in migrations:
+        if m.version in applied and applied[m.version] != m.checksum:
+            print(f"WARNING: migration {m.version}_{m.name} was edited after it was applied.")
+    return [m for m in migrations if m.version not in applied]
+
+
+def migrate_up(conn, target=None, dry_run=False):
+    migrations = [m for m in load_migrations() if target is None or int(m.version) <= int(target)]
+    if not dry_run:
+        ensure_version_table(conn)
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s);", (MIGRATION_LOCK_ID,))
+        if not cur.fetchone()[0]:
+            print("Another migration run is in progress.")
+            conn.rollback()
+            return False
+    conn.commit()
+
+    try:
+        pending = pending_migrations(conn, migrations)
+        if not pending:
+            print("Database is up to date.")
+            return True
+
+        for m in pending:
+            mode = "transaction" if m.transactional else "no transaction"
+            if dry_run:
+                print(f"[dry run] would apply {m.version}_{m.name} ({mode})")
+                for statement in split_statements(m.sql):
+                    code = " ".join(line for line in statement.splitlines()
+                                    if not line.strip().startswith("--"))
+                    print("    " + " ".join(code.split())[:110])
+                continue
+
+            print(f"Applying {m.version}_{m.name} ({mode})...")
+            try:
+                apply_migration(conn, m)
+            except psycopg2.Error as e:
+                print(f"Migration {m.version}_{m.name} failed: {e}")
+                if not m.transactional:
+                    broken = invalid_indexes(conn)
+                    if broken:
+                        print("Invalid indexes left behind (DROP INDEX CONCURRENTLY them, "
+                              "then re-run): " + ", ".join(broken))
+                return False
+        return True
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID,))
+        conn.commit()
+
+
+def stamp(conn, version):
+    """Record migrations up to `version` as applied without running them."""
+    ensure_version_table(conn)
+    pending = pending_migrations(conn, [m for m in load_migrations() if int(m.version) <= int(version)])
+    with conn.cursor() as cur:
+        for m in pending:
+            _record(cur, m)
+            print(f"Stamped {m.version}_{m.name}")
+    conn.commit()
+
+
+def status(conn):
+    ensure_version_table(conn)
+    applied = applied_migrations(conn)
+    for m in load_migrations():
+        if m.version not in applied:
+            state = "pending"
+        elif applied[m.version] != m.checksum:
+            state = "applied (edited since)"
+        else:
+            state = "applied"
+        print(f"{m.version}_{m.name:<45} {state}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("up", help="apply pending migrations")
+    up.add_argument("--dry-run", action="store_true", help="list what would run without changing anything")
+    up.add_argument("--target", help="stop after this version")
+    sub.add_parser("status", help="show applied and pending migrations")
+    st = sub.add_parser("stamp", help="mark migrations as applied without running them")
+    st.add_argument("version")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    if not conn:
+        return 1
+    try:
+        if args.command == "up":
+            return 0 if migrate_up(conn, args.target, args.dry_run) else 1
+        if args.command == "status":
+            status(conn)
+        elif args.command == "stamp":
+            stamp(conn, args.version)
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2 import extensions
+
+from dal import fetch_equipment, fetch_room, fetch_trainer
+from db import DB_CONFIG
+from instrument import register_collector
+
+
+# ========= REFERENCE DATA CACHE =========
+# Rooms, trainers and equipment change a few times a month but are looked
+# up on almost every admin screen. They are served from an in-process
+# read-through cache:
+#   - entries expire after REFCACHE_TTL seconds and the least recently used
+#     entry is evicted once REFCACHE_SIZE entries are held,
+#   - triggers on Room, Trainer and Equipment (migration 0011) NOTIFY on
+#     healthclub_refdata with '<table>:<id>'; a listener thread drops that
+#     row and the cached listings of that table.
+# If the listener loses its connection the whole cache is cleared, since
+# notifications sent meanwhile are lost. Without a listener the TTL alone
+# bounds staleness.
+#
+# Keys are tuples starting with the table name:
+#   (table, "row", id)        one row
+#   (table, "list", ...)      a listing (any change to the table drops it)
+
+REFCACHE_SIZE = int(os.environ.get("HEALTHCLUB_REFCACHE_SIZE", "1024"))
+REFCACHE_TTL = float(os.environ.get("HEALTHCLUB_REFCACHE_TTL", "300"))
+CHANNEL = "healthclub_refdata"
+
+log = logging.getLogger("healthclub.refcache")
+
+
+class RefCache:
+    """Thread-safe LRU cache with a TTL and per-table invalidation."""
+
+    def __init__(self, maxsize=REFCACHE_SIZE, ttl=REFCACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._generation = {}           # table -> bumped on every invalidation
+        self._epoch = 0                 # bumped by clear()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key, load):
+        """
+        Return the cached value for `key`, calling load() on a miss.
+        None results are not cached, so a missing row is looked up again.
+        """
+        now = time.monotonic()
+        table = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            generation = (self._epoch, self._generation.get(table, 0))
+
+        value = load()
+        if value is None:
+            return None
+
+        with self._lock:
+            # an invalidation that arrived while loading may make `value` stale
+            if (self._epoch, self._generation.get(table, 0)) == generation:
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+        return value
+
+    def invalidate(self, table, row_id=None):
+        """Drop one row of `table` (and its listings), or all of it if row_id is None."""
+        with self._lock:
+            self._generation[table] = self._generation.get(table, 0) + 1
+            stale = [k for k in self._entries
+                     if k[0] == table and (row_id is None or k[1] == "list" or k[2] == row_id)]
+            for k in stale:
+                del self._entries[k]
+            self._stats["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), maxsize=self.maxsize)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def to_prometheus(self):
+        stats = self.stats()
+        lines = [
+            "# HELP healthclub_refcache_events_total Reference cache lookups and removals.",
+            "# TYPE healthclub_refcache_events_total counter",
+        ]
+        for event in ("hits", "misses", "expired", "evictions", "invalidations"):
+            lines.append(f'healthclub_refcache_events_total{{event="{event}"}} {stats[event]}')
+        lines.append("# HELP healthclub_refcache_entries Entries currently cached.")
+        lines.append("# TYPE healthclub_refcache_entries gauge")
+        lines.append(f"healthclub_refcache_entries {stats['size']}")
+        return "\n".join(lines) + "\n"
+
+
+REFDATA = RefCache()
+register_collector("refcache", REFDATA)
+
+
+def handle_notification(payload, cache=REFDATA):
+    """Apply one '<table>:<id>' / '<table>:*' payload to the cache."""
+    table, _, row_id = payload.partition(":")
+    if row_id.isdigit():
+        cache.invalidate(table, int(row_id))
+    else:
+        cache.invalidate(table)
+
+
+# ---- LISTEN/NOTIFY ----
+
+class InvalidationListener(threading.Thread):
+    """Daemon thread holding a dedicated LISTEN connection."""
+
+    def __init__(self, cache=REFDATA, poll_interval=5.0, retry_delay=5.0):
+        super().__init__(name="refcache-listener", daemon=True)
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._stopping = threading.Event()
+        self.connected = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _listen(self):
+        conn = psycopg2.connect(**DB_CONFIG)
+        conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL};")
+            # anything cached before LISTEN took effect may have missed a change
+            self.cache.clear()
+            self.connected.set()
+            while not self._stopping.is_set():
+                if select.select([conn], [], [], self.poll_interval)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        handle_notification(conn.notifies.pop(0).payload, self.cache)
+        finally:
+            self.connected.clear()
+            conn.close()
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                self._listen()
+            except psycopg2.Error as e:
+                log.warning("refcache listener disconnected: %s", e)
+                self.cache.clear()
+                self._stopping.wait(self.retry_delay)
+
+
+_listener = None
+
+
+def start_listener(cache=REFDATA):
+    global _listener
+    if _listener is None or not _listener.is_alive():
+        _listener = InvalidationListener(cache)
+        _listener.start()
+    return _listener
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# ---- cached lookups ----
+
+def get_room(conn, room_id):
+    """RoomInfo for `room_id`, or None if there is no such room."""
+    room_id = int(room_id)
+    return REFDATA.get(("room", "row", room_id), lambda: fetch_room(conn, room_id))
+
+
+def get_trainer(conn, trainer_id):
+    """TrainerInfo for `trainer_id`, or None if there is no such trainer."""
+    trainer_id = int(trainer_id)
+    return REFDATA.get(("trainer", "row", trainer_id), lambda: fetch_trainer(conn, trainer_id))
+
+
+def get_equipment(conn, equipment_id):
+    """EquipmentInfo for `equipment_id`, or None if there is no such equipment."""
+    equipment_id = int(equipment_id)
+    return REFDATA.get(("equipment", "row", equipment_id), lambda: fetch_equipment(conn, equipment_id))
+
+
+def cached_listing(table, key, load):
+    """
+    Cache the result of load() as a listing of `table` under `key` (a tuple
+    of the listing's arguments). Empty listings are cached too.
+    """
+    return REFDATA.get((table, "list") + tuple(key), load)
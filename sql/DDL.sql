@@ -1,14 +1,7 @@
--- DROP TABLES (clean reset)
-DROP TABLE IF EXISTS EquipmentMaintenance CASCADE;
-DROP TABLE IF EXISTS Equipment CASCADE;
-DROP TABLE IF EXISTS PTSession CASCADE;
-DROP TABLE IF EXISTS TrainerAvailability CASCADE;
-DROP TABLE IF EXISTS ClassRegistration CASCADE;
-DROP TABLE IF EXISTS GroupClass CASCADE;
-DROP TABLE IF EXISTS Room CASCADE;
-DROP TABLE IF EXISTS HealthMetric CASCADE;
-DROP TABLE IF EXISTS Trainer CASCADE;
-DROP TABLE IF EXISTS Member CASCADE;
+-- BASELINE SCHEMA
+-- Creates the schema on an empty database. Later changes are versioned
+-- migrations in sql/migrations, applied with `python app/migrate.py up`.
+-- To wipe a development database first, run sql/reset.sql.
 
 
 -- MEMBER
@@ -55,10 +48,16 @@ CREATE TABLE GroupClass (
     capacity        INT CHECK (capacity > 0),
     trainer_id      INT REFERENCES Trainer(trainer_id) ON DELETE SET NULL,
     room_id         INT REFERENCES Room(room_id) ON DELETE SET NULL,
+    registered_count INT NOT NULL DEFAULT 0 CHECK (registered_count >= 0),
+    remaining       INT GENERATED ALWAYS AS (capacity - registered_count) STORED,
     CHECK (end_time > start_time)
 );
 
 
+CREATE INDEX idx_groupclass_start ON GroupClass(start_time);
+CREATE INDEX idx_groupclass_trainer_start ON GroupClass(trainer_id, start_time, class_id);
+
+
 -- CLASS REGISTRATION
 CREATE TABLE ClassRegistration (
     registration_id     SERIAL PRIMARY KEY,
@@ -69,6 +68,61 @@ CREATE TABLE ClassRegistration (
 );
 
 
+-- TRIGGER FUNCTION: keep GroupClass.registered_count in step with ClassRegistration
+CREATE OR REPLACE FUNCTION maintain_registration_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE GroupClass
+        SET registered_count = registered_count - 1
+        WHERE class_id = OLD.class_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE GroupClass
+        SET registered_count = registered_count + 1
+        WHERE class_id = NEW.class_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGER
+CREATE TRIGGER trg_maintain_registration_count
+AFTER INSERT OR DELETE OR UPDATE OF class_id ON ClassRegistration
+FOR EACH ROW EXECUTE FUNCTION maintain_registration_count();
+
+
+-- FUNCTION: Recompute registered_count from ClassRegistration
+-- Repairs counters that drifted (e.g. after manual edits with triggers
+-- disabled). Returns the number of classes that were corrected.
+CREATE OR REPLACE FUNCTION repair_registration_counts()
+RETURNS INT AS $$
+DECLARE
+    v_fixed INT;
+BEGIN
+    LOCK TABLE ClassRegistration IN SHARE MODE;
+
+    WITH actual AS (
+        SELECT gc.class_id, COUNT(cr.registration_id) AS n
+        FROM GroupClass gc
+        LEFT JOIN ClassRegistration cr ON cr.class_id = gc.class_id
+        GROUP BY gc.class_id
+    )
+    UPDATE GroupClass gc
+    SET registered_count = a.n
+    FROM actual a
+    WHERE a.class_id = gc.class_id
+    AND gc.registered_count <> a.n;
+
+    GET DIAGNOSTICS v_fixed = ROW_COUNT;
+    RETURN v_fixed;
+END;
+$$ LANGUAGE plpgsql;
+
+
 -- HEALTH METRIC
 CREATE TABLE HealthMetric (
     metric_id           SERIAL PRIMARY KEY,
@@ -81,6 +135,11 @@ CREATE TABLE HealthMetric (
 );
 
 
+-- latest-metric lookups (dashboard) walk this index backwards per member
+CREATE INDEX idx_healthmetric_member_recorded
+    ON HealthMetric(member_id, recorded_at DESC, metric_id DESC);
+
+
 -- PT SESSION (Personal Training Session)
 CREATE TABLE PTSession (
     pt_session_id   SERIAL PRIMARY KEY,
@@ -94,6 +153,9 @@ CREATE TABLE PTSession (
 );
 
 
+CREATE INDEX idx_ptsession_trainer_start ON PTSession(trainer_id, start_time, pt_session_id);
+
+
 -- TRAINER AVAILABILITY
 CREATE TABLE TrainerAvailability (
     availability_id     SERIAL PRIMARY KEY,
@@ -148,7 +210,7 @@ CREATE TABLE Equipment (
 CREATE TABLE EquipmentMaintenance (
     maintenance_id      SERIAL PRIMARY KEY,
     equipment_id        INT NOT NULL REFERENCES Equipment(equipment_id) ON DELETE CASCADE,
-    reported_at         TIMESTAMP DEFAULT NOW(),
+    reported_at         TIMESTAMP NOT NULL DEFAULT NOW(),
     issue_description   TEXT NOT NULL,
     status              VARCHAR(30) DEFAULT 'Open',
     assigned_to         VARCHAR(100),
@@ -156,6 +218,52 @@ CREATE TABLE EquipmentMaintenance (
 );
 
 
+-- newest-first keyset pages of the maintenance history
+CREATE INDEX idx_maintenance_reported
+    ON EquipmentMaintenance(reported_at DESC, maintenance_id DESC);
+
+
+-- FUNCTION: Group class registration
+-- Checks and inserts in one call. The class row is locked first, so
+-- concurrent registrations for the same class are serialized and the
+-- class can never be overbooked.
+-- Returns 'registered', 'full', 'duplicate' or 'not_found'.
+CREATE OR REPLACE FUNCTION register_for_class(p_member_id INT, p_class_id INT)
+RETURNS TEXT AS $$
+DECLARE
+    v_capacity INT;
+    v_current  INT;
+BEGIN
+    SELECT capacity, registered_count INTO v_capacity, v_current
+    FROM GroupClass
+    WHERE class_id = p_class_id
+    FOR UPDATE;
+
+    IF NOT FOUND OR NOT EXISTS (
+        SELECT 1 FROM Member WHERE member_id = p_member_id
+    ) THEN
+        RETURN 'not_found';
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM ClassRegistration
+        WHERE member_id = p_member_id AND class_id = p_class_id
+    ) THEN
+        RETURN 'duplicate';
+    END IF;
+
+    IF v_current >= v_capacity THEN
+        RETURN 'full';
+    END IF;
+
+    INSERT INTO ClassRegistration(member_id, class_id)
+    VALUES (p_member_id, p_class_id);
+
+    RETURN 'registered';
+END;
+$$ LANGUAGE plpgsql;
+
+
 -- VIEW: Member Dashboard
 CREATE OR REPLACE VIEW member_dashboard_view AS
 SELECT
@@ -165,20 +273,10 @@ SELECT
     m.target_weight,
 
 
-    -- Latest health metric
-    (SELECT weight FROM HealthMetric hm
-     WHERE hm.member_id = m.member_id
-     ORDER BY hm.recorded_at DESC LIMIT 1) AS latest_weight,
-
-
-    (SELECT heart_rate FROM HealthMetric hm
-     WHERE hm.member_id = m.member_id
-     ORDER BY hm.recorded_at DESC LIMIT 1) AS latest_heart_rate,
-
-
-    (SELECT body_fat_percentage FROM HealthMetric hm
-     WHERE hm.member_id = m.member_id
-     ORDER BY hm.recorded_at DESC LIMIT 1) AS latest_body_fat,
+    -- Latest health metric (one index probe per member)
+    hm.weight               AS latest_weight,
+    hm.heart_rate           AS latest_heart_rate,
+    hm.body_fat_percentage  AS latest_body_fat,
 
 
     -- Upcoming classes
@@ -188,4 +286,11 @@ SELECT
      AND gc.start_time > NOW()) AS upcoming_classes
 
 
-FROM Member m;
+FROM Member m
+LEFT JOIN LATERAL (
+    SELECT weight, heart_rate, body_fat_percentage
+    FROM HealthMetric
+    WHERE member_id = m.member_id
+    ORDER BY recorded_at DESC, metric_id DESC
+    LIMIT 1
+) hm ON TRUE;
@@ -0,0 +1,148 @@
+-- Brings a database created from the original DDL up to the current
+-- sql/DDL.sql baseline (registration counter, atomic registration
+-- function, single-scan dashboard). Safe to run on a database that was
+-- created from the current DDL.sql.
+
+
+-- GROUP CLASS registration counter
+ALTER TABLE GroupClass
+    ADD COLUMN IF NOT EXISTS registered_count INT NOT NULL DEFAULT 0 CHECK (registered_count >= 0);
+ALTER TABLE GroupClass
+    ADD COLUMN IF NOT EXISTS remaining INT GENERATED ALWAYS AS (capacity - registered_count) STORED;
+
+
+-- TRIGGER FUNCTION: keep GroupClass.registered_count in step with ClassRegistration
+CREATE OR REPLACE FUNCTION maintain_registration_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE GroupClass
+        SET registered_count = registered_count - 1
+        WHERE class_id = OLD.class_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE GroupClass
+        SET registered_count = registered_count + 1
+        WHERE class_id = NEW.class_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGER
+DROP TRIGGER IF EXISTS trg_maintain_registration_count ON ClassRegistration;
+CREATE TRIGGER trg_maintain_registration_count
+AFTER INSERT OR DELETE OR UPDATE OF class_id ON ClassRegistration
+FOR EACH ROW EXECUTE FUNCTION maintain_registration_count();
+
+
+-- FUNCTION: Recompute registered_count from ClassRegistration
+-- Repairs counters that drifted (e.g. after manual edits with triggers
+-- disabled). Returns the number of classes that were corrected.
+CREATE OR REPLACE FUNCTION repair_registration_counts()
+RETURNS INT AS $$
+DECLARE
+    v_fixed INT;
+BEGIN
+    LOCK TABLE ClassRegistration IN SHARE MODE;
+
+    WITH actual AS (
+        SELECT gc.class_id, COUNT(cr.registration_id) AS n
+        FROM GroupClass gc
+        LEFT JOIN ClassRegistration cr ON cr.class_id = gc.class_id
+        GROUP BY gc.class_id
+    )
+    UPDATE GroupClass gc
+    SET registered_count = a.n
+    FROM actual a
+    WHERE a.class_id = gc.class_id
+    AND gc.registered_count <> a.n;
+
+    GET DIAGNOSTICS v_fixed = ROW_COUNT;
+    RETURN v_fixed;
+END;
+$$ LANGUAGE plpgsql;
+
+
+SELECT repair_registration_counts();
+
+
+-- FUNCTION: Group class registration
+-- Checks and inserts in one call. The class row is locked first, so
+-- concurrent registrations for the same class are serialized and the
+-- class can never be overbooked.
+-- Returns 'registered', 'full', 'duplicate' or 'not_found'.
+CREATE OR REPLACE FUNCTION register_for_class(p_member_id INT, p_class_id INT)
+RETURNS TEXT AS $$
+DECLARE
+    v_capacity INT;
+    v_current  INT;
+BEGIN
+    SELECT capacity, registered_count INTO v_capacity, v_current
+    FROM GroupClass
+    WHERE class_id = p_class_id
+    FOR UPDATE;
+
+    IF NOT FOUND OR NOT EXISTS (
+        SELECT 1 FROM Member WHERE member_id = p_member_id
+    ) THEN
+        RETURN 'not_found';
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM ClassRegistration
+        WHERE member_id = p_member_id AND class_id = p_class_id
+    ) THEN
+        RETURN 'duplicate';
+    END IF;
+
+    IF v_current >= v_capacity THEN
+        RETURN 'full';
+    END IF;
+
+    INSERT INTO ClassRegistration(member_id, class_id)
+    VALUES (p_member_id, p_class_id);
+
+    RETURN 'registered';
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- EQUIPMENT MAINTENANCE: keyset pagination needs a non-null reported_at
+UPDATE EquipmentMaintenance SET reported_at = NOW() WHERE reported_at IS NULL;
+ALTER TABLE EquipmentMaintenance ALTER COLUMN reported_at SET NOT NULL;
+
+
+-- VIEW: Member Dashboard
+CREATE OR REPLACE VIEW member_dashboard_view AS
+SELECT
+    m.member_id,
+    m.full_name,
+    m.goal_description,
+    m.target_weight,
+
+
+    -- Latest health metric (one index probe per member)
+    hm.weight               AS latest_weight,
+    hm.heart_rate           AS latest_heart_rate,
+    hm.body_fat_percentage  AS latest_body_fat,
+
+
+    -- Upcoming classes
+    (SELECT COUNT(*) FROM ClassRegistration cr
+     JOIN GroupClass gc ON gc.class_id = cr.class_id
+     WHERE cr.member_id = m.member_id
+     AND gc.start_time > NOW()) AS upcoming_classes
+
+
+FROM Member m
+LEFT JOIN LATERAL (
+    SELECT weight, heart_rate, body_fat_percentage
+    FROM HealthMetric
+    WHERE member_id = m.member_id
+    ORDER BY recorded_at DESC, metric_id DESC
+    LIMIT 1
+) hm ON TRUE;
@@ -0,0 +1,4 @@
+-- migrate:no-transaction
+-- Index for upcoming-class listing. Built without blocking writes.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_groupclass_start
+    ON GroupClass(start_time);
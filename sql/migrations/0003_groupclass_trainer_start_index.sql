@@ -0,0 +1,4 @@
+-- migrate:no-transaction
+-- Index for trainer schedule pages. Built without blocking writes.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_groupclass_trainer_start
+    ON GroupClass(trainer_id, start_time, class_id);
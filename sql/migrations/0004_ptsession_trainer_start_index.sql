@@ -0,0 +1,4 @@
+-- migrate:no-transaction
+-- Index for trainer schedule pages. Built without blocking writes.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ptsession_trainer_start
+    ON PTSession(trainer_id, start_time, pt_session_id);
@@ -0,0 +1,4 @@
+-- migrate:no-transaction
+-- Index for per-class registration lookups and ON DELETE CASCADE from GroupClass. Built without blocking writes.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_classregistration_class
+    ON ClassRegistration(class_id);
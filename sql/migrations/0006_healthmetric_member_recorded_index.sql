@@ -0,0 +1,4 @@
+-- migrate:no-transaction
+-- Index for latest-metric lookups on the dashboard. Built without blocking writes.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_healthmetric_member_recorded
+    ON HealthMetric(member_id, recorded_at DESC, metric_id DESC);
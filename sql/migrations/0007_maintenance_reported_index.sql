@@ -0,0 +1,4 @@
+-- migrate:no-transaction
+-- Index for newest-first maintenance pages. Built without blocking writes.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_maintenance_reported
+    ON EquipmentMaintenance(reported_at DESC, maintenance_id DESC);
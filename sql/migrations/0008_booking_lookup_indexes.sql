@@ -0,0 +1,11 @@
+-- migrate:no-transaction
+-- Indexes for PT booking conflict checks: a member's own sessions and
+-- room occupancy, both looked up by time window.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ptsession_member_start
+    ON PTSession(member_id, start_time);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ptsession_room_start
+    ON PTSession(room_id, start_time);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_groupclass_room_start
+    ON GroupClass(room_id, start_time);
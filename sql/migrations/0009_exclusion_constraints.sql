@@ -0,0 +1,113 @@
+-- Overlap rules enforced by GiST exclusion constraints instead of the
+-- prevent_availability_overlap() trigger. The constraints are checked
+-- against the index, so two concurrent writers can no longer both pass.
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+
+-- RANGE TYPE over TIME for weekly availability windows
+DO $$
+BEGIN
+    CREATE TYPE timerange AS RANGE (subtype = time);
+EXCEPTION WHEN duplicate_object THEN
+    NULL;
+END;
+$$;
+
+
+-- TRAINER AVAILABILITY: no overlapping windows per trainer and weekday
+DROP TRIGGER IF EXISTS trg_prevent_availability_overlap ON TrainerAvailability;
+DROP FUNCTION IF EXISTS prevent_availability_overlap();
+
+ALTER TABLE TrainerAvailability
+    ADD CONSTRAINT trainer_availability_no_overlap
+    EXCLUDE USING gist (
+        trainer_id WITH =,
+        lower(btrim(day_of_week)) WITH =,
+        timerange(start_time, end_time) WITH &&
+    );
+
+
+-- SCHEDULE OCCUPANCY
+-- One row per group class and per non-cancelled PT session, kept in sync
+-- by triggers. Exclusion constraints here stop a room or a trainer from
+-- being booked twice across both tables.
+CREATE TABLE ScheduleOccupancy (
+    source      VARCHAR(10) NOT NULL CHECK (source IN ('class', 'pt')),
+    source_id   INT NOT NULL,
+    trainer_id  INT,
+    room_id     INT,
+    during      TSRANGE NOT NULL,
+    PRIMARY KEY (source, source_id),
+    CONSTRAINT room_no_double_booking
+        EXCLUDE USING gist (room_id WITH =, during WITH &&) WHERE (room_id IS NOT NULL),
+    CONSTRAINT trainer_no_double_booking
+        EXCLUDE USING gist (trainer_id WITH =, during WITH &&) WHERE (trainer_id IS NOT NULL)
+);
+
+
+-- TRIGGER FUNCTION: mirror GroupClass into ScheduleOccupancy
+CREATE OR REPLACE FUNCTION sync_class_occupancy()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM ScheduleOccupancy WHERE source = 'class' AND source_id = OLD.class_id;
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO ScheduleOccupancy(source, source_id, trainer_id, room_id, during)
+    VALUES ('class', NEW.class_id, NEW.trainer_id, NEW.room_id, tsrange(NEW.start_time, NEW.end_time))
+    ON CONFLICT (source, source_id) DO UPDATE
+    SET trainer_id = EXCLUDED.trainer_id,
+        room_id = EXCLUDED.room_id,
+        during = EXCLUDED.during;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGER (registered_count updates don't touch the schedule, so they skip it)
+CREATE TRIGGER trg_sync_class_occupancy
+AFTER INSERT OR DELETE OR UPDATE OF start_time, end_time, trainer_id, room_id ON GroupClass
+FOR EACH ROW EXECUTE FUNCTION sync_class_occupancy();
+
+
+-- TRIGGER FUNCTION: mirror PTSession into ScheduleOccupancy (cancelled sessions free their slot)
+CREATE OR REPLACE FUNCTION sync_pt_occupancy()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' OR NEW.status = 'Cancelled' THEN
+        DELETE FROM ScheduleOccupancy
+        WHERE source = 'pt'
+        AND source_id = CASE WHEN TG_OP = 'DELETE' THEN OLD.pt_session_id ELSE NEW.pt_session_id END;
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO ScheduleOccupancy(source, source_id, trainer_id, room_id, during)
+    VALUES ('pt', NEW.pt_session_id, NEW.trainer_id, NEW.room_id, tsrange(NEW.start_time, NEW.end_time))
+    ON CONFLICT (source, source_id) DO UPDATE
+    SET trainer_id = EXCLUDED.trainer_id,
+        room_id = EXCLUDED.room_id,
+        during = EXCLUDED.during;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGER
+CREATE TRIGGER trg_sync_pt_occupancy
+AFTER INSERT OR DELETE OR UPDATE OF start_time, end_time, trainer_id, room_id, status ON PTSession
+FOR EACH ROW EXECUTE FUNCTION sync_pt_occupancy();
+
+
+-- backfill; fails (and rolls back) if existing rows already double-book a room or trainer
+INSERT INTO ScheduleOccupancy(source, source_id, trainer_id, room_id, during)
+SELECT 'class', class_id, trainer_id, room_id, tsrange(start_time, end_time)
+FROM GroupClass;
+
+INSERT INTO ScheduleOccupancy(source, source_id, trainer_id, room_id, during)
+SELECT 'pt', pt_session_id, trainer_id, room_id, tsrange(start_time, end_time)
+FROM PTSession
+WHERE status <> 'Cancelled';
@@ -0,0 +1,38 @@
+-- Per-trainer schedule version, bumped whenever one of the trainer's
+-- classes or PT sessions changes. Calendar feeds use it as their ETag, so
+-- an unchanged schedule is answered without re-reading it.
+
+ALTER TABLE Trainer
+    ADD COLUMN IF NOT EXISTS schedule_version BIGINT NOT NULL DEFAULT 0;
+
+
+-- TRIGGER FUNCTION: bump schedule_version of the old and new trainer
+CREATE OR REPLACE FUNCTION bump_trainer_schedule_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.trainer_id IS NOT NULL THEN
+        UPDATE Trainer SET schedule_version = schedule_version + 1
+        WHERE trainer_id = OLD.trainer_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.trainer_id IS NOT NULL
+       AND (TG_OP = 'INSERT' OR NEW.trainer_id IS DISTINCT FROM OLD.trainer_id) THEN
+        UPDATE Trainer SET schedule_version = schedule_version + 1
+        WHERE trainer_id = NEW.trainer_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGERS (registration counter updates don't change the calendar)
+CREATE TRIGGER trg_class_schedule_version
+AFTER INSERT OR DELETE OR UPDATE OF title, description, start_time, end_time, trainer_id, room_id
+ON GroupClass
+FOR EACH ROW EXECUTE FUNCTION bump_trainer_schedule_version();
+
+CREATE TRIGGER trg_pt_schedule_version
+AFTER INSERT OR DELETE OR UPDATE OF member_id, trainer_id, room_id, start_time, end_time, status
+ON PTSession
+FOR EACH ROW EXECUTE FUNCTION bump_trainer_schedule_version();
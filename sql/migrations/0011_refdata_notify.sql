@@ -0,0 +1,54 @@
+-- Announce changes to reference data (rooms, trainers, equipment) on the
+-- healthclub_refdata channel, so application processes can drop exactly
+-- the cached rows that changed. Payload: '<table>:<id>', or '<table>:*'
+-- after a TRUNCATE. Notifications are delivered on commit, and identical
+-- payloads within one transaction are sent once.
+
+CREATE OR REPLACE FUNCTION notify_refdata_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    tbl TEXT := lower(TG_TABLE_NAME);
+    key_column TEXT := TG_ARGV[0];
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('healthclub_refdata', tbl || ':*');
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('healthclub_refdata', tbl || ':' || (to_jsonb(OLD) ->> key_column));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('healthclub_refdata', tbl || ':' || (to_jsonb(NEW) ->> key_column));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE TRIGGER trg_room_refdata
+AFTER INSERT OR UPDATE OR DELETE ON Room
+FOR EACH ROW EXECUTE FUNCTION notify_refdata_change('room_id');
+
+CREATE TRIGGER trg_room_refdata_truncate
+AFTER TRUNCATE ON Room
+FOR EACH STATEMENT EXECUTE FUNCTION notify_refdata_change('room_id');
+
+-- schedule_version (migration 0010) changes with every class/session edit
+-- and is not cached, so only the profile columns count here
+CREATE TRIGGER trg_trainer_refdata
+AFTER INSERT OR DELETE OR UPDATE OF full_name, email, phone, specialization, employment_start_date
+ON Trainer
+FOR EACH ROW EXECUTE FUNCTION notify_refdata_change('trainer_id');
+
+CREATE TRIGGER trg_trainer_refdata_truncate
+AFTER TRUNCATE ON Trainer
+FOR EACH STATEMENT EXECUTE FUNCTION notify_refdata_change('trainer_id');
+
+CREATE TRIGGER trg_equipment_refdata
+AFTER INSERT OR UPDATE OR DELETE ON Equipment
+FOR EACH ROW EXECUTE FUNCTION notify_refdata_change('equipment_id');
+
+CREATE TRIGGER trg_equipment_refdata_truncate
+AFTER TRUNCATE ON Equipment
+FOR EACH STATEMENT EXECUTE FUNCTION notify_refdata_change('equipment_id');
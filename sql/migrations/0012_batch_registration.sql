@@ -0,0 +1,116 @@
+-- Batch class registration.
+--
+-- 1. registered_count is maintained per statement instead of per row: the
+--    triggers read the statement's transition table and apply one UPDATE
+--    per affected class, so a 5,000-row insert costs a handful of updates
+--    instead of 5,000.
+-- 2. register_batch() registers many (member, class) pairs at once with the
+--    same rules as register_for_class(), checked set-wise.
+
+
+-- TRIGGER FUNCTION: apply the net registration change of one statement
+CREATE OR REPLACE FUNCTION maintain_registration_count_stmt()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE GroupClass gc
+        SET registered_count = gc.registered_count + d.n
+        FROM (SELECT class_id, COUNT(*) AS n FROM new_rows GROUP BY class_id) d
+        WHERE gc.class_id = d.class_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE GroupClass gc
+        SET registered_count = gc.registered_count - d.n
+        FROM (SELECT class_id, COUNT(*) AS n FROM old_rows GROUP BY class_id) d
+        WHERE gc.class_id = d.class_id;
+    ELSE
+        UPDATE GroupClass gc
+        SET registered_count = gc.registered_count + d.n
+        FROM (
+            SELECT class_id, SUM(delta) AS n
+            FROM (SELECT class_id, 1 AS delta FROM new_rows
+                  UNION ALL
+                  SELECT class_id, -1 FROM old_rows) moves
+            GROUP BY class_id
+            HAVING SUM(delta) <> 0
+        ) d
+        WHERE gc.class_id = d.class_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGERS (transition tables need one trigger per event)
+DROP TRIGGER IF EXISTS trg_maintain_registration_count ON ClassRegistration;
+
+CREATE TRIGGER trg_registration_count_insert
+AFTER INSERT ON ClassRegistration
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION maintain_registration_count_stmt();
+
+CREATE TRIGGER trg_registration_count_delete
+AFTER DELETE ON ClassRegistration
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION maintain_registration_count_stmt();
+
+CREATE TRIGGER trg_registration_count_update
+AFTER UPDATE ON ClassRegistration
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION maintain_registration_count_stmt();
+
+
+-- FUNCTION: register many (member, class) pairs in one statement
+-- Pairs are given as two parallel arrays; the result has one row per pair,
+-- in input order (ord is 1-based), with the same outcomes as
+-- register_for_class(): 'registered', 'full', 'duplicate' or 'not_found'.
+-- A pair repeated within the batch is registered once and reported as
+-- 'duplicate' after that. When a class has fewer seats left than requests,
+-- the earliest pairs in the batch get the seats.
+CREATE OR REPLACE FUNCTION register_batch(p_member_ids INT[], p_class_ids INT[])
+RETURNS TABLE(ord INT, member_id INT, class_id INT, outcome TEXT) AS $$
+    -- lock the classes in id order, so concurrent batches can't deadlock and
+    -- single registrations (register_for_class) wait for us
+    SELECT 1
+    FROM GroupClass
+    WHERE class_id = ANY(p_class_ids)
+    ORDER BY class_id
+    FOR UPDATE;
+
+    WITH req AS (
+        SELECT r.ord::INT AS ord, r.member_id, r.class_id
+        FROM unnest(p_member_ids, p_class_ids) WITH ORDINALITY AS r(member_id, class_id, ord)
+    ),
+    checked AS (
+        SELECT req.ord, req.member_id, req.class_id, gc.remaining,
+               CASE
+                   WHEN m.member_id IS NULL OR gc.class_id IS NULL THEN 'not_found'
+                   WHEN cr.registration_id IS NOT NULL
+                        OR row_number() OVER (PARTITION BY req.member_id, req.class_id
+                                              ORDER BY req.ord) > 1 THEN 'duplicate'
+               END AS rejected
+        FROM req
+        LEFT JOIN Member m ON m.member_id = req.member_id
+        LEFT JOIN GroupClass gc ON gc.class_id = req.class_id
+        LEFT JOIN ClassRegistration cr
+               ON cr.member_id = req.member_id AND cr.class_id = req.class_id
+    ),
+    decided AS (
+        SELECT c.ord, c.member_id, c.class_id,
+               COALESCE(
+                   c.rejected,
+                   CASE WHEN COUNT(*) FILTER (WHERE c.rejected IS NULL)
+                                 OVER (PARTITION BY c.class_id ORDER BY c.ord) <= c.remaining
+                        THEN 'registered' ELSE 'full' END
+               ) AS outcome
+        FROM checked c
+    ),
+    inserted AS (
+        INSERT INTO ClassRegistration(member_id, class_id)
+        SELECT d.member_id, d.class_id
+        FROM decided d
+        WHERE d.outcome = 'registered'
+    )
+    SELECT d.ord, d.member_id, d.class_id, d.outcome
+    FROM decided d
+    ORDER BY d.ord;
+$$ LANGUAGE sql;
@@ -0,0 +1,120 @@
+-- Range-partition HealthMetric by month on recorded_at.
+--
+-- The table is rebuilt as a partitioned table with one partition per
+-- calendar month (healthmetric_yYYYYmMM) and the rows are copied across
+-- in this transaction, so run it in a quiet period on large databases.
+-- Future partitions are created by create_healthmetric_partitions(),
+-- called by the application at start-up and by
+-- `python app/partition_maintenance.py`, which also detaches old months
+-- and archives them to compressed files (logged in HealthMetricArchive).
+--
+-- There is deliberately no DEFAULT partition: without one the planner can
+-- scan the monthly partitions newest-first, so the dashboard's "latest
+-- metric" lookup stops in the newest partition that has a row, and
+-- time-bounded queries skip every partition outside their range.
+
+ALTER TABLE HealthMetric RENAME TO HealthMetric_unpartitioned;
+ALTER TABLE HealthMetric_unpartitioned RENAME CONSTRAINT healthmetric_pkey TO healthmetric_unpartitioned_pkey;
+ALTER INDEX idx_healthmetric_member_recorded RENAME TO idx_healthmetric_unpartitioned_member_recorded;
+
+CREATE TABLE HealthMetric (
+    metric_id           INT NOT NULL DEFAULT nextval('healthmetric_metric_id_seq'),
+    member_id           INT NOT NULL REFERENCES Member(member_id) ON DELETE CASCADE,
+    recorded_at         TIMESTAMP NOT NULL DEFAULT NOW(),
+    weight              DECIMAL(5,2),
+    heart_rate          INT,
+    body_fat_percentage DECIMAL(5,2),
+    notes               TEXT,
+    -- the partition key has to be part of the primary key
+    PRIMARY KEY (metric_id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+ALTER SEQUENCE healthmetric_metric_id_seq OWNED BY HealthMetric.metric_id;
+
+
+-- FUNCTION: create the monthly partitions covering [p_from, p_to]
+-- Safe to call concurrently and repeatedly; returns the number created.
+CREATE OR REPLACE FUNCTION create_healthmetric_partitions(p_from TIMESTAMP, p_to TIMESTAMP)
+RETURNS INT AS $$
+DECLARE
+    v_month   DATE := date_trunc('month', p_from)::DATE;
+    v_name    TEXT;
+    v_created INT := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('healthmetric_partitions'));
+
+    WHILE v_month <= p_to LOOP
+        v_name := 'healthmetric_' || to_char(v_month, '"y"YYYY"m"MM');
+        IF to_regclass(v_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF HealthMetric FOR VALUES FROM (%L) TO (%L)',
+                v_name, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+            v_created := v_created + 1;
+        END IF;
+        v_month := (v_month + INTERVAL '1 month')::DATE;
+    END LOOP;
+
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- partitions for the existing rows and the next three months
+SELECT create_healthmetric_partitions(
+    COALESCE((SELECT MIN(recorded_at) FROM HealthMetric_unpartitioned), NOW()),
+    GREATEST((SELECT MAX(recorded_at) FROM HealthMetric_unpartitioned), NOW() + INTERVAL '3 months')
+);
+
+INSERT INTO HealthMetric(metric_id, member_id, recorded_at, weight, heart_rate, body_fat_percentage, notes)
+SELECT metric_id, member_id, recorded_at, weight, heart_rate, body_fat_percentage, notes
+FROM HealthMetric_unpartitioned;
+
+-- built after the copy; cascades to every partition, current and future
+CREATE INDEX idx_healthmetric_member_recorded
+    ON HealthMetric(member_id, recorded_at DESC, metric_id DESC);
+
+
+-- VIEW: Member Dashboard (unchanged; re-created so it points at the new table)
+CREATE OR REPLACE VIEW member_dashboard_view AS
+SELECT
+    m.member_id,
+    m.full_name,
+    m.goal_description,
+    m.target_weight,
+
+
+    -- Latest health metric (newest partition first, one index probe each)
+    hm.weight               AS latest_weight,
+    hm.heart_rate           AS latest_heart_rate,
+    hm.body_fat_percentage  AS latest_body_fat,
+
+
+    -- Upcoming classes
+    (SELECT COUNT(*) FROM ClassRegistration cr
+     JOIN GroupClass gc ON gc.class_id = cr.class_id
+     WHERE cr.member_id = m.member_id
+     AND gc.start_time > NOW()) AS upcoming_classes
+
+
+FROM Member m
+LEFT JOIN LATERAL (
+    SELECT weight, heart_rate, body_fat_percentage
+    FROM HealthMetric
+    WHERE member_id = m.member_id
+    ORDER BY recorded_at DESC, metric_id DESC
+    LIMIT 1
+) hm ON TRUE;
+
+DROP TABLE HealthMetric_unpartitioned;
+
+
+-- Archived (detached and exported) partitions
+CREATE TABLE HealthMetricArchive (
+    partition_name  VARCHAR(63) PRIMARY KEY,
+    range_start     TIMESTAMP NOT NULL,
+    range_end       TIMESTAMP NOT NULL,
+    row_count       BIGINT NOT NULL,
+    archive_file    TEXT NOT NULL,
+    archived_at     TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,283 @@
+-- Per-member daily and weekly HealthMetric rollups.
+--
+-- Charts over months or years read these instead of the raw readings.
+-- Counts and sums are stored (averages are generated from them), so new
+-- readings can be merged into a bucket without re-reading it:
+--   INSERT            merged into HealthMetricDaily per statement (one
+--                     grouped upsert for a whole bulk import),
+--   UPDATE / DELETE   the affected days are recomputed from HealthMetric,
+-- and the affected weeks are then re-summed from the daily rows. Only the
+-- buckets touched by a statement are written.
+--
+-- Rollups are kept when old HealthMetric partitions are archived, so long
+-- range charts keep working. rebuild_healthmetric_rollups() recomputes a
+-- time range from the raw rows (used after restoring an archive).
+
+CREATE TABLE HealthMetricDaily (
+    member_id           INT NOT NULL REFERENCES Member(member_id) ON DELETE CASCADE,
+    bucket              DATE NOT NULL,
+    readings            INT NOT NULL,
+
+    weight_n            INT NOT NULL DEFAULT 0,
+    weight_sum          DECIMAL(14,2) NOT NULL DEFAULT 0,
+    weight_min          DECIMAL(5,2),
+    weight_max          DECIMAL(5,2),
+    weight_avg          DECIMAL(5,2) GENERATED ALWAYS AS (ROUND(weight_sum / NULLIF(weight_n, 0), 2)) STORED,
+
+    heart_rate_n        INT NOT NULL DEFAULT 0,
+    heart_rate_sum      BIGINT NOT NULL DEFAULT 0,
+    heart_rate_min      INT,
+    heart_rate_max      INT,
+    heart_rate_avg      DECIMAL(5,1) GENERATED ALWAYS AS (ROUND(heart_rate_sum::DECIMAL / NULLIF(heart_rate_n, 0), 1)) STORED,
+
+    body_fat_n          INT NOT NULL DEFAULT 0,
+    body_fat_sum        DECIMAL(14,2) NOT NULL DEFAULT 0,
+    body_fat_min        DECIMAL(5,2),
+    body_fat_max        DECIMAL(5,2),
+    body_fat_avg        DECIMAL(5,2) GENERATED ALWAYS AS (ROUND(body_fat_sum / NULLIF(body_fat_n, 0), 2)) STORED,
+
+    PRIMARY KEY (member_id, bucket)
+);
+
+-- bucket is the Monday the week starts on
+CREATE TABLE HealthMetricWeekly (LIKE HealthMetricDaily INCLUDING ALL);
+ALTER TABLE HealthMetricWeekly
+    ADD FOREIGN KEY (member_id) REFERENCES Member(member_id) ON DELETE CASCADE;
+
+
+-- FUNCTION: re-sum the given weeks from HealthMetricDaily
+CREATE OR REPLACE FUNCTION rollup_weeks(p_member_ids INT[], p_weeks DATE[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM HealthMetricWeekly w
+    USING unnest(p_member_ids, p_weeks) AS a(member_id, bucket)
+    WHERE w.member_id = a.member_id AND w.bucket = a.bucket;
+
+    INSERT INTO HealthMetricWeekly(
+        member_id, bucket, readings,
+        weight_n, weight_sum, weight_min, weight_max,
+        heart_rate_n, heart_rate_sum, heart_rate_min, heart_rate_max,
+        body_fat_n, body_fat_sum, body_fat_min, body_fat_max
+    )
+    SELECT d.member_id, a.bucket, SUM(d.readings),
+           SUM(d.weight_n), SUM(d.weight_sum), MIN(d.weight_min), MAX(d.weight_max),
+           SUM(d.heart_rate_n), SUM(d.heart_rate_sum), MIN(d.heart_rate_min), MAX(d.heart_rate_max),
+           SUM(d.body_fat_n), SUM(d.body_fat_sum), MIN(d.body_fat_min), MAX(d.body_fat_max)
+    FROM (SELECT DISTINCT * FROM unnest(p_member_ids, p_weeks) AS u(member_id, bucket)) a
+    JOIN HealthMetricDaily d
+      ON d.member_id = a.member_id
+     AND d.bucket >= a.bucket AND d.bucket < a.bucket + 7
+    GROUP BY d.member_id, a.bucket;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- FUNCTION: recompute the given days from HealthMetric, then their weeks
+CREATE OR REPLACE FUNCTION rollup_days(p_member_ids INT[], p_days DATE[])
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM HealthMetricDaily d
+    USING unnest(p_member_ids, p_days) AS a(member_id, bucket)
+    WHERE d.member_id = a.member_id AND d.bucket = a.bucket;
+
+    INSERT INTO HealthMetricDaily(
+        member_id, bucket, readings,
+        weight_n, weight_sum, weight_min, weight_max,
+        heart_rate_n, heart_rate_sum, heart_rate_min, heart_rate_max,
+        body_fat_n, body_fat_sum, body_fat_min, body_fat_max
+    )
+    SELECT hm.member_id, a.bucket, COUNT(*),
+           COUNT(hm.weight), COALESCE(SUM(hm.weight), 0), MIN(hm.weight), MAX(hm.weight),
+           COUNT(hm.heart_rate), COALESCE(SUM(hm.heart_rate), 0), MIN(hm.heart_rate), MAX(hm.heart_rate),
+           COUNT(hm.body_fat_percentage), COALESCE(SUM(hm.body_fat_percentage), 0),
+           MIN(hm.body_fat_percentage), MAX(hm.body_fat_percentage)
+    FROM (SELECT DISTINCT * FROM unnest(p_member_ids, p_days) AS u(member_id, bucket)) a
+    JOIN HealthMetric hm
+      ON hm.member_id = a.member_id
+     AND hm.recorded_at >= a.bucket AND hm.recorded_at < a.bucket + 1
+    GROUP BY hm.member_id, a.bucket;
+
+    PERFORM rollup_weeks(
+        array_agg(member_id), array_agg(week)
+    )
+    FROM (SELECT DISTINCT member_id, date_trunc('week', bucket)::DATE AS week
+          FROM unnest(p_member_ids, p_days) AS u(member_id, bucket)) w;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGER FUNCTION: merge inserted readings into their days, then re-sum their weeks
+CREATE OR REPLACE FUNCTION rollup_healthmetric_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO HealthMetricDaily AS d (
+        member_id, bucket, readings,
+        weight_n, weight_sum, weight_min, weight_max,
+        heart_rate_n, heart_rate_sum, heart_rate_min, heart_rate_max,
+        body_fat_n, body_fat_sum, body_fat_min, body_fat_max
+    )
+    SELECT member_id, recorded_at::DATE, COUNT(*),
+           COUNT(weight), COALESCE(SUM(weight), 0), MIN(weight), MAX(weight),
+           COUNT(heart_rate), COALESCE(SUM(heart_rate), 0), MIN(heart_rate), MAX(heart_rate),
+           COUNT(body_fat_percentage), COALESCE(SUM(body_fat_percentage), 0),
+           MIN(body_fat_percentage), MAX(body_fat_percentage)
+    FROM new_rows
+    GROUP BY member_id, recorded_at::DATE
+    -- fixed order, so concurrent imports lock shared buckets in the same order
+    ORDER BY member_id, recorded_at::DATE
+    ON CONFLICT (member_id, bucket) DO UPDATE SET
+        readings       = d.readings + EXCLUDED.readings,
+        weight_n       = d.weight_n + EXCLUDED.weight_n,
+        weight_sum     = d.weight_sum + EXCLUDED.weight_sum,
+        weight_min     = LEAST(d.weight_min, EXCLUDED.weight_min),
+        weight_max     = GREATEST(d.weight_max, EXCLUDED.weight_max),
+        heart_rate_n   = d.heart_rate_n + EXCLUDED.heart_rate_n,
+        heart_rate_sum = d.heart_rate_sum + EXCLUDED.heart_rate_sum,
+        heart_rate_min = LEAST(d.heart_rate_min, EXCLUDED.heart_rate_min),
+        heart_rate_max = GREATEST(d.heart_rate_max, EXCLUDED.heart_rate_max),
+        body_fat_n     = d.body_fat_n + EXCLUDED.body_fat_n,
+        body_fat_sum   = d.body_fat_sum + EXCLUDED.body_fat_sum,
+        body_fat_min   = LEAST(d.body_fat_min, EXCLUDED.body_fat_min),
+        body_fat_max   = GREATEST(d.body_fat_max, EXCLUDED.body_fat_max);
+
+    PERFORM rollup_weeks(array_agg(member_id), array_agg(week))
+    FROM (SELECT DISTINCT member_id, date_trunc('week', recorded_at)::DATE AS week
+          FROM new_rows) w;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGER FUNCTION: recompute the days touched by an UPDATE or DELETE
+CREATE OR REPLACE FUNCTION rollup_healthmetric_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM rollup_days(array_agg(member_id), array_agg(day))
+        FROM (SELECT member_id, recorded_at::DATE AS day FROM old_rows
+              UNION
+              SELECT member_id, recorded_at::DATE FROM new_rows) c;
+    ELSE
+        PERFORM rollup_days(array_agg(member_id), array_agg(day))
+        FROM (SELECT DISTINCT member_id, recorded_at::DATE AS day FROM old_rows) c;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGERS (statement level on the partitioned parent; one per event for the transition tables)
+CREATE TRIGGER trg_healthmetric_rollup_insert
+AFTER INSERT ON HealthMetric
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION rollup_healthmetric_insert();
+
+CREATE TRIGGER trg_healthmetric_rollup_update
+AFTER UPDATE ON HealthMetric
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION rollup_healthmetric_change();
+
+CREATE TRIGGER trg_healthmetric_rollup_delete
+AFTER DELETE ON HealthMetric
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION rollup_healthmetric_change();
+
+
+-- FUNCTION: recompute every bucket with readings in [p_from, p_to) from the raw rows
+-- Whole days/weeks are rebuilt; optionally limited to some members. Days
+-- without raw readings (e.g. archived months) are left as they are.
+CREATE OR REPLACE FUNCTION rebuild_healthmetric_rollups(p_from TIMESTAMP, p_to TIMESTAMP,
+                                                        p_member_ids INT[] DEFAULT NULL)
+RETURNS INT AS $$
+DECLARE
+    v_members INT[];
+    v_days    DATE[];
+BEGIN
+    SELECT array_agg(member_id), array_agg(day) INTO v_members, v_days
+    FROM (
+        SELECT DISTINCT member_id, recorded_at::DATE AS day
+        FROM HealthMetric
+        WHERE recorded_at >= p_from AND recorded_at < p_to
+        AND (p_member_ids IS NULL OR member_id = ANY(p_member_ids))
+    ) b;
+
+    IF v_days IS NULL THEN
+        RETURN 0;
+    END IF;
+    PERFORM rollup_days(v_members, v_days);
+    RETURN cardinality(v_days);
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- backfill from the current readings
+INSERT INTO HealthMetricDaily(
+    member_id, bucket, readings,
+    weight_n, weight_sum, weight_min, weight_max,
+    heart_rate_n, heart_rate_sum, heart_rate_min, heart_rate_max,
+    body_fat_n, body_fat_sum, body_fat_min, body_fat_max
+)
+SELECT member_id, recorded_at::DATE, COUNT(*),
+       COUNT(weight), COALESCE(SUM(weight), 0), MIN(weight), MAX(weight),
+       COUNT(heart_rate), COALESCE(SUM(heart_rate), 0), MIN(heart_rate), MAX(heart_rate),
+       COUNT(body_fat_percentage), COALESCE(SUM(body_fat_percentage), 0),
+       MIN(body_fat_percentage), MAX(body_fat_percentage)
+FROM HealthMetric
+GROUP BY member_id, recorded_at::DATE;
+
+INSERT INTO HealthMetricWeekly(
+    member_id, bucket, readings,
+    weight_n, weight_sum, weight_min, weight_max,
+    heart_rate_n, heart_rate_sum, heart_rate_min, heart_rate_max,
+    body_fat_n, body_fat_sum, body_fat_min, body_fat_max
+)
+SELECT member_id, date_trunc('week', bucket)::DATE, SUM(readings),
+       SUM(weight_n), SUM(weight_sum), MIN(weight_min), MAX(weight_max),
+       SUM(heart_rate_n), SUM(heart_rate_sum), MIN(heart_rate_min), MAX(heart_rate_max),
+       SUM(body_fat_n), SUM(body_fat_sum), MIN(body_fat_min), MAX(body_fat_max)
+FROM HealthMetricDaily
+GROUP BY member_id, date_trunc('week', bucket)::DATE;
+
+
+-- VIEW: Member Dashboard, now with 30-day averages from the daily rollup
+CREATE OR REPLACE VIEW member_dashboard_view AS
+SELECT
+    m.member_id,
+    m.full_name,
+    m.goal_description,
+    m.target_weight,
+
+
+    -- Latest health metric (newest partition first, one index probe each)
+    hm.weight               AS latest_weight,
+    hm.heart_rate           AS latest_heart_rate,
+    hm.body_fat_percentage  AS latest_body_fat,
+
+
+    -- Upcoming classes
+    (SELECT COUNT(*) FROM ClassRegistration cr
+     JOIN GroupClass gc ON gc.class_id = cr.class_id
+     WHERE cr.member_id = m.member_id
+     AND gc.start_time > NOW()) AS upcoming_classes,
+
+
+    -- Last 30 days (at most 30 rollup rows per member)
+    r.avg_weight_30d,
+    r.avg_heart_rate_30d
+
+
+FROM Member m
+LEFT JOIN LATERAL (
+    SELECT weight, heart_rate, body_fat_percentage
+    FROM HealthMetric
+    WHERE member_id = m.member_id
+    ORDER BY recorded_at DESC, metric_id DESC
+    LIMIT 1
+) hm ON TRUE
+LEFT JOIN LATERAL (
+    SELECT ROUND(SUM(weight_sum) / NULLIF(SUM(weight_n), 0), 2) AS avg_weight_30d,
+           ROUND(SUM(heart_rate_sum)::DECIMAL / NULLIF(SUM(heart_rate_n), 0), 1) AS avg_heart_rate_30d
+    FROM HealthMetricDaily
+    WHERE member_id = m.member_id
+    AND bucket > CURRENT_DATE - 30
+) r ON TRUE;
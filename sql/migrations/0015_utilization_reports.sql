@@ -0,0 +1,148 @@
+-- Admin utilization reports as materialized views.
+--
+-- The reports aggregate months of classes and sessions, so they are
+-- computed ahead of time and read in milliseconds; the booking paths never
+-- wait on them. reports.py refreshes them with REFRESH MATERIALIZED VIEW
+-- CONCURRENTLY (readers keep the previous contents meanwhile), which needs
+-- a unique index without NULLs on each view, hence the COALESCEs.
+--
+--   mv_class_fill           fill rate per class title and trainer
+--   mv_room_occupancy       booked minutes per room, ISO weekday and hour
+--   mv_trainer_utilization  booked vs available hours per trainer and week
+--   mv_pt_no_show           PT session outcomes per trainer and month
+--
+-- Room and trainer bookings are read from ScheduleOccupancy (migration
+-- 0009), which already holds classes and non-cancelled PT sessions.
+
+-- Classes from the last 12 weeks and the next 4
+CREATE MATERIALIZED VIEW mv_class_fill AS
+SELECT gc.title,
+       COALESCE(gc.trainer_id, 0) AS trainer_id,
+       COUNT(*) AS classes,
+       SUM(gc.capacity) AS seats,
+       SUM(gc.registered_count) AS registered,
+       ROUND(100.0 * SUM(gc.registered_count) / NULLIF(SUM(gc.capacity), 0), 1) AS fill_pct,
+       COUNT(*) FILTER (WHERE gc.remaining <= 0) AS full_classes,
+       MAX(gc.start_time) FILTER (WHERE gc.start_time < NOW()) AS last_held
+FROM GroupClass gc
+WHERE gc.start_time >= NOW() - INTERVAL '12 weeks'
+AND gc.start_time < NOW() + INTERVAL '4 weeks'
+GROUP BY gc.title, COALESCE(gc.trainer_id, 0);
+
+CREATE UNIQUE INDEX mv_class_fill_key ON mv_class_fill(title, trainer_id);
+
+
+-- Last 12 full weeks up to the current hour; every room gets all 168
+-- weekday/hour cells (zero when never booked). Bookings are split at hour
+-- boundaries, so a 09:30-10:30 class counts 30 minutes in each hour.
+CREATE MATERIALIZED VIEW mv_room_occupancy AS
+WITH bounds AS (
+    SELECT date_trunc('hour', NOW() - INTERVAL '12 weeks')::TIMESTAMP AS lo,
+           date_trunc('hour', NOW())::TIMESTAMP AS hi
+),
+slices AS (
+    SELECT so.room_id,
+           h AS hour_start,
+           EXTRACT(EPOCH FROM LEAST(upper(so.during), h + INTERVAL '1 hour')
+                            - GREATEST(lower(so.during), h)) / 60 AS minutes
+    FROM ScheduleOccupancy so
+    CROSS JOIN bounds b
+    CROSS JOIN LATERAL generate_series(
+        date_trunc('hour', GREATEST(lower(so.during), b.lo)),
+        LEAST(upper(so.during), b.hi) - INTERVAL '1 microsecond',
+        INTERVAL '1 hour'
+    ) AS h
+    WHERE so.room_id IS NOT NULL
+    AND so.during && tsrange(b.lo, b.hi)
+),
+cells AS (
+    SELECT room_id,
+           EXTRACT(ISODOW FROM hour_start)::INT AS dow,
+           EXTRACT(HOUR FROM hour_start)::INT AS hour,
+           SUM(minutes) AS booked_minutes
+    FROM slices
+    GROUP BY 1, 2, 3
+)
+SELECT r.room_id,
+       d.dow,
+       h.hour,
+       COALESCE(c.booked_minutes, 0)::INT AS booked_minutes,
+       ROUND(COALESCE(c.booked_minutes, 0) / (12 * 60.0) * 100, 1) AS occupancy_pct
+FROM Room r
+CROSS JOIN generate_series(1, 7) AS d(dow)
+CROSS JOIN generate_series(0, 23) AS h(hour)
+LEFT JOIN cells c ON c.room_id = r.room_id AND c.dow = d.dow AND c.hour = h.hour;
+
+CREATE UNIQUE INDEX mv_room_occupancy_key ON mv_room_occupancy(room_id, dow, hour);
+
+
+-- The last 12 weeks, this week and the next 3. Available hours are the
+-- trainer's recurring TrainerAvailability; booked hours are their classes
+-- and non-cancelled PT sessions, by the week they start in.
+CREATE MATERIALIZED VIEW mv_trainer_utilization AS
+WITH weeks AS (
+    SELECT w::DATE AS week
+    FROM generate_series(date_trunc('week', NOW()) - INTERVAL '12 weeks',
+                         date_trunc('week', NOW()) + INTERVAL '3 weeks',
+                         INTERVAL '1 week') AS w
+),
+available AS (
+    SELECT trainer_id,
+           SUM(EXTRACT(EPOCH FROM end_time - start_time)) / 3600 AS hours
+    FROM TrainerAvailability
+    GROUP BY trainer_id
+),
+booked AS (
+    SELECT so.trainer_id,
+           date_trunc('week', lower(so.during))::DATE AS week,
+           COALESCE(SUM(EXTRACT(EPOCH FROM upper(so.during) - lower(so.during)))
+                    FILTER (WHERE so.source = 'class'), 0) / 3600 AS class_hours,
+           COALESCE(SUM(EXTRACT(EPOCH FROM upper(so.during) - lower(so.during)))
+                    FILTER (WHERE so.source = 'pt'), 0) / 3600 AS pt_hours
+    FROM ScheduleOccupancy so
+    WHERE so.trainer_id IS NOT NULL
+    AND so.during && tsrange((SELECT MIN(week) FROM weeks)::TIMESTAMP,
+                            (SELECT MAX(week) + 7 FROM weeks)::TIMESTAMP)
+    AND lower(so.during) >= (SELECT MIN(week) FROM weeks)
+    GROUP BY 1, 2
+)
+SELECT t.trainer_id,
+       w.week,
+       ROUND(COALESCE(a.hours, 0), 2) AS available_hours,
+       ROUND(COALESCE(b.class_hours, 0), 2) AS class_hours,
+       ROUND(COALESCE(b.pt_hours, 0), 2) AS pt_hours,
+       ROUND(100 * (COALESCE(b.class_hours, 0) + COALESCE(b.pt_hours, 0)) / NULLIF(a.hours, 0), 1)
+           AS utilization_pct
+FROM Trainer t
+CROSS JOIN weeks w
+LEFT JOIN available a ON a.trainer_id = t.trainer_id
+LEFT JOIN booked b ON b.trainer_id = t.trainer_id AND b.week = w.week;
+
+CREATE UNIQUE INDEX mv_trainer_utilization_key ON mv_trainer_utilization(trainer_id, week);
+
+
+-- Sessions that have already started, over the last 12 months. The rate is
+-- no-shows out of sessions that were not cancelled.
+CREATE MATERIALIZED VIEW mv_pt_no_show AS
+SELECT pt.trainer_id,
+       date_trunc('month', pt.start_time)::DATE AS month,
+       COUNT(*) AS sessions,
+       COUNT(*) FILTER (WHERE pt.status = 'Completed') AS completed,
+       COUNT(*) FILTER (WHERE pt.status = 'No-Show') AS no_shows,
+       COUNT(*) FILTER (WHERE pt.status = 'Cancelled') AS cancelled,
+       ROUND(100.0 * COUNT(*) FILTER (WHERE pt.status = 'No-Show')
+             / NULLIF(COUNT(*) FILTER (WHERE pt.status <> 'Cancelled'), 0), 1) AS no_show_pct
+FROM PTSession pt
+WHERE pt.start_time >= date_trunc('month', NOW()) - INTERVAL '12 months'
+AND pt.start_time < NOW()
+GROUP BY pt.trainer_id, date_trunc('month', pt.start_time);
+
+CREATE UNIQUE INDEX mv_pt_no_show_key ON mv_pt_no_show(trainer_id, month);
+
+
+-- When each view was last refreshed and how long it took
+CREATE TABLE ReportRefresh (
+    view_name       VARCHAR(63) PRIMARY KEY,
+    refreshed_at    TIMESTAMP NOT NULL,
+    duration_ms     INT NOT NULL
+);
@@ -0,0 +1,117 @@
+-- Maintenance work queue.
+--
+-- 1. Tickets get a priority (1 = critical, the machine is out of service,
+--    2 = high, 3 = normal, 4 = low) and status is restricted to 'Open',
+--    'In Progress' and 'Resolved', so "open" is one fixed predicate
+--    (status <> 'Resolved') that the partial indexes of migration 0017
+--    can match.
+-- 2. Equipment.status follows the open tickets in the same transaction:
+--    'Out of Service' with an open critical ticket, 'Needs Maintenance'
+--    with any other open ticket, 'Working' otherwise. Statuses set by hand
+--    outside these three (e.g. 'Retired') are left alone.
+
+-- Normalize free-text statuses before constraining them
+UPDATE EquipmentMaintenance
+SET status = CASE lower(trim(status))
+                 WHEN 'open' THEN 'Open'
+                 WHEN 'in progress' THEN 'In Progress'
+                 WHEN 'resolved' THEN 'Resolved'
+                 ELSE CASE WHEN resolved_at IS NULL THEN 'Open' ELSE 'Resolved' END
+             END
+WHERE status IS NULL OR status NOT IN ('Open', 'In Progress', 'Resolved');
+
+ALTER TABLE EquipmentMaintenance
+    ALTER COLUMN status SET NOT NULL,
+    ADD COLUMN priority SMALLINT NOT NULL DEFAULT 3,
+    ADD CONSTRAINT maintenance_status_check CHECK (status IN ('Open', 'In Progress', 'Resolved')),
+    ADD CONSTRAINT maintenance_priority_check CHECK (priority BETWEEN 1 AND 4);
+
+
+-- FUNCTION: recompute Equipment.status from the open tickets
+-- The equipment rows are locked first (in id order), so two transactions
+-- closing tickets on the same machine are serialized and the second one
+-- sees the first one's change.
+CREATE OR REPLACE FUNCTION sync_equipment_status(p_equipment_ids INT[])
+RETURNS INT AS $$
+DECLARE
+    v_changed INT;
+BEGIN
+    PERFORM 1
+    FROM Equipment
+    WHERE equipment_id = ANY(p_equipment_ids)
+    ORDER BY equipment_id
+    FOR UPDATE;
+
+    UPDATE Equipment e
+    SET status = s.new_status
+    FROM (
+        SELECT eq.equipment_id,
+               CASE WHEN bool_or(em.priority = 1) THEN 'Out of Service'
+                    WHEN COUNT(em.maintenance_id) > 0 THEN 'Needs Maintenance'
+                    ELSE 'Working'
+               END AS new_status
+        FROM Equipment eq
+        LEFT JOIN EquipmentMaintenance em
+               ON em.equipment_id = eq.equipment_id
+              AND em.status <> 'Resolved'
+        WHERE eq.equipment_id = ANY(p_equipment_ids)
+        GROUP BY eq.equipment_id
+    ) s
+    WHERE e.equipment_id = s.equipment_id
+    AND (e.status IS NULL OR e.status IN ('Working', 'Needs Maintenance', 'Out of Service'))
+    AND e.status IS DISTINCT FROM s.new_status;
+
+    GET DIAGNOSTICS v_changed = ROW_COUNT;
+    RETURN v_changed;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGER FUNCTION: resync the equipment whose open tickets a statement changed
+CREATE OR REPLACE FUNCTION maintenance_sync_equipment()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM sync_equipment_status(ARRAY(
+            SELECT DISTINCT equipment_id FROM new_rows WHERE status <> 'Resolved'
+        ));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM sync_equipment_status(ARRAY(
+            SELECT DISTINCT equipment_id FROM old_rows WHERE status <> 'Resolved'
+        ));
+    ELSE
+        -- only rows whose status, priority or machine changed matter
+        PERFORM sync_equipment_status(ARRAY(
+            SELECT n.equipment_id
+            FROM new_rows n JOIN old_rows o USING (maintenance_id)
+            WHERE (n.status, n.priority, n.equipment_id) IS DISTINCT FROM (o.status, o.priority, o.equipment_id)
+            UNION
+            SELECT o.equipment_id
+            FROM new_rows n JOIN old_rows o USING (maintenance_id)
+            WHERE (n.status, n.priority, n.equipment_id) IS DISTINCT FROM (o.status, o.priority, o.equipment_id)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- TRIGGERS (transition tables need one trigger per event)
+CREATE TRIGGER trg_maintenance_equipment_insert
+AFTER INSERT ON EquipmentMaintenance
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION maintenance_sync_equipment();
+
+CREATE TRIGGER trg_maintenance_equipment_update
+AFTER UPDATE ON EquipmentMaintenance
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION maintenance_sync_equipment();
+
+CREATE TRIGGER trg_maintenance_equipment_delete
+AFTER DELETE ON EquipmentMaintenance
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION maintenance_sync_equipment();
+
+
+-- Bring every machine in line with its current tickets
+SELECT sync_equipment_status(ARRAY(SELECT equipment_id FROM Equipment));
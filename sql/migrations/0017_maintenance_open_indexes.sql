@@ -0,0 +1,12 @@
+-- migrate:no-transaction
+-- Partial indexes over unresolved tickets only. They stay as small as the
+-- open backlog however many resolved tickets pile up, and serve the work
+-- queue (priority, then oldest first) and the per-machine / per-room
+-- lookups. Built without blocking writes.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_maintenance_open_queue
+    ON EquipmentMaintenance(priority, reported_at, maintenance_id)
+    WHERE status <> 'Resolved';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_maintenance_open_equipment
+    ON EquipmentMaintenance(equipment_id, reported_at)
+    WHERE status <> 'Resolved';
@@ -0,0 +1,40 @@
+-- sync_equipment_status() runs from AFTER triggers on EquipmentMaintenance,
+-- when the ticket's foreign key check already holds FOR KEY SHARE on the
+-- Equipment row. FOR UPDATE conflicts with KEY SHARE, so two concurrent
+-- tickets for the same machine deadlocked. FOR NO KEY UPDATE still
+-- serializes the status syncs but is compatible with KEY SHARE.
+
+CREATE OR REPLACE FUNCTION sync_equipment_status(p_equipment_ids INT[])
+RETURNS INT AS $$
+DECLARE
+    v_changed INT;
+BEGIN
+    PERFORM 1
+    FROM Equipment
+    WHERE equipment_id = ANY(p_equipment_ids)
+    ORDER BY equipment_id
+    FOR NO KEY UPDATE;
+
+    UPDATE Equipment e
+    SET status = s.new_status
+    FROM (
+        SELECT eq.equipment_id,
+               CASE WHEN bool_or(em.priority = 1) THEN 'Out of Service'
+                    WHEN COUNT(em.maintenance_id) > 0 THEN 'Needs Maintenance'
+                    ELSE 'Working'
+               END AS new_status
+        FROM Equipment eq
+        LEFT JOIN EquipmentMaintenance em
+               ON em.equipment_id = eq.equipment_id
+              AND em.status <> 'Resolved'
+        WHERE eq.equipment_id = ANY(p_equipment_ids)
+        GROUP BY eq.equipment_id
+    ) s
+    WHERE e.equipment_id = s.equipment_id
+    AND (e.status IS NULL OR e.status IN ('Working', 'Needs Maintenance', 'Out of Service'))
+    AND e.status IS DISTINCT FROM s.new_status;
+
+    GET DIAGNOSTICS v_changed = ROW_COUNT;
+    RETURN v_changed;
+END;
+$$ LANGUAGE plpgsql;
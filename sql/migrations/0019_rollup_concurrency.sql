@@ -0,0 +1,123 @@
+-- rollup_weeks() and rollup_days() replaced a bucket with DELETE + INSERT.
+-- Two transactions adding readings on different days of the same week
+-- both re-summed that week: the second one's DELETE skipped the row the
+-- first had already replaced, and its INSERT then failed on the primary
+-- key, aborting the metric add or import.
+--
+-- Each re-sum now takes a transaction-level advisory lock per
+-- (member, bucket), in a fixed order, and then upserts the bucket. The
+-- statements after the lock see the committed rows of whoever held it
+-- before, so no transaction overwrites a bucket with a sum that misses
+-- another's readings. Buckets left without readings are deleted.
+--
+-- Lock keys: (member_id, days since 2000-01-01) for days and
+-- (member_id, -1 - days since 2000-01-01) for weeks.
+
+
+-- FUNCTION: re-sum the given weeks from HealthMetricDaily
+CREATE OR REPLACE FUNCTION rollup_weeks(p_member_ids INT[], p_weeks DATE[])
+RETURNS VOID AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(a.member_id, -1 - (a.bucket - DATE '2000-01-01'))
+    FROM (SELECT DISTINCT member_id, bucket
+          FROM unnest(p_member_ids, p_weeks) AS u(member_id, bucket)
+          ORDER BY member_id, bucket) a;
+
+    INSERT INTO HealthMetricWeekly AS w (
+        member_id, bucket, readings,
+        weight_n, weight_sum, weight_min, weight_max,
+        heart_rate_n, heart_rate_sum, heart_rate_min, heart_rate_max,
+        body_fat_n, body_fat_sum, body_fat_min, body_fat_max
+    )
+    SELECT d.member_id, a.bucket, SUM(d.readings),
+           SUM(d.weight_n), SUM(d.weight_sum), MIN(d.weight_min), MAX(d.weight_max),
+           SUM(d.heart_rate_n), SUM(d.heart_rate_sum), MIN(d.heart_rate_min), MAX(d.heart_rate_max),
+           SUM(d.body_fat_n), SUM(d.body_fat_sum), MIN(d.body_fat_min), MAX(d.body_fat_max)
+    FROM (SELECT DISTINCT * FROM unnest(p_member_ids, p_weeks) AS u(member_id, bucket)) a
+    JOIN HealthMetricDaily d
+      ON d.member_id = a.member_id
+     AND d.bucket >= a.bucket AND d.bucket < a.bucket + 7
+    GROUP BY d.member_id, a.bucket
+    ON CONFLICT (member_id, bucket) DO UPDATE SET
+        readings       = EXCLUDED.readings,
+        weight_n       = EXCLUDED.weight_n,
+        weight_sum     = EXCLUDED.weight_sum,
+        weight_min     = EXCLUDED.weight_min,
+        weight_max     = EXCLUDED.weight_max,
+        heart_rate_n   = EXCLUDED.heart_rate_n,
+        heart_rate_sum = EXCLUDED.heart_rate_sum,
+        heart_rate_min = EXCLUDED.heart_rate_min,
+        heart_rate_max = EXCLUDED.heart_rate_max,
+        body_fat_n     = EXCLUDED.body_fat_n,
+        body_fat_sum   = EXCLUDED.body_fat_sum,
+        body_fat_min   = EXCLUDED.body_fat_min,
+        body_fat_max   = EXCLUDED.body_fat_max;
+
+    DELETE FROM HealthMetricWeekly w
+    USING unnest(p_member_ids, p_weeks) AS a(member_id, bucket)
+    WHERE w.member_id = a.member_id AND w.bucket = a.bucket
+    AND NOT EXISTS (
+        SELECT 1 FROM HealthMetricDaily d
+        WHERE d.member_id = a.member_id
+        AND d.bucket >= a.bucket AND d.bucket < a.bucket + 7
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- FUNCTION: recompute the given days from HealthMetric, then their weeks
+CREATE OR REPLACE FUNCTION rollup_days(p_member_ids INT[], p_days DATE[])
+RETURNS VOID AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(a.member_id, a.bucket - DATE '2000-01-01')
+    FROM (SELECT DISTINCT member_id, bucket
+          FROM unnest(p_member_ids, p_days) AS u(member_id, bucket)
+          ORDER BY member_id, bucket) a;
+
+    INSERT INTO HealthMetricDaily AS d (
+        member_id, bucket, readings,
+        weight_n, weight_sum, weight_min, weight_max,
+        heart_rate_n, heart_rate_sum, heart_rate_min, heart_rate_max,
+        body_fat_n, body_fat_sum, body_fat_min, body_fat_max
+    )
+    SELECT hm.member_id, a.bucket, COUNT(*),
+           COUNT(hm.weight), COALESCE(SUM(hm.weight), 0), MIN(hm.weight), MAX(hm.weight),
+           COUNT(hm.heart_rate), COALESCE(SUM(hm.heart_rate), 0), MIN(hm.heart_rate), MAX(hm.heart_rate),
+           COUNT(hm.body_fat_percentage), COALESCE(SUM(hm.body_fat_percentage), 0),
+           MIN(hm.body_fat_percentage), MAX(hm.body_fat_percentage)
+    FROM (SELECT DISTINCT * FROM unnest(p_member_ids, p_days) AS u(member_id, bucket)) a
+    JOIN HealthMetric hm
+      ON hm.member_id = a.member_id
+     AND hm.recorded_at >= a.bucket AND hm.recorded_at < a.bucket + 1
+    GROUP BY hm.member_id, a.bucket
+    ON CONFLICT (member_id, bucket) DO UPDATE SET
+        readings       = EXCLUDED.readings,
+        weight_n       = EXCLUDED.weight_n,
+        weight_sum     = EXCLUDED.weight_sum,
+        weight_min     = EXCLUDED.weight_min,
+        weight_max     = EXCLUDED.weight_max,
+        heart_rate_n   = EXCLUDED.heart_rate_n,
+        heart_rate_sum = EXCLUDED.heart_rate_sum,
+        heart_rate_min = EXCLUDED.heart_rate_min,
+        heart_rate_max = EXCLUDED.heart_rate_max,
+        body_fat_n     = EXCLUDED.body_fat_n,
+        body_fat_sum   = EXCLUDED.body_fat_sum,
+        body_fat_min   = EXCLUDED.body_fat_min,
+        body_fat_max   = EXCLUDED.body_fat_max;
+
+    DELETE FROM HealthMetricDaily d
+    USING unnest(p_member_ids, p_days) AS a(member_id, bucket)
+    WHERE d.member_id = a.member_id AND d.bucket = a.bucket
+    AND NOT EXISTS (
+        SELECT 1 FROM HealthMetric hm
+        WHERE hm.member_id = a.member_id
+        AND hm.recorded_at >= a.bucket AND hm.recorded_at < a.bucket + 1
+    );
+
+    PERFORM rollup_weeks(
+        array_agg(member_id), array_agg(week)
+    )
+    FROM (SELECT DISTINCT member_id, date_trunc('week', bucket)::DATE AS week
+          FROM unnest(p_member_ids, p_days) AS u(member_id, bucket)) w;
+END;
+$$ LANGUAGE plpgsql;
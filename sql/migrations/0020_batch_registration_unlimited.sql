@@ -0,0 +1,63 @@
+-- register_batch() compared each request's seat number with
+-- GroupClass.remaining, which is NULL for a class without a capacity. The
+-- comparison was then NULL, so every request for such a class came back
+-- 'full', while register_for_class() treats a NULL capacity as unlimited
+-- and registers the member. A NULL remaining now means there is no limit.
+
+
+-- FUNCTION: register many (member, class) pairs in one statement
+-- Pairs are given as two parallel arrays; the result has one row per pair,
+-- in input order (ord is 1-based), with the same outcomes as
+-- register_for_class(): 'registered', 'full', 'duplicate' or 'not_found'.
+-- A pair repeated within the batch is registered once and reported as
+-- 'duplicate' after that. When a class has fewer seats left than requests,
+-- the earliest pairs in the batch get the seats.
+CREATE OR REPLACE FUNCTION register_batch(p_member_ids INT[], p_class_ids INT[])
+RETURNS TABLE(ord INT, member_id INT, class_id INT, outcome TEXT) AS $$
+    -- lock the classes in id order, so concurrent batches can't deadlock and
+    -- single registrations (register_for_class) wait for us
+    SELECT 1
+    FROM GroupClass
+    WHERE class_id = ANY(p_class_ids)
+    ORDER BY class_id
+    FOR UPDATE;
+
+    WITH req AS (
+        SELECT r.ord::INT AS ord, r.member_id, r.class_id
+        FROM unnest(p_member_ids, p_class_ids) WITH ORDINALITY AS r(member_id, class_id, ord)
+    ),
+    checked AS (
+        SELECT req.ord, req.member_id, req.class_id, gc.remaining,
+               CASE
+                   WHEN m.member_id IS NULL OR gc.class_id IS NULL THEN 'not_found'
+                   WHEN cr.registration_id IS NOT NULL
+                        OR row_number() OVER (PARTITION BY req.member_id, req.class_id
+                                              ORDER BY req.ord) > 1 THEN 'duplicate'
+               END AS rejected
+        FROM req
+        LEFT JOIN Member m ON m.member_id = req.member_id
+        LEFT JOIN GroupClass gc ON gc.class_id = req.class_id
+        LEFT JOIN ClassRegistration cr
+               ON cr.member_id = req.member_id AND cr.class_id = req.class_id
+    ),
+    decided AS (
+        SELECT c.ord, c.member_id, c.class_id,
+               COALESCE(
+                   c.rejected,
+                   CASE WHEN c.remaining IS NULL
+                          OR COUNT(*) FILTER (WHERE c.rejected IS NULL)
+                                 OVER (PARTITION BY c.class_id ORDER BY c.ord) <= c.remaining
+                        THEN 'registered' ELSE 'full' END
+               ) AS outcome
+        FROM checked c
+    ),
+    inserted AS (
+        INSERT INTO ClassRegistration(member_id, class_id)
+        SELECT d.member_id, d.class_id
+        FROM decided d
+        WHERE d.outcome = 'registered'
+    )
+    SELECT d.ord, d.member_id, d.class_id, d.outcome
+    FROM decided d
+    ORDER BY d.ord;
+$$ LANGUAGE sql;
@@ -0,0 +1,38 @@
+-- create_healthmetric_partitions() created every month in the range,
+-- including months that partition_maintenance.py had archived. An import
+-- or benchmark spanning such a month left an empty partition behind, and
+-- the next archive run exported it over the month's archive file and set
+-- its HealthMetricArchive.row_count to 0.
+--
+-- Months listed in HealthMetricArchive are now skipped; restoring an
+-- archive removes its HealthMetricArchive row before creating the month.
+
+
+-- FUNCTION: create the monthly partitions covering [p_from, p_to]
+-- Safe to call concurrently and repeatedly; returns the number created.
+-- Archived months are left alone.
+CREATE OR REPLACE FUNCTION create_healthmetric_partitions(p_from TIMESTAMP, p_to TIMESTAMP)
+RETURNS INT AS $$
+DECLARE
+    v_month   DATE := date_trunc('month', p_from)::DATE;
+    v_name    TEXT;
+    v_created INT := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('healthmetric_partitions'));
+
+    WHILE v_month <= p_to LOOP
+        v_name := 'healthmetric_' || to_char(v_month, '"y"YYYY"m"MM');
+        IF to_regclass(v_name) IS NULL
+           AND NOT EXISTS (SELECT 1 FROM HealthMetricArchive WHERE partition_name = v_name) THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF HealthMetric FOR VALUES FROM (%L) TO (%L)',
+                v_name, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+            v_created := v_created + 1;
+        END IF;
+        v_month := (v_month + INTERVAL '1 month')::DATE;
+    END LOOP;
+
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,54 @@
+-- rollup_days() and rollup_weeks() lock each (member, bucket) before
+-- re-summing it (migration 0019), but the insert trigger added new
+-- readings to HealthMetricDaily without that lock. A concurrent
+-- rollup_days() could read HealthMetric before the insert committed and
+-- upsert after it, overwriting the day with totals that missed the new
+-- readings. The insert trigger now takes the same day locks, in the same
+-- order, before its upsert; rollup_weeks() already locks the weeks.
+
+
+-- TRIGGER FUNCTION: merge inserted readings into their days, then re-sum their weeks
+CREATE OR REPLACE FUNCTION rollup_healthmetric_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(a.member_id, a.bucket - DATE '2000-01-01')
+    FROM (SELECT DISTINCT member_id, recorded_at::DATE AS bucket
+          FROM new_rows
+          ORDER BY member_id, bucket) a;
+
+    INSERT INTO HealthMetricDaily AS d (
+        member_id, bucket, readings,
+        weight_n, weight_sum, weight_min, weight_max,
+        heart_rate_n, heart_rate_sum, heart_rate_min, heart_rate_max,
+        body_fat_n, body_fat_sum, body_fat_min, body_fat_max
+    )
+    SELECT member_id, recorded_at::DATE, COUNT(*),
+           COUNT(weight), COALESCE(SUM(weight), 0), MIN(weight), MAX(weight),
+           COUNT(heart_rate), COALESCE(SUM(heart_rate), 0), MIN(heart_rate), MAX(heart_rate),
+           COUNT(body_fat_percentage), COALESCE(SUM(body_fat_percentage), 0),
+           MIN(body_fat_percentage), MAX(body_fat_percentage)
+    FROM new_rows
+    GROUP BY member_id, recorded_at::DATE
+    -- fixed order, so concurrent imports lock shared buckets in the same order
+    ORDER BY member_id, recorded_at::DATE
+    ON CONFLICT (member_id, bucket) DO UPDATE SET
+        readings       = d.readings + EXCLUDED.readings,
+        weight_n       = d.weight_n + EXCLUDED.weight_n,
+        weight_sum     = d.weight_sum + EXCLUDED.weight_sum,
+        weight_min     = LEAST(d.weight_min, EXCLUDED.weight_min),
+        weight_max     = GREATEST(d.weight_max, EXCLUDED.weight_max),
+        heart_rate_n   = d.heart_rate_n + EXCLUDED.heart_rate_n,
+        heart_rate_sum = d.heart_rate_sum + EXCLUDED.heart_rate_sum,
+        heart_rate_min = LEAST(d.heart_rate_min, EXCLUDED.heart_rate_min),
+        heart_rate_max = GREATEST(d.heart_rate_max, EXCLUDED.heart_rate_max),
+        body_fat_n     = d.body_fat_n + EXCLUDED.body_fat_n,
+        body_fat_sum   = d.body_fat_sum + EXCLUDED.body_fat_sum,
+        body_fat_min   = LEAST(d.body_fat_min, EXCLUDED.body_fat_min),
+        body_fat_max   = GREATEST(d.body_fat_max, EXCLUDED.body_fat_max);
+
+    PERFORM rollup_weeks(array_agg(member_id), array_agg(week))
+    FROM (SELECT DISTINCT member_id, date_trunc('week', recorded_at)::DATE AS week
+          FROM new_rows) w;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,20 @@
+-- DEVELOPMENT RESET
+-- Drops every table so sql/DDL.sql can be re-run. Never run this against
+-- production; use the migrations in sql/migrations instead.
+
+DROP TABLE IF EXISTS EquipmentMaintenance CASCADE;
+DROP TABLE IF EXISTS Equipment CASCADE;
+DROP TABLE IF EXISTS PTSession CASCADE;
+DROP TABLE IF EXISTS TrainerAvailability CASCADE;
+DROP TABLE IF EXISTS ClassRegistration CASCADE;
+DROP TABLE IF EXISTS GroupClass CASCADE;
+DROP TABLE IF EXISTS Room CASCADE;
+DROP TABLE IF EXISTS HealthMetric CASCADE;
+DROP TABLE IF EXISTS HealthMetricArchive CASCADE;
+DROP TABLE IF EXISTS HealthMetricDaily CASCADE;
+DROP TABLE IF EXISTS HealthMetricWeekly CASCADE;
+DROP TABLE IF EXISTS ScheduleOccupancy CASCADE;
+DROP TABLE IF EXISTS ReportRefresh CASCADE;
+DROP TABLE IF EXISTS Trainer CASCADE;
+DROP TABLE IF EXISTS Member CASCADE;
+DROP TABLE IF EXISTS schema_migrations CASCADE;